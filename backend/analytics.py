@@ -0,0 +1,187 @@
+"""
+Campaign analytics computed with aggregation pipelines.
+
+Statistics are derived in two steps, both inside MongoDB:
+
+1. ``refresh_session_stats`` reduces every session changed since the last
+   refresh to a small per-session summary (NPC ids, combat count, loot by
+   recipient, players, missions) and ``$merge``-s it into ``session_stats``.
+   Only sessions whose ``updated_at`` moved past the stored watermark are
+   reprocessed; deleted sessions are removed by the session delete hook.
+2. ``campaign_analytics`` groups those summaries with ``$unwind``/``$group``
+   in a single ``$facet`` aggregation.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+STATE_ID = "session_stats"
+# Writes stamp updated_at before they commit, so each refresh re-reads a
+# window before its watermark to pick up writes that were still in flight
+REFRESH_OVERLAP = timedelta(minutes=5)
+# How many of the latest sessions are listed individually in combat_per_session
+RECENT_SESSIONS = 50
+TOP_NPCS = 100
+
+# Leading amount of a loot value such as "250 gp" or "12.5", else 0
+_GOLD = {
+    "$convert": {
+        "input": {
+            "$let": {
+                "vars": {"found": {"$regexFind": {
+                    "input": {"$ifNull": ["$$item.value", ""]},
+                    "regex": r"^\s*([0-9]+(?:\.[0-9]+)?)\s*(?:gp|gold)?\s*$",
+                    "options": "i",
+                }}},
+                "in": {"$arrayElemAt": ["$$found.captures", 0]},
+            }
+        },
+        "to": "double",
+        "onError": 0,
+        "onNull": 0,
+    }
+}
+
+
+def _structured_list(field: str) -> Dict[str, Any]:
+    return {"$ifNull": [f"$structured_data.{field}", []]}
+
+
+SESSION_STATS_PROJECTION: Dict[str, Any] = {
+    "_id": 0,
+    "id": 1,
+    "title": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "npc_ids": {"$ifNull": ["$npcs_mentioned", []]},
+    "combat_count": {"$size": _structured_list("combat_encounters")},
+    "loot": {
+        "$map": {
+            "input": _structured_list("loot"),
+            "as": "item",
+            "in": {
+                "recipient": {"$trim": {"input": {"$ifNull": ["$$item.recipient", ""]}}},
+                "gold": _GOLD,
+            },
+        }
+    },
+    "players": {
+        "$setUnion": [{
+            "$filter": {
+                "input": {"$map": {"input": _structured_list("players_present"), "as": "p", "in": {"$trim": {"input": "$$p"}}}},
+                "as": "p",
+                "cond": {"$ne": ["$$p", ""]},
+            }
+        }]
+    },
+    "missions": {
+        "$map": {
+            "input": _structured_list("overarching_missions"),
+            "as": "m",
+            "in": {"name": {"$trim": {"input": "$$m.mission_name"}}, "status": "$$m.status"},
+        }
+    },
+}
+
+_refresh_lock = asyncio.Lock()
+
+
+async def refresh_session_stats(db) -> datetime:
+    """Re-summarize sessions changed since the last refresh; returns the new watermark."""
+    async with _refresh_lock:
+        started = datetime.utcnow()
+        state = await db.materializations.find_one({"_id": STATE_ID})
+        match: Dict[str, Any] = {}
+        if state:
+            match = {"updated_at": {"$gte": state["watermark"] - REFRESH_OVERLAP}}
+        pipeline = [
+            {"$match": match},
+            {"$project": SESSION_STATS_PROJECTION},
+            {"$merge": {"into": "session_stats", "on": "id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+        ]
+        async for _ in db.sessions.aggregate(pipeline):
+            pass
+        await db.materializations.update_one({"_id": STATE_ID}, {"$set": {"watermark": started}}, upsert=True)
+        return started
+
+
+async def reset_session_stats(db):
+    """Force the next refresh to re-summarize every session (e.g. after a bulk restore)"""
+    await db.materializations.delete_one({"_id": STATE_ID})
+
+
+def _facets() -> Dict[str, List[Dict[str, Any]]]:
+    return {
+        "npc_appearances": [
+            {"$unwind": "$npc_ids"},
+            {"$group": {"_id": "$npc_ids", "sessions": {"$sum": 1}, "last_seen": {"$max": "$created_at"}}},
+            {"$sort": {"sessions": -1, "_id": 1}},
+            {"$limit": TOP_NPCS},
+            {"$lookup": {"from": "npcs", "localField": "_id", "foreignField": "id", "as": "npc"}},
+            {"$project": {
+                "_id": 0, "npc_id": "$_id", "name": {"$arrayElemAt": ["$npc.name", 0]},
+                "sessions": 1, "last_seen": 1,
+            }},
+        ],
+        "combat_totals": [
+            {"$group": {
+                "_id": None,
+                "sessions": {"$sum": 1},
+                "encounters": {"$sum": "$combat_count"},
+                "sessions_with_combat": {"$sum": {"$cond": [{"$gt": ["$combat_count", 0]}, 1, 0]}},
+                "max_per_session": {"$max": "$combat_count"},
+                "average_per_session": {"$avg": "$combat_count"},
+            }},
+            {"$project": {"_id": 0}},
+        ],
+        "combat_per_session": [
+            {"$sort": {"created_at": -1, "id": -1}},
+            {"$limit": RECENT_SESSIONS},
+            {"$project": {"_id": 0, "session_id": "$id", "title": 1, "created_at": 1, "combat_count": 1}},
+        ],
+        "loot_by_recipient": [
+            {"$unwind": "$loot"},
+            {"$group": {"_id": "$loot.recipient", "items": {"$sum": 1}, "gold": {"$sum": "$loot.gold"}}},
+            {"$sort": {"items": -1, "_id": 1}},
+            {"$project": {"_id": 0, "recipient": {"$cond": [{"$eq": ["$_id", ""]}, "Unassigned", "$_id"]}, "items": 1, "gold": 1}},
+        ],
+        "attendance": [
+            {"$unwind": "$players"},
+            {"$group": {"_id": "$players", "sessions": {"$sum": 1}, "last_attended": {"$max": "$created_at"}}},
+            {"$sort": {"sessions": -1, "_id": 1}},
+            {"$project": {"_id": 0, "player": "$_id", "sessions": 1, "last_attended": 1}},
+        ],
+        "mission_status": [
+            {"$unwind": "$missions"},
+            {"$sort": {"created_at": -1, "id": -1}},
+            # A mission's status is the one recorded in the latest session that lists it
+            {"$group": {"_id": "$missions.name", "status": {"$first": "$missions.status"}}},
+            {"$group": {"_id": "$status", "missions": {"$sum": 1}}},
+            {"$sort": {"missions": -1, "_id": 1}},
+            {"$project": {"_id": 0, "status": "$_id", "missions": 1}},
+        ],
+    }
+
+
+async def campaign_analytics(db) -> Dict[str, Any]:
+    refreshed_at = await refresh_session_stats(db)
+    result = {}
+    async for doc in db.session_stats.aggregate([{"$facet": _facets()}]):
+        result = doc
+    totals = (result.get("combat_totals") or [{}])[0]
+    return {
+        "refreshed_at": refreshed_at,
+        "sessions": totals.get("sessions", 0),
+        "npc_appearances": result.get("npc_appearances", []),
+        "combat": {
+            "encounters": totals.get("encounters", 0),
+            "sessions_with_combat": totals.get("sessions_with_combat", 0),
+            "max_per_session": totals.get("max_per_session", 0),
+            "average_per_session": round(totals.get("average_per_session") or 0, 2),
+            "recent_sessions": result.get("combat_per_session", []),
+        },
+        "loot_by_recipient": result.get("loot_by_recipient", []),
+        "attendance": result.get("attendance", []),
+        "mission_status": result.get("mission_status", []),
+    }
@@ -0,0 +1,93 @@
+"""
+Micro-benchmark: rule-based NPC extraction throughput.
+
+Compares the original three-pass ``re.findall`` implementation with the
+single-pass NPCNameExtractor on a synthetic session transcript, checks that
+both find the same names apart from multi-line ``NPC:`` captures, and that
+chunked streaming returns the same names as a one-shot scan.
+
+    cd backend && python -m benchmarks.npc_extraction [--mb 8] [--repeat 5]
+"""
+
+import argparse
+import random
+import re
+import time
+
+from npc_extraction import name_extractor
+
+WORDS = (
+    "the party entered tavern and met with a gruff dwarf who offered them ale while "
+    "rain hammered against shutters outside they asked about road north"
+).split()
+NAMES = [
+    "Thorin the Blacksmith", "Elara Moonwhisper", "Gandalf the Grey", "Frodo Baggins",
+    "Captain Vex", "Mira the Bold", "Dungeon Master", "The Party",
+]
+
+
+def legacy_extract(text):
+    """The pre-compiled-extractor implementation, kept verbatim for comparison."""
+    patterns = [
+        r'\b([A-Z][a-z]+ (?:the )?[A-Z][a-z]+)\b',
+        r'\b([A-Z][a-z]+ [A-Z][a-z]+)\b',
+        r'NPC:\s*([A-Za-z\s]+)',
+    ]
+    extracted_names = []
+    for pattern in patterns:
+        extracted_names.extend(re.findall(pattern, text))
+    common_words = {'The Game', 'The Party', 'The Group', 'Game Master', 'Dungeon Master'}
+    return [name.strip() for name in set(extracted_names) if name.strip() not in common_words]
+
+
+def make_corpus(size_bytes, seed=7):
+    rng = random.Random(seed)
+    parts, size = [], 0
+    while size < size_bytes:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16)))
+        if rng.random() < 0.3:
+            sentence += " " + rng.choice(NAMES)
+        if rng.random() < 0.02:
+            sentence = f"NPC: {rng.choice(NAMES)}\n" + sentence
+        sentence = sentence[0].upper() + sentence[1:] + ".\n"
+        parts.append(sentence)
+        size += len(sentence)
+    return "".join(parts)
+
+
+def throughput(fn, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return len(text.encode()) / best / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mb", type=float, default=8.0, help="corpus size in MB")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    text = make_corpus(int(args.mb * 1e6))
+    legacy = throughput(legacy_extract, text, args.repeat)
+    compiled = throughput(name_extractor.extract, text, args.repeat)
+    chunks = [text[i:i + 4096] for i in range(0, len(text), 4096)]
+    streamed = throughput(lambda _: list(name_extractor.extract_stream(chunks)), text, args.repeat)
+
+    print(f"corpus:            {len(text) / 1e6:.1f} MB")
+    print(f"legacy (3 passes): {legacy:8.1f} MB/s")
+    print(f"single pass:       {compiled:8.1f} MB/s  ({compiled / legacy:.2f}x)")
+    print(f"streamed (4 KiB):  {streamed:8.1f} MB/s  ({streamed / legacy:.2f}x)")
+    # Legacy "NPC:" captures ran across line breaks; the single-pass tag stops at end of line
+    legacy_names, compiled_names = set(legacy_extract(text)), set(name_extractor.extract(text))
+    legacy_only = legacy_names - compiled_names
+    multiline = sum("\n" in name for name in legacy_only)
+    print(f"legacy-only names:       {len(legacy_only)} ({multiline} multi-line 'NPC:' captures)")
+    print(f"single-pass-only names:  {len(compiled_names - legacy_names)}")
+    print(f"stream matches one-shot: {list(name_extractor.extract_stream(chunks)) == name_extractor.extract(text)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Micro-benchmark: /api/search query latency over a synthetic campaign.
+
+Indexes ``--sessions`` generated session documents (plus a few NPCs) and
+times a mix of rare-term, common-term, phrase and prefix queries, warm and
+right after a write. For bare
+word queries the ranking is checked against a straightforward dict-based
+BM25 scorer.
+
+    cd backend && python -m benchmarks.search_index [--sessions 20000] [--repeat 20]
+"""
+
+import argparse
+import heapq
+import math
+import random
+import statistics
+import time
+from collections import defaultdict
+
+from search_index import B, K1, SearchIndex, tokenize
+
+WORDS = (
+    "the party entered tavern and met with a gruff dwarf who offered them ale while "
+    "rain hammered against shutters outside they asked about road north goblin cave "
+    "dragon sword shield merchant guard tower river bridge forest ruins spell scroll"
+).split()
+RARE = ["thorin", "thornwood", "thorough", "elara", "moonwhisper", "vex", "lich", "amulet"]
+NPC_NAMES = ["Thorin the Blacksmith", "Elara Moonwhisper", "Captain Vex", "Mira the Bold"]
+QUERIES = ["goblin cave", '"the party"', "thor*", "moonwhisper", "the", "dragon ruins amulet"]
+
+
+def make_session(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(80, 300))]
+    for _ in range(rng.randint(0, 3)):
+        words.insert(rng.randrange(len(words)), rng.choice(RARE))
+    return ["Session " + rng.choice(WORDS), " ".join(words)]
+
+
+def reference_search(fields_by_key, query, limit):
+    """Plain BM25 over bare words, scored document by document."""
+    lengths = {key: sum(len(t) + 1 for t in tokenize_fields(fields)) for key, fields in fields_by_key.items()}
+    avg_len = sum(lengths.values()) / len(lengths)
+    counts = {key: defaultdict(int) for key in fields_by_key}
+    for key, fields in fields_by_key.items():
+        for field_tokens in tokenize_fields(fields):
+            for token in field_tokens:
+                counts[key][token] += 1
+    scores = defaultdict(float)
+    for term in tokenize(query):
+        df = sum(1 for key in counts if term in counts[key])
+        if not df:
+            continue
+        idf = math.log(1 + (len(counts) - df + 0.5) / (df + 0.5))
+        for key, doc_counts in counts.items():
+            tf = doc_counts.get(term)
+            if tf:
+                scores[key] += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * lengths[key] / avg_len))
+    return [key for key, _ in heapq.nlargest(limit, scores.items(), key=lambda item: item[1])]
+
+
+def tokenize_fields(fields):
+    return [tokenize(field) for field in fields]
+
+
+def timings(index, query, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        index.search(query, limit=20)
+        samples.append((time.perf_counter() - start) * 1e3)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    index = SearchIndex()
+    documents = {}
+    start = time.perf_counter()
+    for i in range(args.sessions):
+        fields = make_session(rng)
+        index.add("session", str(i), fields, {"title": fields[0]})
+        documents[f"session:{i}"] = fields
+    for i, name in enumerate(NPC_NAMES):
+        index.add("npc", str(i), [name], {"name": name})
+        documents[f"npc:{i}"] = [name]
+    build = time.perf_counter() - start
+
+    print(f"documents:  {len(index)} (indexed in {build:.1f} s)")
+    for query in QUERIES:
+        median, p95 = timings(index, query, args.repeat)
+        print(f"{query:22} median {median:7.2f} ms   p95 {p95:7.2f} ms")
+    # A write leaves the cached arrays of the terms it touched to be patched on next use
+    index.add("session", "0", make_session(rng))
+    start = time.perf_counter()
+    index.search('"the party"', limit=20)
+    print(f"{'first after a write':22} {(time.perf_counter() - start) * 1e3:14.2f} ms")
+
+    sample = {key: documents[key] for key in list(documents)[:2000]}
+    small = SearchIndex()
+    for key, fields in sample.items():
+        kind, doc_id = key.split(":")
+        small.add(kind, doc_id, fields)
+    for query in ("goblin cave", "dragon ruins amulet", "moonwhisper"):
+        ranked = [f"{hit['type']}:{hit['id']}" for hit in small.search(query, limit=10)]
+        print(f"matches reference ({query}): {ranked == reference_search(sample, query, 10)}")
+
+
+if __name__ == "__main__":
+    main()
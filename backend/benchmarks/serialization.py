@@ -0,0 +1,90 @@
+"""
+Micro-benchmark: list endpoint serialization.
+
+Compares the old read path (``Session(**doc)`` per document, then FastAPI's
+response_model validation, jsonable encoding and ``json.dumps``) with the
+fast path (projected raw documents encoded straight to bytes).
+
+    cd backend && python -m benchmarks.serialization [--docs 500] [--repeat 20]
+"""
+
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from fast_json import dumps, orjson
+from server import Session, SessionStructuredData
+
+
+def make_session(i: int) -> dict:
+    structured = SessionStructuredData(
+        session_number=i,
+        players_present=["Aria", "Bram", "Cyra", "Dain"],
+        session_goal="Escort the caravan through the pass",
+        combat_encounters=[{"description": f"Ambush {n}", "enemies": "Goblins", "outcome": "Won"} for n in range(3)],
+        roleplay_encounters=[{"description": "Haggling", "npcs_involved": ["Thorin"], "outcome": "Discount"}],
+        npcs_encountered=[{"npc_name": "Thorin the Blacksmith", "role": "Merchant"}],
+        loot=[{"item_name": f"Gem {n}", "value": "50 gp", "recipient": "Aria"} for n in range(4)],
+        notable_roleplay_moments=["Bram sang to the ogre"],
+        overarching_missions=[{"mission_name": "The Lost Crown", "status": "In Progress"}],
+    )
+    created = datetime(2024, 1, 1) + timedelta(hours=i)
+    doc = Session(
+        title=f"Session {i}",
+        content="The party pressed on through the rain. " * 40,
+        structured_data=structured,
+        session_type="structured",
+        npcs_mentioned=[str(uuid.uuid4())],
+        created_at=created,
+        updated_at=created,
+    ).dict()
+    # Mongo stores datetimes at millisecond precision
+    doc["created_at"] = doc["updated_at"] = created
+    return doc
+
+
+def legacy_path(docs):
+    models = [Session(**doc) for doc in docs]
+    adapter = TypeAdapter(List[Session])
+    validated = adapter.validate_python(models)
+    return json.dumps(jsonable_encoder(adapter.dump_python(validated, mode="json"))).encode()
+
+
+def fast_path(docs):
+    return dumps(docs)
+
+
+def best_of(fn, docs, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(docs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=500, help="documents per page")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    docs = [make_session(i) for i in range(args.docs)]
+    legacy = best_of(legacy_path, docs, args.repeat)
+    fast = best_of(fast_path, docs, args.repeat)
+
+    print(f"documents:          {args.docs} ({len(fast_path(docs)) / 1e6:.2f} MB of JSON)")
+    print(f"encoder:            {'orjson' if orjson is not None else 'stdlib json'}")
+    print(f"pydantic + json:    {legacy * 1000:8.2f} ms")
+    print(f"raw dicts + encode: {fast * 1000:8.2f} ms  ({legacy / fast:.1f}x)")
+    print(f"same JSON:          {json.loads(legacy_path(docs)) == json.loads(fast_path(docs))}")
+
+
+if __name__ == "__main__":
+    main()
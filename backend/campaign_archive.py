@@ -0,0 +1,203 @@
+"""
+Whole-campaign backup and restore as (gzip-compressed) NDJSON.
+
+An archive is one JSON object per line: a header, then one record per
+stored document::
+
+    {"type": "header", "version": 1, "exported_at": "..."}
+    {"type": "npc", "doc": {...}}
+    {"type": "npc_history", "doc": {...}}
+    {"type": "session", "doc": {...}}
+
+Both directions stream: the export reads straight from Motor cursors and
+compresses incrementally, and the import decompresses and parses the
+upload line by line, writing it back in fixed-size ``bulk_write`` batches.
+Neither side holds more than a batch of documents in memory.
+"""
+
+import json
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from fast_json import dumps
+
+ARCHIVE_VERSION = 1
+BATCH_SIZE = 500
+# Compressed output is flushed to the client in chunks of about this size
+CHUNK_SIZE = 64 * 1024
+MAX_LINE_BYTES = 16 * 1024 * 1024
+MAX_REPORTED_ERRORS = 50
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+class ArchiveFormatError(ValueError):
+    """Raised when an upload is not a campaign archive this version can read."""
+
+
+async def export_records(sections: Sequence[Tuple[str, Any, Dict[str, int]]]) -> AsyncIterator[bytes]:
+    """Yield the archive's NDJSON lines for ``(type, collection, projection)`` sections, in order."""
+    yield dumps({"type": "header", "version": ARCHIVE_VERSION, "exported_at": datetime.utcnow()}) + b"\n"
+    for kind, collection, projection in sections:
+        async for doc in collection.find({}, projection).batch_size(BATCH_SIZE):
+            yield dumps({"type": kind, "doc": doc}) + b"\n"
+
+
+async def gzip_chunks(lines: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    pending: List[bytes] = []
+    size = 0
+    async for line in lines:
+        out = compressor.compress(line)
+        if out:
+            pending.append(out)
+            size += len(out)
+        if size >= CHUNK_SIZE:
+            yield b"".join(pending)
+            pending, size = [], 0
+    pending.append(compressor.flush())
+    yield b"".join(pending)
+
+
+async def _decoded(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Pass plain NDJSON through; transparently decompress gzip (detected from the first bytes)."""
+    decompressor = None
+    started = False
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        if not started:
+            started = True
+            if chunk[:2] == _GZIP_MAGIC:
+                decompressor = zlib.decompressobj(31)
+        if decompressor is None:
+            yield chunk
+            continue
+        try:
+            data = decompressor.decompress(chunk)
+        except zlib.error as exc:
+            raise ArchiveFormatError(f"Corrupt gzip data: {exc}")
+        if data:
+            yield data
+    if decompressor is not None:
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    buffer = b""
+    async for data in _decoded(chunks):
+        buffer += data
+        *complete, buffer = buffer.split(b"\n")
+        for line in complete:
+            yield line
+        if len(buffer) > MAX_LINE_BYTES:
+            raise ArchiveFormatError(f"Archive line exceeds {MAX_LINE_BYTES} bytes")
+    if buffer:
+        yield buffer
+
+
+async def read_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Yield ``(line_number, record)`` for every line after the header. Lines that
+    are not valid JSON are yielded as ``(line_number, None)`` so the caller can
+    report them; a missing or unsupported header raises ArchiveFormatError.
+    """
+    header_seen = False
+    line_number = 0
+    async for line in _lines(chunks):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not header_seen:
+            if not isinstance(record, dict) or record.get("type") != "header":
+                raise ArchiveFormatError("Archive does not start with a header line")
+            if record.get("version") != ARCHIVE_VERSION:
+                raise ArchiveFormatError(f"Unsupported archive version {record.get('version')!r}")
+            header_seen = True
+            continue
+        yield line_number, record
+    if not header_seen:
+        raise ArchiveFormatError("Archive is empty")
+
+
+def revive_timestamps(doc: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    """Turn the ISO strings an export wrote for ``fields`` back into datetimes."""
+    for field in fields:
+        if isinstance(doc.get(field), str):
+            doc[field] = datetime.fromisoformat(doc[field])
+    return doc
+
+
+class ImportSummary:
+    def __init__(self):
+        self.imported: Dict[str, int] = {}
+        self.skipped = 0
+        self.errors: List[str] = []
+
+    def error(self, line_number: int, message: str):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"line {line_number}: {message}")
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"imported": self.imported, "skipped": self.skipped, "errors": self.errors}
+
+
+class BatchWriter:
+    """
+    Buffers one record type's documents and replaces-or-inserts them by
+    ``key_fields`` in unordered ``bulk_write`` batches. ``on_written`` is
+    awaited with the documents of each batch that were stored.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        collection,
+        key_fields: Sequence[str],
+        summary: ImportSummary,
+        on_written: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None,
+        batch_size: int = BATCH_SIZE,
+    ):
+        self.kind = kind
+        self.collection = collection
+        self.key_fields = tuple(key_fields)
+        self.summary = summary
+        self.on_written = on_written
+        self.batch_size = batch_size
+        self._docs: List[Tuple[int, Dict[str, Any]]] = []
+        summary.imported.setdefault(kind, 0)
+
+    async def add(self, line_number: int, doc: Dict[str, Any]):
+        self._docs.append((line_number, doc))
+        if len(self._docs) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self._docs:
+            return
+        batch, self._docs = self._docs, []
+        operations = [
+            ReplaceOne({field: doc[field] for field in self.key_fields}, doc, upsert=True) for _, doc in batch
+        ]
+        failed = set()
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as exc:
+            for error in exc.details.get("writeErrors", []):
+                failed.add(error["index"])
+                self.summary.error(batch[error["index"]][0], error.get("errmsg", "write failed"))
+        stored = [doc for index, (_, doc) in enumerate(batch) if index not in failed]
+        self.summary.imported[self.kind] += len(stored)
+        if self.on_written and stored:
+            await self.on_written(stored)
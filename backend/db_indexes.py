@@ -0,0 +1,168 @@
+"""
+Registry of the MongoDB indexes the API relies on.
+
+Every query shape issued by server.py is listed in QUERY_SHAPES next to the
+index that is expected to serve it, so ensure_indexes() can create them at
+startup, index_drift() can report what differs from the live database and
+audit_query_plans() can prove no route falls back to a collection scan.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pymongo.errors import OperationFailure
+
+IndexKeys = Sequence[Tuple[str, int]]
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    name: str
+    keys: IndexKeys
+    unique: bool = False
+
+    def matches(self, info: Dict[str, Any]) -> bool:
+        """Compare against one entry of ``collection.index_information()``"""
+        return [tuple(k) for k in info.get("key", [])] == [tuple(k) for k in self.keys] and bool(
+            info.get("unique", False)
+        ) == self.unique
+
+
+@dataclass(frozen=True)
+class QueryShape:
+    route: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[IndexKeys] = None
+
+
+INDEXES: Dict[str, List[IndexSpec]] = {
+    "sessions": [
+        IndexSpec("id_unique", [("id", 1)], unique=True),
+        IndexSpec("created_at_id", [("created_at", -1), ("id", -1)]),
+        IndexSpec("npcs_mentioned_created_at_id", [("npcs_mentioned", 1), ("created_at", -1), ("id", -1)]),
+        IndexSpec("updated_at", [("updated_at", 1)]),
+    ],
+    "npcs": [
+        IndexSpec("id_unique", [("id", 1)], unique=True),
+        IndexSpec("name_unique", [("name", 1)], unique=True),
+        IndexSpec("name_id", [("name", 1), ("id", 1)]),
+    ],
+    "npc_history": [
+        IndexSpec("npc_id_bucket", [("npc_id", 1), ("bucket", -1)], unique=True),
+    ],
+    "missions": [
+        IndexSpec("key_unique", [("key", 1)], unique=True),
+        IndexSpec("name_key", [("name", 1), ("key", 1)]),
+        IndexSpec("status_name_key", [("status", 1), ("name", 1), ("key", 1)]),
+        IndexSpec("sessions_session_id", [("sessions.session_id", 1)]),
+    ],
+    "changes": [
+        IndexSpec("seq_unique", [("seq", 1)], unique=True),
+        IndexSpec("kind_id_unique", [("kind", 1), ("id", 1)], unique=True),
+    ],
+    "jobs": [
+        IndexSpec("id_unique", [("id", 1)], unique=True),
+        IndexSpec("status_priority_created_at", [("status", 1), ("priority", -1), ("created_at", 1)]),
+    ],
+    "session_stats": [
+        # $merge into session_stats matches on this unique index
+        IndexSpec("id_unique", [("id", 1)], unique=True),
+    ],
+}
+
+QUERY_SHAPES: List[QueryShape] = [
+    QueryShape("GET /sessions", "sessions", {}, [("created_at", -1), ("id", -1)]),
+    QueryShape("GET /sessions/{id}", "sessions", {"id": ""}),
+    QueryShape("GET /npcs", "npcs", {}, [("name", 1), ("id", 1)]),
+    QueryShape("GET /npcs/{id}", "npcs", {"id": ""}),
+    QueryShape("POST /extract-npc", "npcs", {"name": ""}),
+    QueryShape("GET /npcs/{id}/history", "npc_history", {"npc_id": ""}, [("bucket", -1)]),
+    QueryShape("GET /npcs/{id}/sessions", "sessions", {"npcs_mentioned": ""}, [("created_at", -1), ("id", -1)]),
+    QueryShape("GET /campaign/recap", "sessions", {}, [("created_at", 1), ("id", 1)]),
+    QueryShape("GET /missions", "missions", {}, [("name", 1), ("key", 1)]),
+    QueryShape("GET /missions?status=", "missions", {"status": ""}, [("name", 1), ("key", 1)]),
+    QueryShape("GET /missions/{key}", "missions", {"key": ""}),
+    QueryShape("PUT /sessions/{id} (missions)", "missions", {"sessions.session_id": ""}),
+    QueryShape("GET /jobs/{id}", "jobs", {"id": ""}),
+    QueryShape("startup (jobs)", "jobs", {"status": {"$in": ["queued", "running"]}}, [("priority", -1), ("created_at", 1)]),
+    QueryShape("GET /changes", "changes", {"seq": {"$gt": 0}}, [("seq", 1)]),
+    QueryShape("GET /analytics", "sessions", {"updated_at": {"$gte": datetime(1970, 1, 1)}}),
+]
+
+
+async def index_drift(db) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Report, per collection, registry indexes that are missing, present with a
+    different definition, or live indexes the registry does not know about.
+    """
+    report = {}
+    for collection, specs in INDEXES.items():
+        live = await db[collection].index_information()
+        live.pop("_id_", None)
+        expected = {spec.name: spec for spec in specs}
+        report[collection] = {
+            "missing": [name for name in expected if name not in live],
+            "mismatched": [
+                name for name, spec in expected.items() if name in live and not spec.matches(live[name])
+            ],
+            "unexpected": [name for name in live if name not in expected],
+        }
+    return report
+
+
+async def ensure_indexes(db) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Create every missing registry index and return the drift that remains
+    afterwards. Mismatched indexes are reported rather than dropped, since
+    rebuilding an index on a live collection is an operator decision; the
+    same goes for indexes that cannot be built (e.g. duplicate ids blocking
+    a unique index), which are listed under ``errors``.
+    """
+    drift = await index_drift(db)
+    errors: Dict[str, List[str]] = {}
+    for collection, specs in INDEXES.items():
+        for spec in specs:
+            if spec.name in drift[collection]["missing"]:
+                try:
+                    await db[collection].create_index(list(spec.keys), name=spec.name, unique=spec.unique)
+                except OperationFailure as exc:
+                    errors.setdefault(collection, []).append(f"{spec.name}: {exc}")
+    drift = await index_drift(db)
+    for collection, messages in errors.items():
+        drift[collection]["errors"] = messages
+    return drift
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    stages = [plan.get("stage", "")]
+    for child_key in ("inputStage", "queryPlan"):
+        if child_key in plan:
+            stages.extend(_plan_stages(plan[child_key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return [stage for stage in stages if stage]
+
+
+async def audit_query_plans(db) -> List[Dict[str, Any]]:
+    """
+    Run ``explain()`` on every registered query shape and flag plans that
+    scan the whole collection or sort in memory.
+    """
+    results = []
+    for shape in QUERY_SHAPES:
+        cursor = db[shape.collection].find(shape.filter).limit(1)
+        if shape.sort:
+            cursor = cursor.sort(list(shape.sort))
+        explanation = await cursor.explain()
+        winning_plan = explanation.get("queryPlanner", {}).get("winningPlan", {})
+        stages = _plan_stages(winning_plan)
+        results.append({
+            "route": shape.route,
+            "collection": shape.collection,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+            "in_memory_sort": "SORT" in stages,
+        })
+    return results
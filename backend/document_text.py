@@ -0,0 +1,54 @@
+"""
+Flatten stored session and NPC documents into their free-text fields.
+
+Structured session data is walked generically, so any text field added to
+SessionStructuredData is picked up without touching the indexers that
+consume these helpers.
+"""
+
+from typing import Any, Dict, Iterator, List
+
+NPC_TEXT_FIELDS = (
+    "name",
+    "status",
+    "race",
+    "class_role",
+    "appearance",
+    "quirks_mannerisms",
+    "background",
+    "notes",
+)
+
+# The fields describing who an NPC is, as opposed to what they are called
+NPC_DESCRIPTION_FIELDS = NPC_TEXT_FIELDS[2:]
+
+
+def iter_text(value: Any) -> Iterator[str]:
+    """Yield every non-empty string nested in ``value``, skipping ``id`` keys."""
+    if isinstance(value, str):
+        if value:
+            yield value
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if key != "id":
+                yield from iter_text(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from iter_text(item)
+
+
+def session_text(doc: Dict[str, Any]) -> List[str]:
+    """Title, free-form content and every text field of the structured data."""
+    fields = [doc.get("title") or "", doc.get("content") or ""]
+    fields.extend(iter_text(doc.get("structured_data") or {}))
+    return [field for field in fields if field]
+
+
+def npc_text(doc: Dict[str, Any]) -> List[str]:
+    """The descriptive fields of an NPC."""
+    return [doc[field] for field in NPC_TEXT_FIELDS if doc.get(field)]
+
+
+def npc_description(doc: Dict[str, Any]) -> List[str]:
+    """The descriptive fields of an NPC, without its name and status."""
+    return [doc[field] for field in NPC_DESCRIPTION_FIELDS if doc.get(field)]
@@ -0,0 +1,62 @@
+"""
+Weak ETags and conditional GET support.
+
+Detail ETags are derived from a document's ``updated_at``; list ETags from a
+per-collection change counter that every write bumps. The counters live in
+MongoDB so all workers agree on them and they survive restarts.
+"""
+
+import hashlib
+from typing import Any, Optional
+
+from pymongo import ReturnDocument
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Clients may keep a copy but must revalidate it on every use
+CACHE_CONTROL = "private, no-cache"
+
+
+def weak_etag(*parts: Any) -> str:
+    digest = hashlib.sha1("\x1f".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def matches(request: Request, etag: str) -> bool:
+    """Weak comparison of ``etag`` against the request's If-None-Match header."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def cache_headers(etag: Optional[str]) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL} if etag else {}
+
+
+class ChangeCounters:
+    """Monotonic per-collection write counters stored in one small collection."""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    async def bump(self, name: str, by: int = 1) -> int:
+        counter = await self._collection.find_one_and_update(
+            {"_id": name}, {"$inc": {"seq": by}}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        return counter["seq"]
+
+    async def current(self, name: str) -> int:
+        counter = await self._collection.find_one({"_id": name})
+        return counter["seq"] if counter else 0
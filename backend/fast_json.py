@@ -0,0 +1,44 @@
+"""
+JSON encoding for the read path.
+
+Stored documents were validated when they were written, so list and detail
+endpoints project exactly the model's fields out of MongoDB and encode the
+raw dicts straight to bytes instead of rebuilding pydantic models. orjson is
+used when installed; the stdlib encoder is the fallback.
+"""
+
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Type
+
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without the optional dependency
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def projection_for(model: Type[BaseModel], exclude: Iterable[str] = ()) -> Dict[str, int]:
+    """Mongo projection returning only the model's fields (and never ``_id``)."""
+    projection = {field: 1 for field in model.model_fields if field not in set(exclude)}
+    projection["_id"] = 0
+    return projection
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
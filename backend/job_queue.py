@@ -0,0 +1,192 @@
+"""
+Background job queue for slow extraction and summarization work.
+
+Submitting a job stores it in the ``jobs`` collection and returns at once::
+
+    {"id", "kind", "payload", "priority", "status", "attempts", "max_attempts",
+     "result", "error", "created_at", "updated_at", "started_at", "finished_at"}
+
+A fixed pool of worker tasks takes queued jobs highest priority first (then
+oldest first) and runs the handler registered for the job's kind. A worker
+claims a job with one atomic status change, so it runs only once even if
+it was queued twice. A failed attempt is retried with exponential backoff
+until ``max_attempts``. A handler raises PermanentJobError for input it can
+never process, which fails the job without retrying.
+
+Jobs interrupted by a shutdown are still ``running`` in the collection and
+are queued again by ``start``. Finished jobs are kept for JOB_RETENTION so
+clients have time to collect their results.
+"""
+
+import asyncio
+import itertools
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+FINISHED = ("completed", "failed")
+PENDING = ("queued", "running")
+JOB_SORT = [("priority", -1), ("created_at", 1)]
+JOB_RETENTION = timedelta(days=7)
+JOB_PROJECTION = {"_id": 0, "payload": 0}
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying the job cannot help."""
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(
+        self,
+        collection,
+        handlers: Dict[str, Handler],
+        workers: int = 2,
+        max_queued: int = 1000,
+        max_attempts: int = 3,
+        timeout: float = 120.0,
+        retry_delay: float = 1.0,
+    ):
+        self._collection = collection
+        self.handlers = handlers
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self._queue: "asyncio.PriorityQueue[Any]" = asyncio.PriorityQueue()
+        self._order = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._running = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+
+    def _enqueue(self, job_id: str, priority: int):
+        self._queue.put_nowait((-priority, next(self._order), job_id))
+
+    async def start(self):
+        """Queue again what a previous process left unfinished, then start the workers."""
+        await self._collection.delete_many({"status": {"$in": list(FINISHED)}, "finished_at": {"$lt": datetime.utcnow() - JOB_RETENTION}})
+        await self._collection.update_many({"status": "running"}, {"$set": {"status": "queued"}})
+        async for job in self._collection.find({"status": {"$in": list(PENDING)}}, {"id": 1, "priority": 1}).sort(JOB_SORT):
+            self._enqueue(job["id"], job["priority"])
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, kind: str, payload: Dict[str, Any], priority: int = 0) -> Dict[str, Any]:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self._queue.qsize() >= self.max_queued:
+            raise JobQueueFull(f"{self._queue.qsize()} jobs are already queued")
+        now = datetime.utcnow()
+        job = {
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "payload": payload,
+            "priority": priority,
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": self.max_attempts,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "started_at": None,
+            "finished_at": None,
+        }
+        await self._collection.insert_one(job)
+        self._enqueue(job["id"], priority)
+        job.pop("_id", None)
+        job.pop("payload")
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self._collection.find_one({"id": job_id}, JOB_PROJECTION)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """The job once it has finished, or as it stands after ``timeout`` seconds."""
+        # Register before reading, so a job finishing in between still wakes us
+        finished = self._finished.setdefault(job_id, asyncio.Event())
+        job = await self.get(job_id)
+        if job is None or job["status"] in FINISHED:
+            self._finished.pop(job_id, None)
+            return job
+        if timeout <= 0:
+            return job
+        try:
+            await asyncio.wait_for(finished.wait(), timeout)
+        except asyncio.TimeoutError:
+            return job
+        return await self.get(job_id)
+
+    async def _work(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = await self._collection.find_one_and_update(
+                {"id": job_id, "status": "queued"},
+                {"$set": {"status": "running", "started_at": datetime.utcnow(), "updated_at": datetime.utcnow()}, "$inc": {"attempts": 1}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if job is None:
+                continue
+            self._running += 1
+            try:
+                await self._run(job)
+            except Exception:
+                logger.exception("Job %s could not be recorded", job_id)
+            finally:
+                self._running -= 1
+
+    async def _run(self, job: Dict[str, Any]):
+        try:
+            result = await asyncio.wait_for(self.handlers[job["kind"]](job["payload"]), self.timeout)
+        except Exception as exc:
+            error = str(exc) or type(exc).__name__
+            if isinstance(exc, PermanentJobError) or job["attempts"] >= job["max_attempts"]:
+                logger.warning("Job %s (%s) failed: %s", job["id"], job["kind"], error)
+                await self._finish(job["id"], {"status": "failed", "error": error})
+                self.failed += 1
+                return
+            await self._collection.update_one(
+                {"id": job["id"]}, {"$set": {"status": "queued", "error": error, "updated_at": datetime.utcnow()}}
+            )
+            self.retried += 1
+            delay = self.retry_delay * 2 ** (job["attempts"] - 1)
+            asyncio.get_running_loop().call_later(delay, self._enqueue, job["id"], job["priority"])
+            return
+        await self._finish(job["id"], {"status": "completed", "result": result, "error": None})
+        self.completed += 1
+
+    async def _finish(self, job_id: str, fields: Dict[str, Any]):
+        now = datetime.utcnow()
+        await self._collection.update_one({"id": job_id}, {"$set": {**fields, "finished_at": now, "updated_at": now}})
+        finished = self._finished.pop(job_id, None)
+        if finished is not None:
+            finished.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._tasks),
+            "queued": self._queue.qsize(),
+            "running": self._running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
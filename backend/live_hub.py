@@ -0,0 +1,115 @@
+"""
+In-process pub/sub hub for live change events.
+
+Write handlers publish small change events; every connected WebSocket or
+SSE client holds a Subscription with its own bounded queue. Publishing never
+waits on a client. When a slow client's queue fills up, its backlog is
+discarded and replaced by one ``{"type": "resync"}`` event. The client then
+catches up from the change feed (GET /api/changes) instead of holding up
+everyone else.
+
+Events travel through a FanoutBackend. InMemoryFanout delivers them straight
+to this process's subscribers, which is all a single worker (or a test)
+needs. Several workers can be bridged by a backend whose ``publish`` goes
+through a shared broker and whose subscription loop calls ``deliver`` for
+every event received.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Set
+
+Event = Dict[str, Any]
+
+QUEUE_SIZE = 256
+RESYNC: Event = {"type": "resync"}
+
+
+class FanoutBackend:
+    """Carries published events to the hub of every worker, including this one."""
+
+    async def start(self, deliver: Callable[[Event], None]):
+        raise NotImplementedError
+
+    async def publish(self, event: Event):
+        raise NotImplementedError
+
+    async def stop(self):
+        pass
+
+
+class InMemoryFanout(FanoutBackend):
+    def __init__(self):
+        self._deliver: Optional[Callable[[Event], None]] = None
+
+    async def start(self, deliver: Callable[[Event], None]):
+        self._deliver = deliver
+
+    async def publish(self, event: Event):
+        if self._deliver is not None:
+            self._deliver(event)
+
+    async def stop(self):
+        self._deliver = None
+
+
+class Subscription:
+    def __init__(self, queue_size: int):
+        self._queue: "asyncio.Queue[Optional[Event]]" = asyncio.Queue(queue_size)
+        self.overflows = 0
+
+    def offer(self, event: Optional[Event]) -> bool:
+        """Queue an event without waiting; on overflow, swap the backlog for a resync marker."""
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self.overflows += 1
+            self._queue.put_nowait(RESYNC if event is not None else None)
+            return False
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """The next event; None when the hub closes. Raises asyncio.TimeoutError after ``timeout``."""
+        if timeout is None:
+            return await self._queue.get()
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+
+class LiveHub:
+    def __init__(self, backend: FanoutBackend, queue_size: int = QUEUE_SIZE):
+        self.backend = backend
+        self.queue_size = queue_size
+        self._subscriptions: Set[Subscription] = set()
+        self.published = 0
+        self.overflows = 0
+
+    async def start(self):
+        await self.backend.start(self._deliver)
+
+    async def stop(self):
+        await self.backend.stop()
+        for subscription in list(self._subscriptions):
+            subscription.offer(None)
+
+    async def publish(self, event: Event):
+        self.published += 1
+        await self.backend.publish(event)
+
+    def _deliver(self, event: Event):
+        for subscription in list(self._subscriptions):
+            if not subscription.offer(event):
+                self.overflows += 1
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator[Subscription]:
+        subscription = Subscription(self.queue_size)
+        self._subscriptions.add(subscription)
+        try:
+            yield subscription
+        finally:
+            self._subscriptions.discard(subscription)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"subscribers": len(self._subscriptions), "published": self.published, "overflows": self.overflows}
@@ -0,0 +1,128 @@
+"""
+Materialized overarching missions.
+
+Every structured session carries its own copy of the campaign's
+overarching missions. The ``missions`` collection folds those copies into
+one document per mission, keyed by its normalized name::
+
+    {"key": "save the town", "name": "Save the Town", "status": "Completed",
+     "description": ..., "notes": ..., "session_count": 3,
+     "first_seen_at": ..., "last_seen_at": ..., "last_session_id": ...,
+     "sessions": [{"session_id", "title", "created_at", "name", "status", ...}]}
+
+``sessions`` holds each session's copy; the top-level fields are re-derived
+from the copy in the latest session (by ``created_at``) on every write, in
+the same update pipeline, so a mission's state is always what the most
+recent session says about it.
+
+Listings read with MISSION_LIST_PROJECTION, which trims each session entry
+to its id, title, date and status. The page then grows with the number of
+missions rather than with how much was written about them in every session.
+The full copies are read one mission at a time.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import DeleteMany, UpdateOne
+
+MISSION_SORT = [("name", 1), ("key", 1)]
+
+_COPIED_FIELDS = ("status", "description", "notes")
+
+MISSION_LIST_PROJECTION = {"_id": 0, "sessions.name": 0, "sessions.description": 0, "sessions.notes": 0}
+
+
+def mission_key(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+def session_missions(session: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """This session's copy of each mission it lists, by mission key."""
+    missions = (session.get("structured_data") or {}).get("overarching_missions") or []
+    copies: Dict[str, Dict[str, Any]] = {}
+    for mission in missions:
+        key = mission_key(mission.get("mission_name") or "")
+        if not key:
+            continue
+        copies[key] = {
+            "session_id": session["id"],
+            "title": session.get("title", ""),
+            "created_at": session["created_at"],
+            "name": " ".join(mission["mission_name"].split()),
+            **{field: mission.get(field, "") for field in _COPIED_FIELDS},
+        }
+    return copies
+
+
+def _without_session(session_id: str) -> Dict[str, Any]:
+    return {"$filter": {"input": {"$ifNull": ["$sessions", []]}, "cond": {"$ne": ["$$this.session_id", session_id]}}}
+
+
+def _derive_stages() -> List[Dict[str, Any]]:
+    latest = {
+        "$reduce": {
+            "input": "$sessions",
+            "initialValue": None,
+            "in": {"$cond": [
+                {"$or": [{"$eq": ["$$value", None]}, {"$gte": ["$$this.created_at", "$$value.created_at"]}]},
+                "$$this",
+                "$$value",
+            ]},
+        }
+    }
+    return [
+        {"$set": {"_latest": latest}},
+        {"$set": {
+            "name": "$_latest.name",
+            **{field: f"$_latest.{field}" for field in _COPIED_FIELDS},
+            "last_session_id": "$_latest.session_id",
+            "last_seen_at": "$_latest.created_at",
+            "first_seen_at": {"$min": "$sessions.created_at"},
+            "session_count": {"$size": "$sessions"},
+            "updated_at": datetime.utcnow(),
+        }},
+        {"$unset": "_latest"},
+    ]
+
+
+def mission_sync_operations(
+    session_id: str, copies: Dict[str, Dict[str, Any]], linked: Dict[str, Optional[Dict[str, Any]]]
+) -> List[Any]:
+    """
+    Bulk operations moving the missions collection from ``linked`` (each
+    mission currently holding a copy from this session, with that copy) to
+    ``copies``. Unchanged copies produce no operation; missions left with no
+    session are deleted.
+    """
+    operations: List[Any] = []
+    for key, copy in copies.items():
+        if linked.get(key) == copy:
+            continue
+        operations.append(UpdateOne(
+            {"key": key},
+            [{"$set": {"key": key, "sessions": {"$concatArrays": [_without_session(session_id), [{"$literal": copy}]]}}}]
+            + _derive_stages(),
+            upsert=True,
+        ))
+    dropped = [key for key in linked if key not in copies]
+    for key in dropped:
+        operations.append(UpdateOne({"key": key}, [{"$set": {"sessions": _without_session(session_id)}}] + _derive_stages()))
+    if dropped:
+        operations.append(DeleteMany({"key": {"$in": dropped}, "session_count": 0}))
+    return operations
+
+
+async def sync_session_missions(collection, session: Dict[str, Any]) -> bool:
+    """Fold a saved (or deleted, with no missions) session into the missions; True if anything changed."""
+    linked: Dict[str, Optional[Dict[str, Any]]] = {}
+    async for mission in collection.find({"sessions.session_id": session["id"]}, {"_id": 0, "key": 1, "sessions.$": 1}):
+        linked[mission["key"]] = mission["sessions"][0]
+    operations = mission_sync_operations(session["id"], session_missions(session), linked)
+    if operations:
+        await collection.bulk_write(operations, ordered=True)
+    return bool(operations)
+
+
+async def remove_session_missions(collection, session_id: str) -> bool:
+    return await sync_session_missions(collection, {"id": session_id})
@@ -0,0 +1,106 @@
+"""
+Rule-based NPC name extraction.
+
+The original three ``re.findall`` passes are folded into one precompiled
+pattern, so a text is walked once. Every capitalized word that starts a
+two-word name matches, and the rest of the name is captured in a lookahead
+without being consumed. An ``NPC:`` tag is captured the same way. Because
+nothing past the first word is consumed, overlapping names stay visible
+("Gandalf the Grey" inside an "NPC: Gandalf the Grey arrived" tag, "Big Red"
+after "Bob the Big"). _scan() then replays each original pass's
+left-to-right, non-overlapping choice over the matches, so it finds the same
+names the passes did. Names are deduplicated in order of first appearance.
+Matches only contain ``[A-Za-z :\\t]``, so extract_stream() can split chunked
+input after any punctuation or line break without cutting a name in half.
+
+The one deliberate difference from the original passes: an ``NPC:`` tag
+stops at the end of its line instead of running on through every following
+line of letters and whitespace.
+"""
+
+import re
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+NAME_RE = re.compile(
+    r"(?=[A-Z])"  # cheap guard: both branches start with a capital, so skip everything else fast
+    r"(?:(?=NPC:[ \t]*(?P<tagged>[A-Za-z \t]+))"  # "NPC: Character Name"
+    r"|\b[A-Z][a-z]++(?=(?P<sep> the | )(?P<last>[A-Z][a-z]+)\b))"  # "Thorin the Blacksmith", "John Smith"
+)
+
+COMMON_WORDS = frozenset({'The Game', 'The Party', 'The Group', 'Game Master', 'Dungeon Master'})
+
+# Characters a chunk must not be split after: anything a match may contain, plus
+# word characters, which would change where the pattern's \b boundaries fall
+_UNSAFE_SPLIT = re.compile(r"[\w \t:]")
+# Flush a chunk tail that never reaches a boundary once it grows this large
+MAX_CARRY = 1 << 16
+
+
+class NPCNameExtractor:
+    def __init__(self, pattern: "re.Pattern[str]" = NAME_RE, ignored: Iterable[str] = COMMON_WORDS):
+        self._pattern = pattern
+        self._ignored = frozenset(ignored)
+
+    def _scan(self, text: str, seen: Set[str]) -> Iterator[str]:
+        ignored = self._ignored
+        # Raw name -> (offset, pass) of its first occurrence, ordered as the original passes reported them
+        first: Dict[str, Tuple[int, int]] = {}
+        # Where each original pass would resume: titled names, plain two-word names, NPC: tags
+        titled_end = plain_end = tagged_end = 0
+        for match in self._pattern.finditer(text):
+            start = match.start()
+            sep = match.group("sep")
+            if sep is None:
+                if start < tagged_end:
+                    continue
+                tagged_end = match.end("tagged")
+                found = [(match.group("tagged"), (match.start("tagged"), 2))]
+            else:
+                found = []
+                if start >= titled_end:
+                    titled_end = match.end("last")
+                    found.append((text[start:titled_end], (start, 0)))
+                if sep == " " and start >= plain_end:
+                    plain_end = match.end("last")
+                    found.append((text[start:plain_end], (start, 1)))
+            for name, position in found:
+                if first.get(name, position) >= position:
+                    first[name] = position
+        for name in sorted(first, key=first.__getitem__):
+            name = name.strip()
+            if name and name not in ignored and name not in seen:
+                seen.add(name)
+                yield name
+
+    def extract(self, text: str) -> List[str]:
+        """Return the distinct candidate names in ``text``, in order of first appearance."""
+        return list(self._scan(text, set()))
+
+    def extract_stream(self, chunks: Iterable[str]) -> Iterator[str]:
+        """
+        Yield distinct names from text arriving in arbitrary chunks. Each
+        chunk is scanned up to its last safe boundary and the remainder is
+        carried into the next one, so results match extract() on the joined text.
+        """
+        seen: Set[str] = set()
+        carry = ""
+        for chunk in chunks:
+            buffer = carry + chunk
+            cut = len(buffer)
+            while cut and _UNSAFE_SPLIT.match(buffer, cut - 1):
+                cut -= 1
+            if not cut and len(buffer) < MAX_CARRY:
+                carry = buffer
+                continue
+            if not cut:
+                cut = len(buffer)
+            yield from self._scan(buffer[:cut], seen)
+            carry = buffer[cut:]
+        if carry:
+            yield from self._scan(carry, seen)
+
+    def extract_many(self, texts: Iterable[str]) -> List[List[str]]:
+        return [self.extract(text) for text in texts]
+
+
+name_extractor = NPCNameExtractor()
@@ -0,0 +1,142 @@
+"""
+NPC interaction history stored outside the NPC document.
+
+Each NPC numbers its interactions with a per-NPC sequence (the NPC's
+``history_count`` before the append). Entries are grouped into fixed-size
+buckets keyed by ``(npc_id, seq // HISTORY_BUCKET_SIZE)``, so a recurring
+NPC costs one small document per HISTORY_BUCKET_SIZE interactions and a
+page of history is read from one or two buckets.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from pagination import InvalidCursorError, decode_cursor, encode_cursor
+
+HISTORY_BUCKET_SIZE = 50
+# How many of the latest entries are kept inline on the NPC document
+RECENT_HISTORY = 5
+# How many bulk-extraction markers an NPC keeps (see interaction_upsert). Each
+# bulk extraction removes its marker once read, so this bounds how many can be
+# in flight on one NPC before the oldest marker is dropped.
+RECENT_BATCHES = 32
+
+HISTORY_SORT = [("seq", -1)]
+
+
+def bucket_of(seq: int) -> int:
+    return seq // HISTORY_BUCKET_SIZE
+
+
+def interaction_upsert(
+    defaults: Dict[str, Any], entries: List[Dict[str, Any]], batch_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Update pipeline that creates the NPC from ``defaults`` if it does not
+    exist yet, numbers ``entries`` from its current ``history_count``,
+    appends them to the inline recent history (trimmed to RECENT_HISTORY)
+    and bumps the count, all in one atomic write.
+
+    With ``batch_id``, the first sequence number claimed is also recorded
+    under ``batch_bases`` so a caller that cannot read the updated document
+    back (e.g. ``bulk_write``) can still find which numbers it was given.
+    The caller pulls the marker again once it has read it.
+    """
+    count = {"$ifNull": ["$history_count", 0]}
+    numbered = [
+        {"$mergeObjects": [{"$literal": entry}, {"seq": {"$add": [count, i]}}]}
+        for i, entry in enumerate(entries)
+    ]
+    fields: Dict[str, Any] = {
+        field: {"$ifNull": [f"${field}", {"$literal": value}]}
+        for field, value in defaults.items()
+        if field not in ("history", "history_count", "updated_at")
+    }
+    fields.update({
+        "history": {
+            "$slice": [{"$concatArrays": [{"$ifNull": ["$history", []]}, numbered]}, -RECENT_HISTORY]
+        },
+        "history_count": {"$add": [count, len(entries)]},
+        "updated_at": entries[-1]["timestamp"],
+    })
+    if batch_id:
+        marker = {"id": batch_id, "base": count}
+        fields["batch_bases"] = {
+            "$slice": [{"$concatArrays": [{"$ifNull": ["$batch_bases", []]}, [marker]]}, -RECENT_BATCHES]
+        }
+    return [{"$set": fields}]
+
+
+def history_bucket_updates(npc_id: str, base_seq: int, entries: List[Dict[str, Any]]) -> List[UpdateOne]:
+    """Bucket upserts storing ``entries`` numbered from ``base_seq``, one per bucket touched."""
+    updates = []
+    for bucket in bucket_documents(npc_id, [{**entry, "seq": base_seq + i} for i, entry in enumerate(entries)]):
+        updates.append(UpdateOne(
+            {"npc_id": npc_id, "bucket": bucket["bucket"]},
+            {
+                "$push": {"entries": {"$each": bucket["entries"]}},
+                "$inc": {"count": bucket["count"]},
+                "$min": {"first_timestamp": bucket["first_timestamp"]},
+                "$max": {"last_timestamp": bucket["last_timestamp"]},
+            },
+            upsert=True,
+        ))
+    return updates
+
+
+def bucket_documents(npc_id: str, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Group already-numbered entries into bucket documents for a bulk insert."""
+    buckets: Dict[int, Dict[str, Any]] = {}
+    for entry in entries:
+        bucket = buckets.setdefault(bucket_of(entry["seq"]), {
+            "npc_id": npc_id,
+            "bucket": bucket_of(entry["seq"]),
+            "entries": [],
+            "count": 0,
+            "first_timestamp": entry["timestamp"],
+            "last_timestamp": entry["timestamp"],
+        })
+        bucket["entries"].append(entry)
+        bucket["count"] += 1
+        bucket["first_timestamp"] = min(bucket["first_timestamp"], entry["timestamp"])
+        bucket["last_timestamp"] = max(bucket["last_timestamp"], entry["timestamp"])
+    return list(buckets.values())
+
+
+async def fetch_history_page(
+    collection, npc_id: str, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Return up to ``limit`` entries, newest first, and the cursor for the next page."""
+    query: Dict[str, Any] = {"npc_id": npc_id}
+    before = None
+    if cursor:
+        (before,) = decode_cursor(cursor, HISTORY_SORT)
+        if not isinstance(before, int):
+            raise InvalidCursorError("Cursor does not match this listing")
+        query["bucket"] = {"$lte": bucket_of(before - 1)}
+
+    entries: List[Dict[str, Any]] = []
+    buckets = collection.find(query, {"_id": 0, "entries": 1}).sort("bucket", -1)
+    buckets.batch_size(limit // HISTORY_BUCKET_SIZE + 2)
+    async for bucket in buckets:
+        for entry in sorted(bucket["entries"], key=lambda e: e["seq"], reverse=True):
+            if before is None or entry["seq"] < before:
+                entries.append(entry)
+        if len(entries) > limit:
+            break
+
+    if len(entries) > limit:
+        entries = entries[:limit]
+        return entries, encode_cursor(entries[-1], HISTORY_SORT)
+    return entries, None
+
+
+async def fetch_history_since(collection, npc_id: str, start: int) -> List[Dict[str, Any]]:
+    """Entries numbered ``start`` and up, oldest first."""
+    entries: List[Dict[str, Any]] = []
+    query = {"npc_id": npc_id, "bucket": {"$gte": bucket_of(start)}}
+    async for bucket in collection.find(query, {"_id": 0, "entries": 1}).sort("bucket", 1):
+        entries.extend(entry for entry in bucket["entries"] if entry["seq"] >= start)
+    entries.sort(key=lambda entry: entry["seq"])
+    return entries
@@ -0,0 +1,189 @@
+"""
+Fuzzy NPC identity resolution over character trigrams.
+
+Every known NPC contributes one row per variant of its identity: its name,
+its aliases, and the short form of titled names ("Thorin" for "Thorin the
+Blacksmith" or "Elara, the Barmaid"). Variants are case- and
+whitespace-normalized and broken into padded character trigrams. Each
+trigram keeps a posting list of the rows containing it.
+
+A lookup concatenates the posting lists of the query's trigrams and counts
+the overlap with every row in one ``np.bincount``. It then scores all rows
+at once with the Dice coefficient ``2 * |shared| / (|query| + |row|)`` and
+keeps each NPC's best variant. The cost grows with the total length of the
+postings touched, not with the number of NPCs compared.
+
+A titled query is also scored by its short form, so an extracted "Thorin
+the Blacksmith" finds a tracked "Thorin". Such a match is weighted by
+SHORT_FORM_WEIGHT, which ranks it just below an NPC matching the full name.
+The query's short form is only compared with names and aliases, never with
+other short forms: "Thorin the Younger" and "Thorin the Blacksmith" share
+one, but they are two different characters.
+
+Rows are only appended. Removing an NPC marks its rows dead, and the arrays
+are rebuilt once dead rows outnumber live ones.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+SHORT_FORM_RE = re.compile(r"^(.+?)(?:,| the | of )")
+SHORT_FORM_WEIGHT = 0.95
+INITIAL_CAPACITY = 1024
+
+
+def normalize(name: str) -> str:
+    return " ".join(name.casefold().split())
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def short_form(name: str) -> Optional[str]:
+    """"thorin" for a normalized "thorin the blacksmith" or "thorin, the smith"; None for untitled names."""
+    short = SHORT_FORM_RE.match(name)
+    return (short.group(1).strip() or None) if short else None
+
+
+def name_variants(name: str, aliases: Iterable[str] = ()) -> List[Tuple[str, bool]]:
+    """The normalized name, aliases and short forms an NPC can be referred to by, each with whether it is a short form."""
+    variants: Dict[str, bool] = {}
+    for value in (name, *aliases):
+        value = normalize(value)
+        if value:
+            variants[value] = False
+            short = short_form(value)
+            if short:
+                variants.setdefault(short, True)
+    return list(variants.items())
+
+
+class NPCIdentityIndex:
+    def __init__(self):
+        self._gram_ids: Dict[str, int] = {}
+        self._postings: List[List[int]] = []
+        self._posting_arrays: Dict[int, np.ndarray] = {}
+        self._row_npc: List[str] = []
+        self._row_text: List[str] = []
+        self._sizes = np.zeros(INITIAL_CAPACITY, dtype=np.float32)
+        self._alive = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        self._short = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        self._rows_by_npc: Dict[str, List[int]] = {}
+        self._identity: Dict[str, tuple] = {}
+        self._names: Dict[str, str] = {}
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, npc_id: str, name: str, aliases: Iterable[str] = ()):
+        """Register an NPC, replacing what was known about it before."""
+        aliases = tuple(aliases or ())
+        if self._identity.get(npc_id) == (name, aliases):
+            return
+        self.remove(npc_id)
+        self._identity[npc_id] = (name, aliases)
+        self._names[npc_id] = name
+        rows = self._rows_by_npc[npc_id] = []
+        for variant, short in name_variants(name, aliases):
+            rows.append(self._add_row(npc_id, variant, short))
+
+    def _add_row(self, npc_id: str, text: str, short: bool = False) -> int:
+        row = len(self._row_npc)
+        if row == len(self._sizes):
+            self._sizes = np.concatenate([self._sizes, np.zeros(row, dtype=np.float32)])
+            self._alive = np.concatenate([self._alive, np.zeros(row, dtype=bool)])
+            self._short = np.concatenate([self._short, np.zeros(row, dtype=bool)])
+        grams = trigrams(text)
+        for gram in grams:
+            gram_id = self._gram_ids.setdefault(gram, len(self._gram_ids))
+            if gram_id == len(self._postings):
+                self._postings.append([])
+            self._postings[gram_id].append(row)
+            self._posting_arrays.pop(gram_id, None)
+        self._row_npc.append(npc_id)
+        self._row_text.append(text)
+        self._sizes[row] = len(grams)
+        self._alive[row] = True
+        self._short[row] = short
+        return row
+
+    def remove(self, npc_id: str):
+        rows = self._rows_by_npc.pop(npc_id, None)
+        if rows is None:
+            return
+        del self._identity[npc_id]
+        del self._names[npc_id]
+        self._alive[rows] = False
+        self._dead += len(rows)
+        if self._dead > INITIAL_CAPACITY and self._dead * 2 > len(self._row_npc):
+            self._compact()
+
+    def _compact(self):
+        identities = self._identity
+        self.__init__()
+        for npc_id, (name, aliases) in identities.items():
+            self.add(npc_id, name, aliases)
+
+    def _posting(self, gram_id: int) -> np.ndarray:
+        array = self._posting_arrays.get(gram_id)
+        if array is None:
+            array = self._posting_arrays[gram_id] = np.array(self._postings[gram_id], dtype=np.int64)
+        return array
+
+    def _scores(self, text: str) -> Optional[np.ndarray]:
+        """Dice similarity of ``text`` to every row (0 for dead rows); None if no trigram is known."""
+        grams = trigrams(text)
+        gram_ids = [self._gram_ids[gram] for gram in grams if gram in self._gram_ids]
+        if not gram_ids:
+            return None
+        rows = len(self._row_npc)
+        overlap = np.bincount(np.concatenate([self._posting(gram_id) for gram_id in gram_ids]), minlength=rows)
+        scores = 2.0 * overlap / (len(grams) + self._sizes[:rows])
+        scores[~self._alive[:rows]] = 0.0
+        return scores
+
+    def match(self, name: str, limit: int = 5, threshold: float = 0.5) -> List[Dict[str, object]]:
+        """
+        Known NPCs ``name`` probably refers to, best first: ``{"npc_id",
+        "name", "matched", "score"}`` with ``matched`` the variant that
+        scored best and ``score`` in (0, 1], 1 being an exact match.
+        """
+        query = normalize(name)
+        scores = self._scores(query) if query else None
+        short = short_form(query)
+        if short:
+            short_scores = self._scores(short)
+            if short_scores is not None:
+                short_scores *= SHORT_FORM_WEIGHT
+                short_scores[self._short[:len(short_scores)]] = 0.0
+                scores = short_scores if scores is None else np.maximum(scores, short_scores)
+        if scores is None:
+            return []
+        candidates = np.flatnonzero(scores >= threshold)
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        matches: Dict[str, Dict[str, object]] = {}
+        for row in candidates:
+            npc_id = self._row_npc[row]
+            if npc_id not in matches:
+                matches[npc_id] = {
+                    "npc_id": npc_id,
+                    "name": self._names[npc_id],
+                    "matched": self._row_text[row],
+                    "score": round(float(scores[row]), 3),
+                }
+                if len(matches) == limit:
+                    break
+        return list(matches.values())
+
+    def resolve(self, name: str, threshold: float) -> Optional[Dict[str, object]]:
+        """The one NPC that ``name`` matches best at ``threshold`` or above; None if there is none or a tie."""
+        matches = self.match(name, limit=2, threshold=threshold)
+        if matches and (len(matches) == 1 or matches[0]["score"] > matches[1]["score"]):
+            return matches[0]
+        return None
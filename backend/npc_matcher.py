@@ -0,0 +1,124 @@
+"""
+Aho-Corasick automaton over known NPC names.
+
+Finds every known NPC mentioned in a text in a single linear pass, however
+many NPCs exist. Names are matched case-insensitively on word boundaries.
+Adding, renaming or removing an NPC edits the trie in place; failure links
+are recomputed lazily before the next scan instead of on every edit.
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Set
+
+
+def _normalize(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+class NPCNameMatcher:
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Names ending exactly at each node, and the nearest node on the fail chain that ends one
+        self._out: List[Set[str]] = [set()]
+        self._out_link: List[int] = [0]
+        self._dirty = False
+        self._ids_by_name: Dict[str, Set[str]] = {}
+        self._name_by_id: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._name_by_id)
+
+    def add(self, npc_id: str, name: str) -> bool:
+        """Register (or rename) an NPC; returns False if it was already known by this name."""
+        pattern = _normalize(name)
+        if self._name_by_id.get(npc_id) == pattern:
+            return False
+        self.remove(npc_id)
+        if not pattern:
+            return True
+        self._name_by_id[npc_id] = pattern
+        ids = self._ids_by_name.setdefault(pattern, set())
+        ids.add(npc_id)
+        if len(ids) > 1:
+            return True
+
+        node = 0
+        for char in pattern:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(set())
+                self._out_link.append(0)
+            node = nxt
+        self._out[node].add(pattern)
+        self._dirty = True
+        return True
+
+    def remove(self, npc_id: str):
+        pattern = self._name_by_id.pop(npc_id, None)
+        if pattern is None:
+            return
+        ids = self._ids_by_name[pattern]
+        ids.discard(npc_id)
+        if ids:
+            return
+        del self._ids_by_name[pattern]
+        # Unmark the terminal node; the dead trie path is harmless and reused if the name returns
+        node = 0
+        for char in pattern:
+            node = self._goto[node][char]
+        self._out[node].discard(pattern)
+        self._dirty = True
+
+    def _build_links(self):
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._out_link[child] = 0
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                link = self._fail[child]
+                self._out_link[child] = link if self._out[link] else self._out_link[link]
+                queue.append(child)
+        self._dirty = False
+
+    def _scan(self, text: str, found: Dict[str, None]):
+        goto, fail, out, out_link = self._goto, self._fail, self._out, self._out_link
+        text = text.lower()
+        node = 0
+        for end, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            hit = node if out[node] else out_link[node]
+            while hit:
+                after = end + 1
+                if after == len(text) or not text[after].isalnum():
+                    for pattern in out[hit]:
+                        start = after - len(pattern)
+                        if start == 0 or not text[start - 1].isalnum():
+                            found[pattern] = None
+                hit = out_link[hit]
+
+    def find_ids(self, texts: Iterable[str]) -> List[str]:
+        """Return the ids of every NPC named in ``texts``, in order of first mention."""
+        if self._dirty:
+            self._build_links()
+        found: Dict[str, None] = {}
+        for text in texts:
+            self._scan(text, found)
+        ids: List[str] = []
+        for pattern in found:
+            ids.extend(sorted(self._ids_by_name.get(pattern, ())))
+        return ids
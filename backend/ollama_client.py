@@ -0,0 +1,169 @@
+"""
+Async client for an Ollama-compatible ``/api/generate`` endpoint.
+
+One pooled ``httpx.AsyncClient`` is shared by all calls. A semaphore caps
+how many generations run at once, and callers that would queue beyond
+``max_pending`` are turned away at once, so model calls never pile up on
+the event loop. After a connection failure the client reports itself
+unavailable for a short cooldown instead of timing out on every request.
+
+Results are cached by a hash of (model, task, input). Concurrent calls for
+the same input share one in-flight request, so the same text is never sent
+to the model twice.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaUnavailable(Exception):
+    """The model could not (or should not) be asked right now; callers fall back."""
+
+
+class OllamaClient:
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        timeout: float = 20.0,
+        max_concurrency: int = 2,
+        max_pending: int = 16,
+        cache_size: int = 1024,
+        cooldown: float = 30.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.cooldown = cooldown
+        self._transport = transport
+        self._http: Optional[httpx.AsyncClient] = None
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._max_concurrency = max_concurrency
+        self._waiting = 0
+        self._down_until = 0.0
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+        self._cache_size = cache_size
+        self._in_flight: Dict[str, "asyncio.Future[Any]"] = {}
+        self.calls = 0
+        self.cache_hits = 0
+        self.failures = 0
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+                limits=httpx.Limits(max_connections=self._max_concurrency, max_keepalive_connections=self._max_concurrency),
+                transport=self._transport,
+            )
+        return self._http
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def generate(self, prompt: str, system: str = "", json_output: bool = False) -> str:
+        if time.monotonic() < self._down_until:
+            raise OllamaUnavailable("model server is cooling down after a failure")
+        if self._waiting >= self.max_pending:
+            raise OllamaUnavailable("too many model calls queued")
+        payload: Dict[str, Any] = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": False,
+            "options": {"temperature": 0},
+        }
+        if system:
+            payload["system"] = system
+        if json_output:
+            payload["format"] = "json"
+
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            self.calls += 1
+            response = await asyncio.wait_for(self._client().post("/api/generate", json=payload), self.timeout)
+            response.raise_for_status()
+            return response.json()["response"]
+        except (httpx.TransportError, asyncio.TimeoutError) as exc:
+            self.failures += 1
+            self._down_until = time.monotonic() + self.cooldown
+            raise OllamaUnavailable(f"model server unreachable: {exc!r}") from exc
+        except (httpx.HTTPStatusError, KeyError, ValueError) as exc:
+            self.failures += 1
+            raise OllamaUnavailable(f"unexpected model server response: {exc!r}") from exc
+        finally:
+            self._slots.release()
+
+    def _key(self, task: str, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\x00{task}\x00{text}".encode()).hexdigest()
+
+    async def cached(self, task: str, text: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached result of ``task`` for ``text``, computing it at most once."""
+        key = self._key(task, text)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return self._cache[key]
+        if key in self._in_flight:
+            self.cache_hits += 1
+            return await asyncio.shield(self._in_flight[key])
+
+        future: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await compute()
+        except BaseException as exc:
+            # Failures are not cached. Waiters sharing this call get an OllamaUnavailable so they fall
+            # back too, rather than inheriting the owner's cancellation or an unexpected error
+            if not isinstance(exc, OllamaUnavailable):
+                future.set_exception(OllamaUnavailable(f"shared model call failed: {exc!r}"))
+            else:
+                future.set_exception(exc)
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            self._cache[key] = result
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+            return result
+        finally:
+            del self._in_flight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "cached": len(self._cache),
+            "failures": self.failures,
+            "queued": self._waiting,
+            "available": time.monotonic() >= self._down_until,
+        }
+
+
+def parse_json_object(raw: str) -> Dict[str, Any]:
+    """Parse a model's JSON-mode reply, tolerating prose around the object."""
+    start, end = raw.find("{"), raw.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("no JSON object in model reply")
+    value = json.loads(raw[start:end + 1])
+    if not isinstance(value, dict):
+        raise ValueError("model reply is not a JSON object")
+    return value
@@ -0,0 +1,114 @@
+"""
+Keyset (cursor) pagination helpers for Motor collections.
+
+A page is fetched by sorting on a fixed, unique compound key (e.g.
+``created_at`` + ``id``) and resuming strictly after the last key seen, so
+every page costs the same regardless of how deep into the collection it is.
+The cursor handed to clients is an opaque, URL-safe token wrapping that key.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+# (field, direction) pairs as accepted by Motor's ``sort``; 1 = ascending, -1 = descending
+SortSpec = Sequence[Tuple[str, int]]
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a client supplies a cursor we did not issue."""
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$dt" in value:
+        return datetime.fromisoformat(value["$dt"])
+    return value
+
+
+def encode_cursor(doc: Dict[str, Any], sort: SortSpec) -> str:
+    """Build the opaque cursor pointing just after ``doc``."""
+    key = [_encode_value(doc.get(field)) for field, _ in sort]
+    raw = json.dumps(key, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: SortSpec) -> List[Any]:
+    """Turn a cursor back into the sort-key values it was built from."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursorError("Malformed cursor") from exc
+    if not isinstance(key, list) or len(key) != len(sort):
+        raise InvalidCursorError("Cursor does not match this listing")
+    try:
+        return [_decode_value(value) for value in key]
+    except ValueError as exc:
+        raise InvalidCursorError("Malformed cursor") from exc
+
+
+def keyset_filter(sort: SortSpec, key: List[Any]) -> Dict[str, Any]:
+    """
+    Build the query selecting every document strictly after ``key`` in
+    ``sort`` order, i.e. (a > x) OR (a == x AND b > y) OR ...
+    """
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {prev_field: key[j] for j, (prev_field, _) in enumerate(sort[:i])}
+        clause[field] = {"$gt" if direction > 0 else "$lt": key[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+async def fetch_page(
+    collection,
+    sort: SortSpec,
+    limit: int,
+    cursor: Optional[str] = None,
+    query: Optional[Dict[str, Any]] = None,
+    projection: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Fetch one page of ``limit`` documents and the cursor for the next page
+    (``None`` once the listing is exhausted).
+    """
+    filters = [query] if query else []
+    if cursor:
+        filters.append(keyset_filter(sort, decode_cursor(cursor, sort)))
+    if not filters:
+        mongo_query: Dict[str, Any] = {}
+    elif len(filters) == 1:
+        mongo_query = filters[0]
+    else:
+        mongo_query = {"$and": filters}
+
+    # Read one extra document to learn whether another page exists
+    docs = await collection.find(mongo_query, projection).sort(list(sort)).to_list(limit + 1)
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, encode_cursor(docs[-1], sort)
+    return docs, None
+
+
+async def iter_pages(
+    collection,
+    sort: SortSpec,
+    page_size: int,
+    query: Optional[Dict[str, Any]] = None,
+    projection: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Yield every page of the listing in order, holding one page in memory at a time."""
+    cursor = None
+    while True:
+        docs, cursor = await fetch_page(collection, sort, page_size, cursor, query, projection)
+        if docs:
+            yield docs
+        if cursor is None:
+            return
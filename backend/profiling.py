@@ -0,0 +1,225 @@
+"""
+On-demand profiling of single requests.
+
+An authorized request asks to be profiled with an ``X-Profile`` header or a
+``profile`` query parameter. The value ``cprofile`` (the default) records a
+deterministic cProfile trace; ``sample`` records a statistical stack sample
+of the event-loop thread. With ``sample_every`` set, one request in N is
+also profiled in sample mode without asking.
+
+Only one request is profiled at a time, and a request arriving meanwhile
+simply runs unprofiled. Both modes observe the event-loop thread, so
+coroutines of other requests that interleave with the profiled one show up
+in its profile as well.
+
+Finished profiles go into a ring buffer holding the latest ``capacity``.
+They can be downloaded as marshalled pstats (open with ``pstats.Stats``
+or snakeviz), a text report, or collapsed stacks for flame graph tools.
+
+When profiling is disabled, the middleware is not installed, so requests
+pay nothing.
+"""
+
+import asyncio
+import cProfile
+import io
+import itertools
+import marshal
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional
+from urllib.parse import parse_qs
+
+HEADER = b"x-profile"
+QUERY_PARAM = "profile"
+MODES = ("cprofile", "sample")
+SAMPLE_INTERVAL = 0.005
+TEXT_REPORT_LINES = 60
+
+
+@dataclass
+class Profile:
+    id: str
+    mode: str
+    method: str
+    path: str
+    route: str
+    status: int
+    duration: float
+    started_at: datetime
+    sampled: bool
+    stats: Optional[Dict[Any, Any]] = None
+    stacks: Counter = field(default_factory=Counter)
+
+    def summary(self) -> Dict[str, Any]:
+        formats = ["pstats", "text"] if self.mode == "cprofile" else ["collapsed"]
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "duration": round(self.duration, 6),
+            "started_at": self.started_at,
+            "sampled": self.sampled,
+            "formats": formats,
+        }
+
+    def pstats_bytes(self) -> bytes:
+        return marshal.dumps(self.stats)
+
+    def text_report(self) -> str:
+        stats = pstats.Stats(_StatsSource(self.stats), stream=io.StringIO())
+        stats.sort_stats("cumulative").print_stats(TEXT_REPORT_LINES)
+        return stats.stream.getvalue()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class _StatsSource:
+    """Lets pstats.Stats load a stats dict that was never written to a file."""
+
+    def __init__(self, stats: Dict[Any, Any]):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class StackSampler:
+    """Samples the call stack of one thread from a helper thread."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    async def stop(self) -> Counter:
+        """Stop sampling; the join runs in a worker thread so the event loop keeps serving."""
+        self._stop.set()
+        await asyncio.to_thread(self._thread.join)
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+
+class ProfileStore:
+    def __init__(self, capacity: int = 20):
+        self._profiles: Deque[Profile] = deque(maxlen=capacity)
+
+    def add(self, profile: Profile):
+        self._profiles.append(profile)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [profile.summary() for profile in reversed(self._profiles)]
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        return next((profile for profile in self._profiles if profile.id == profile_id), None)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app, store: ProfileStore, authorize: Callable[[str], bool], sample_every: int = 0):
+        self.app = app
+        self.store = store
+        self.authorize = authorize
+        self.sample_every = sample_every
+        self._requests = itertools.count(1)
+        self._busy = False
+
+    def _requested_mode(self, scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == HEADER:
+                return value.decode("latin-1").strip().lower() or "cprofile"
+        if QUERY_PARAM.encode() in scope.get("query_string", b""):
+            values = parse_qs(scope["query_string"].decode("latin-1")).get(QUERY_PARAM)
+            if values:
+                return values[0].strip().lower() or "cprofile"
+        return None
+
+    def _authorized(self, scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                return self.authorize(value.decode("latin-1"))
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._busy:
+            return await self.app(scope, receive, send)
+
+        mode = self._requested_mode(scope)
+        sampled = False
+        if mode in ("0", "false", "off"):
+            mode = None
+        elif mode is not None:
+            if mode not in MODES:
+                mode = "cprofile"
+            if not self._authorized(scope):
+                mode = None
+        if mode is None and self.sample_every and next(self._requests) % self.sample_every == 0:
+            mode, sampled = "sample", True
+        if mode is None:
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self._busy = True
+        profiler = sampler = None
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            sampler = StackSampler(threading.get_ident())
+            sampler.start()
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - started
+            profile = Profile(
+                id=str(uuid.uuid4()),
+                mode=mode,
+                method=scope["method"],
+                path=scope["path"],
+                route=getattr(scope.get("route"), "path", "") or "",
+                status=status,
+                duration=duration,
+                started_at=started_at,
+                sampled=sampled,
+            )
+            if profiler is not None:
+                profiler.disable()
+                profiler.create_stats()
+                profile.stats = profiler.stats
+            self._busy = False
+            if sampler is not None:
+                profile.stacks = await sampler.stop()
+            self.store.add(profile)
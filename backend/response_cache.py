@@ -0,0 +1,144 @@
+"""
+Write-invalidated cache of serialized read responses.
+
+Entries hold the exact bytes and headers of a response and are tagged with
+the collections they were read from. Write handlers invalidate a tag, which
+drops every entry built from that collection. Each tag also carries a
+generation number so a response built while a write was in flight is never
+stored after that write's invalidation.
+
+The storage is behind ``CacheBackend``; ``InMemoryCacheBackend`` (an LRU
+with a TTL) serves a single worker. A multi-worker deployment plugs in a
+backend whose ``invalidate`` is broadcast to every worker.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+    media_type: str = "application/json"
+
+    def response(self) -> Response:
+        return Response(self.body, headers=self.headers, media_type=self.media_type)
+
+
+class CacheBackend:
+    """Storage interface for ResponseCache."""
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: CachedResponse, tags: Iterable[str], generations: Tuple[int, ...]):
+        """Store ``value`` unless any of ``tags`` moved past ``generations`` meanwhile."""
+        raise NotImplementedError
+
+    async def generations(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        raise NotImplementedError
+
+    async def invalidate(self, tag: str):
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return 0
+
+
+class InMemoryCacheBackend(CacheBackend):
+    def __init__(self, max_entries: int = 256, ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, CachedResponse, Tuple[str, ...]]]" = OrderedDict()
+        self._keys_by_tag: Dict[str, set] = {}
+        self._generations: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, key: str):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: CachedResponse, tags: Iterable[str], generations: Tuple[int, ...]):
+        tags = tuple(tags)
+        if await self.generations(tags) != generations:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+        for tag in tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    async def generations(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    async def invalidate(self, tag: str):
+        self._generations[tag] = self._generations.get(tag, 0) + 1
+        for key in list(self._keys_by_tag.pop(tag, ())):
+            if key in self._entries:
+                self._drop(key)
+
+
+def request_key(request: Request) -> str:
+    """Cache key for a request: its path plus its query parameters in a canonical order."""
+    return request.url.path + "?" + "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+
+
+class ResponseCache:
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_build(
+        self, key: str, tags: Iterable[str], build: Callable[[], Awaitable[Optional[CachedResponse]]]
+    ) -> Optional[CachedResponse]:
+        """Return the cached response for ``key``, building and storing it on a miss.
+
+        ``build`` may return None for responses that must not be cached.
+        """
+        cached = await self.backend.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        tags = tuple(tags)
+        generations = await self.backend.generations(tags)
+        built = await build()
+        if built is not None:
+            await self.backend.set(key, built, tags, generations)
+        return built
+
+    async def invalidate(self, tag: str):
+        await self.backend.invalidate(tag)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,315 @@
+"""
+In-process inverted index with BM25 ranking over sessions and NPCs.
+
+Documents are indexed as a list of text fields; token positions are kept so
+quoted phrases can be matched exactly, and the vocabulary is held sorted so
+``prefix*`` terms expand with a binary search. The index is updated in
+place by the write handlers, so a search never touches MongoDB.
+
+Every document gets an integer row. For each term the rows it occurs in and
+its frequency there are cached as NumPy arrays, so a query term is scored
+for all of its documents in one vectorized BM25 expression and accumulated
+into a dense score array; the top hits come from ``argpartition``. Phrase
+terms additionally cache their positions as sorted ``row << 32 | position``
+codes: a phrase is anchored on its rarest token and the other tokens are
+checked with ``searchsorted``. A write marks its row stale in the cached
+arrays of the terms it touched, and the next query using such a term
+splices that row's entries in place rather than rebuilding the arrays.
+"""
+
+import bisect
+import itertools
+import math
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"\w+")
+QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Cap on how many vocabulary terms a single prefix may expand into
+MAX_PREFIX_EXPANSIONS = 64
+INITIAL_CAPACITY = 1024
+POSITION_BITS = 32
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.casefold())
+
+
+class SearchIndex:
+    def __init__(self):
+        # term -> {doc key -> positions of the term in that document}
+        self._postings: Dict[str, Dict[str, List[int]]] = {}
+        self._doc_terms: Dict[str, List[str]] = {}
+        self._meta: Dict[str, Dict[str, Any]] = {}
+        self._total_len = 0
+        self._vocab: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._keys: List[Optional[str]] = []
+        self._lengths = np.zeros(INITIAL_CAPACITY, dtype=np.float64)
+        self._kinds = np.zeros(INITIAL_CAPACITY, dtype=np.int16)
+        self._kind_codes: Dict[str, int] = {}
+        self._dead = 0
+        # term -> (rows, term frequencies) and term -> sorted position codes
+        self._term_arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._position_codes: Dict[str, np.ndarray] = {}
+        # term -> rows written since its arrays were cached
+        self._stale: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @staticmethod
+    def key(kind: str, doc_id: str) -> str:
+        return f"{kind}:{doc_id}"
+
+    def add(self, kind: str, doc_id: str, fields: Iterable[str], meta: Optional[Dict[str, Any]] = None):
+        """Index (or re-index) one document made of several text fields."""
+        key = self.key(kind, doc_id)
+        self._unindex(key)
+
+        positions: Dict[str, List[int]] = defaultdict(list)
+        offset = 0
+        for field in fields:
+            tokens = tokenize(field)
+            for i, token in enumerate(tokens):
+                positions[token].append(offset + i)
+            # Leave a gap so phrases never match across two fields
+            offset += len(tokens) + 1
+
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = len(self._keys)
+            if row == len(self._lengths):
+                self._lengths = np.concatenate([self._lengths, np.zeros_like(self._lengths)])
+                self._kinds = np.concatenate([self._kinds, np.zeros_like(self._kinds)])
+            self._keys.append(key)
+
+        for term, term_positions in positions.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                bisect.insort(self._vocab, term)
+            postings[key] = term_positions
+            self._touch(term, row)
+
+        self._lengths[row] = offset
+        self._kinds[row] = self._kind_codes.setdefault(kind, len(self._kind_codes))
+        self._doc_terms[key] = list(positions)
+        self._total_len += offset
+        self._meta[key] = {"type": kind, "id": doc_id, **(meta or {})}
+
+    def _unindex(self, key: str):
+        """Drop a document's postings, keeping its row."""
+        terms = self._doc_terms.pop(key, None)
+        if terms is None:
+            return
+        row = self._rows[key]
+        for term in terms:
+            postings = self._postings[term]
+            del postings[key]
+            if postings:
+                self._touch(term, row)
+            else:
+                del self._postings[term]
+                del self._vocab[bisect.bisect_left(self._vocab, term)]
+                self._forget(term)
+        self._total_len -= int(self._lengths[row])
+        self._lengths[row] = 0
+        del self._meta[key]
+
+    def remove(self, kind: str, doc_id: str):
+        key = self.key(kind, doc_id)
+        self._unindex(key)
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+        self._keys[row] = None
+        self._dead += 1
+        if self._dead > INITIAL_CAPACITY and self._dead * 2 > len(self._keys):
+            self._compact()
+
+    def _compact(self):
+        """Renumber the live rows densely."""
+        live = [key for key in self._keys if key is not None]
+        lengths = self._lengths[[self._rows[key] for key in live]]
+        kinds = self._kinds[[self._rows[key] for key in live]]
+        capacity = max(INITIAL_CAPACITY, len(live))
+        self._lengths = np.zeros(capacity, dtype=np.float64)
+        self._lengths[:len(live)] = lengths
+        self._kinds = np.zeros(capacity, dtype=np.int16)
+        self._kinds[:len(live)] = kinds
+        self._keys = live
+        self._rows = {key: row for row, key in enumerate(live)}
+        self._dead = 0
+        self._term_arrays.clear()
+        self._position_codes.clear()
+        self._stale.clear()
+
+    def _forget(self, term: str):
+        self._term_arrays.pop(term, None)
+        self._position_codes.pop(term, None)
+        self._stale.pop(term, None)
+
+    def _touch(self, term: str, row: int):
+        """Note that ``row`` changed under ``term``; its cached arrays are patched on next use."""
+        if term in self._term_arrays or term in self._position_codes:
+            self._stale.setdefault(term, set()).add(row)
+
+    def _refresh(self, term: str):
+        dirty = self._stale.pop(term, None)
+        if not dirty:
+            return
+        postings = self._postings[term]
+        if len(dirty) * 4 > len(postings):
+            # Rebuilding is cheaper than patching this many rows
+            self._forget(term)
+            return
+        dirty_rows = np.fromiter(dirty, dtype=np.int64, count=len(dirty))
+        # Rows that still contain the term, with their fresh positions
+        present = sorted(row for row in dirty if self._keys[row] in postings)
+        fresh = [postings[self._keys[row]] for row in present]
+
+        arrays = self._term_arrays.get(term)
+        if arrays is not None:
+            rows, frequencies = arrays
+            keep = ~np.isin(rows, dirty_rows)
+            self._term_arrays[term] = (
+                np.concatenate([rows[keep], np.array(present, dtype=np.int64)]),
+                np.concatenate([frequencies[keep], np.array([len(p) for p in fresh], dtype=np.float64)]),
+            )
+        codes = self._position_codes.get(term)
+        if codes is not None:
+            codes = codes[~np.isin(codes >> POSITION_BITS, dirty_rows)]
+            if present:
+                added = np.concatenate([(row << POSITION_BITS) | np.array(p, dtype=np.int64) for row, p in zip(present, fresh)])
+                codes = np.insert(codes, np.searchsorted(codes, added), added)
+            self._position_codes[term] = codes
+
+    def _arrays(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        self._refresh(term)
+        arrays = self._term_arrays.get(term)
+        if arrays is None:
+            postings = self._postings.get(term)
+            if not postings:
+                return None
+            rows = np.fromiter(map(self._rows.__getitem__, postings), dtype=np.int64, count=len(postings))
+            frequencies = np.fromiter(map(len, postings.values()), dtype=np.float64, count=len(postings))
+            arrays = self._term_arrays[term] = (rows, frequencies)
+        return arrays
+
+    def _bm25(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """The rows containing ``term`` and the term's BM25 score in each."""
+        arrays = self._arrays(term)
+        if arrays is None:
+            return None
+        rows, tf = arrays
+        n_docs = len(self._rows)
+        avg_len = self._total_len / n_docs if n_docs else 0.0
+        idf = math.log(1 + (n_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+        if not avg_len:
+            return rows, idf * tf * (K1 + 1) / (tf + K1)
+        base, slope = K1 * (1 - B), K1 * B / avg_len
+        return rows, idf * tf * (K1 + 1) / (tf + base + slope * self._lengths[rows])
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self._vocab, prefix)
+        terms = []
+        for term in self._vocab[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def _positions(self, term: str) -> np.ndarray:
+        self._refresh(term)
+        codes = self._position_codes.get(term)
+        if codes is None:
+            postings = self._postings[term]
+            keys = sorted(postings, key=self._rows.__getitem__)
+            rows = np.fromiter(map(self._rows.__getitem__, keys), dtype=np.int64, count=len(keys))
+            counts = np.fromiter((len(postings[key]) for key in keys), dtype=np.int64, count=len(keys))
+            positions = np.fromiter(
+                itertools.chain.from_iterable(postings[key] for key in keys), dtype=np.int64, count=int(counts.sum())
+            )
+            codes = self._position_codes[term] = (np.repeat(rows, counts) << POSITION_BITS) | positions
+        return codes
+
+    def _phrase_rows(self, tokens: List[str]) -> np.ndarray:
+        if not all(token in self._postings for token in tokens):
+            return np.zeros(0, dtype=np.int64)
+        codes = [self._positions(token) for token in tokens]
+        anchor = min(range(len(tokens)), key=lambda i: len(codes[i]))
+        # Where the phrase would start, going by each occurrence of its rarest token
+        starts = codes[anchor] - anchor
+        for offset, other in enumerate(codes):
+            if offset == anchor:
+                continue
+            wanted = starts + offset
+            found = np.minimum(np.searchsorted(other, wanted), len(other) - 1)
+            starts = starts[other[found] == wanted]
+            if not len(starts):
+                break
+        return np.unique(starts >> POSITION_BITS)
+
+    def phrase_matches(self, kind: str, phrase: str) -> List[str]:
+        """Ids of every ``kind`` document containing ``phrase`` verbatim (ignoring case)."""
+        tokens = tokenize(phrase)
+        if not tokens:
+            return []
+        prefix = f"{kind}:"
+        keys = (self._keys[row] for row in self._phrase_rows(tokens).tolist())
+        return [self._meta[key]["id"] for key in keys if key.startswith(prefix)]
+
+    def search(self, query: str, limit: int = 20, kinds: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Rank documents for ``query``. Bare words and ``prefix*`` terms are
+        scored with BM25; every ``"quoted phrase"`` must match exactly.
+        """
+        size = len(self._keys)
+        scores = np.zeros(size, dtype=np.float64)
+        required: Optional[np.ndarray] = None
+
+        def accumulate(term: str):
+            scored = self._bm25(term)
+            if scored is not None:
+                scores[scored[0]] += scored[1]
+
+        for phrase, word in QUERY_RE.findall(query):
+            if phrase:
+                tokens = tokenize(phrase)
+                if not tokens:
+                    continue
+                matches = np.zeros(size, dtype=bool)
+                matches[self._phrase_rows(tokens)] = True
+                required = matches if required is None else required & matches
+                for token in tokens:
+                    accumulate(token)
+            elif word.endswith("*") and tokenize(word):
+                # A prefix contributes its best-matching expansion, not their sum
+                best = np.zeros(size, dtype=np.float64)
+                for term in self._expand_prefix(tokenize(word)[-1]):
+                    rows, term_scores = self._bm25(term)
+                    best[rows] = np.maximum(best[rows], term_scores)
+                scores += best
+            else:
+                for token in tokenize(word):
+                    accumulate(token)
+
+        if required is not None:
+            scores[~required] = 0.0
+        if kinds is not None:
+            codes = [self._kind_codes[kind] for kind in kinds if kind in self._kind_codes]
+            scores[~np.isin(self._kinds[:size], codes)] = 0.0
+
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > limit:
+            hits = hits[np.argpartition(-scores[hits], limit - 1)[:limit]] if limit > 0 else hits[:0]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [{**self._meta[self._keys[row]], "score": round(float(scores[row]), 4)} for row in hits.tolist()]
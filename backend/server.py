@@ -1,26 +1,112 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import os
+import sys
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Optional, Dict, Any, Tuple
 import uuid
 from datetime import datetime, date
 import secrets
-import re
+import asyncio
+import base64
+import hashlib
+import hmac
+import time
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Make sibling modules importable whether the app is started as `server:app` or `backend.server:app`
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from pagination import InvalidCursorError, fetch_page, iter_pages
+from fast_json import FastJSONResponse, dumps, projection_for
+from metrics import (
+    CONTENT_TYPE, LAG_BUCKETS, Counter, Gauge, Histogram, LoopLagMonitor, MetricsMiddleware, MongoCommandListener, Registry,
+)
+from profiling import ProfileStore, ProfilingMiddleware
+from etags import ChangeCounters, cache_headers, matches, not_modified, weak_etag
+from analytics import campaign_analytics, reset_session_stats
+from change_feed import ChangeFeed
+from write_behind import WriteBehindBuffer
+from job_queue import JobQueue, JobQueueFull, PermanentJobError
+from live_hub import RESYNC, InMemoryFanout, LiveHub
+from missions import MISSION_LIST_PROJECTION, MISSION_SORT, mission_key, remove_session_missions, sync_session_missions
+from campaign_archive import (
+    ArchiveFormatError, BatchWriter, ImportSummary, export_records, gzip_chunks, read_records, revive_timestamps,
+)
+from response_cache import CachedResponse, InMemoryCacheBackend, ResponseCache, request_key
+from summarizer import DEFAULT_SENTENCES, HistorySummaries, summarize_text
+from session_render import FORMATS, document_prefix, document_suffix, render_fragment, separator
+from db_indexes import audit_query_plans, ensure_indexes, index_drift
+from document_text import iter_text, npc_description, npc_text, session_text
+from search_index import SearchIndex
+from vector_index import VectorIndex
+from npc_extraction import name_extractor
+from ollama_client import OllamaClient, OllamaUnavailable, parse_json_object
+from npc_matcher import NPCNameMatcher
+from npc_identity import NPCIdentityIndex
+from session_patch import InvalidPatchError, PatchRound, StructuredPatchCompiler, first_missing_item
+from npc_history import (
+    RECENT_HISTORY, bucket_documents, fetch_history_page, fetch_history_since, history_bucket_updates, interaction_upsert,
+)
+
+# Prometheus metrics served at /metrics
+metrics_registry = Registry()
+http_request_duration = metrics_registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and status", ("method", "route", "status"),
+))
+http_requests_in_flight = metrics_registry.register(Gauge("http_requests_in_flight", "HTTP requests being served"))
+mongo_command_duration = metrics_registry.register(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency reported by the server", ("command", "collection"),
+))
+mongo_command_failures = metrics_registry.register(Counter(
+    "mongodb_command_failures_total", "MongoDB commands that failed", ("command", "collection"),
+))
+event_loop_lag = metrics_registry.register(Histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a sleeping task", buckets=LAG_BUCKETS,
+))
+loop_lag_monitor = LoopLagMonitor(event_loop_lag)
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandListener(mongo_command_duration, mongo_command_failures)])
 db = client[os.environ['DB_NAME']]
 
+# List pagination
+DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', 100))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 500))
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 256))
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 30))
+AUTOSAVE_WINDOW = float(os.environ.get('AUTOSAVE_WINDOW', 1.0))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_QUEUE_LIMIT = int(os.environ.get('JOB_QUEUE_LIMIT', 1000))
+JOB_MAX_WAIT = 30.0
+RENDER_CACHE_SIZE = int(os.environ.get('RENDER_CACHE_SIZE', 1024))
+RENDER_CACHE_TTL = float(os.environ.get('RENDER_CACHE_TTL', 3600))
+IDENTITY_MATCH_THRESHOLD = float(os.environ.get('IDENTITY_MATCH_THRESHOLD', 0.6))
+IDENTITY_MERGE_THRESHOLD = float(os.environ.get('IDENTITY_MERGE_THRESHOLD', 0.9))
+SUMMARY_CACHE_SIZE = int(os.environ.get('SUMMARY_CACHE_SIZE', 1024))
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+PROFILE_SAMPLE_EVERY = int(os.environ.get('PROFILE_SAMPLE_EVERY', 0))
+PROFILE_BUFFER_SIZE = int(os.environ.get('PROFILE_BUFFER_SIZE', 20))
+VECTOR_DIM = int(os.environ.get('VECTOR_DIM', 384))
+VECTOR_INDEX_DIR = os.environ.get('VECTOR_INDEX_DIR', '')
+VECTOR_IVF_MIN_ROWS = int(os.environ.get('VECTOR_IVF_MIN_ROWS', 50000))
+VECTOR_IVF_PROBES = int(os.environ.get('VECTOR_IVF_PROBES', 8))
+SESSION_SORT = [("created_at", -1), ("id", -1)]
+NPC_SORT = [("name", 1), ("id", 1)]
+RECAP_SORT = [("created_at", 1), ("id", 1)]
+
 # Create the main app without a prefix
 app = FastAPI()
 
@@ -30,11 +116,23 @@ api_router = APIRouter(prefix="/api")
 # Basic authentication
 security = HTTPBasic()
 
+def valid_credentials(username: str, password: str) -> bool:
+    correct_username = secrets.compare_digest(username, "admin")
+    correct_password = secrets.compare_digest(password, "admin")
+    return correct_username and correct_password
+
+def authorization_valid(header: str) -> bool:
+    """Check a raw Basic Authorization header, for callers outside FastAPI's dependency injection"""
+    scheme, _, encoded = header.partition(" ")
+    try:
+        username, _, password = base64.b64decode(encoded).decode().partition(":")
+    except ValueError:
+        return False
+    return scheme.lower() == "basic" and valid_credentials(username, password)
+
 # Simple auth function
 def authenticate(credentials: HTTPBasicCredentials = Depends(security)):
-    correct_username = secrets.compare_digest(credentials.username, "admin")
-    correct_password = secrets.compare_digest(credentials.password, "admin")
-    if not (correct_username and correct_password):
+    if not valid_credentials(credentials.username, credentials.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -92,6 +190,26 @@ class SessionStructuredData(BaseModel):
     next_session_goals: str = ""
     overarching_missions: List[OverarchingMission] = Field(default_factory=list)
 
+# Typed in-place edits of structured_data; see session_patch for how they map to Mongo updates
+class StructuredOperation(BaseModel):
+    op: str = Field(..., pattern="^(append|update|remove|set)$")
+    field: str  # structured_data field, e.g. "loot" or "session_goal"
+    item: Optional[Any] = None  # append: the new item (or string for string lists)
+    item_id: Optional[str] = None  # update/remove: id of the list item
+    fields: Optional[Dict[str, Any]] = None  # update: item fields to change
+    value: Optional[Any] = None  # set: new field value; remove: string to drop from a string list
+
+class StructuredSessionPatch(BaseModel):
+    operations: List[StructuredOperation]
+
+structured_patch_compiler = StructuredPatchCompiler(SessionStructuredData, {
+    "combat_encounters": CombatEncounter,
+    "roleplay_encounters": RoleplayEncounter,
+    "npcs_encountered": NPCMention,
+    "loot": LootItem,
+    "overarching_missions": OverarchingMission,
+})
+
 class SessionCreate(BaseModel):
     title: str
     content: str = ""  # Free-form content for backward compatibility
@@ -114,9 +232,13 @@ class Session(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Read handlers project exactly these fields and serialize the raw documents
+SESSION_PROJECTION = projection_for(Session)
+
 # NPC Models (keeping existing structure)
 class NPCCreate(BaseModel):
     name: str
+    aliases: List[str] = Field(default_factory=list)
     status: str = "Unknown"
     race: str = ""
     class_role: str = ""
@@ -127,6 +249,7 @@ class NPCCreate(BaseModel):
 
 class NPCUpdate(BaseModel):
     name: Optional[str] = None
+    aliases: Optional[List[str]] = None
     status: Optional[str] = None
     race: Optional[str] = None
     class_role: Optional[str] = None
@@ -138,6 +261,7 @@ class NPCUpdate(BaseModel):
 class NPC(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
+    aliases: List[str] = Field(default_factory=list)
     status: str = "Unknown"
     race: str = ""
     class_role: str = ""
@@ -145,66 +269,287 @@ class NPC(BaseModel):
     quirks_mannerisms: str = ""
     background: str = ""
     notes: str = ""
-    history: List[Dict[str, Any]] = Field(default_factory=list)
+    history: List[Dict[str, Any]] = Field(default_factory=list)  # latest RECENT_HISTORY entries only
+    history_count: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+NPC_PROJECTION = projection_for(NPC)
+
 class NPCExtraction(BaseModel):
     session_id: str
     extracted_text: str
     npc_name: str
 
-# Ollama LLM Placeholder Class
+class NPCExtractionBulk(BaseModel):
+    extractions: List[NPCExtraction]
+
+class NPCSuggestionBatch(BaseModel):
+    texts: List[str]
+
+class TextPayload(BaseModel):
+    text: str
+
+class JobSubmission(BaseModel):
+    kind: str
+    payload: Dict[str, Any] = Field(default_factory=dict)
+    priority: int = 0
+
+# Ollama-backed LLM service with a rule-based fallback
 class OllamaLLMService:
     """
-    Placeholder class for Ollama LLM integration.
-    Currently uses rule-based logic, but designed to be easily replaced
-    with actual Ollama API calls.
+    NPC extraction and summarization through an Ollama model server.
+
+    Enabled when OLLAMA_URL is set. Whenever the model is disabled, busy,
+    unreachable or answers with something unusable, the rule-based logic
+    answers instead, so callers always get a result.
     """
-    
-    def __init__(self):
-        self.enabled = False  # Set to True when Ollama is configured
-        
+
+    NPC_PROMPT = (
+        "List the names of the non-player characters (people, creatures or named beings) "
+        "mentioned in the following D&D session notes. Reply with JSON of the form "
+        '{"npcs": ["Name", ...]} and nothing else.\n\nNotes:\n'
+    )
+    SUMMARY_PROMPT = (
+        "Summarize the following interaction with an NPC from a D&D session in one sentence "
+        "of at most 100 characters. Reply with the sentence only.\n\nInteraction:\n"
+    )
+
+    def __init__(self, client: Optional[OllamaClient] = None):
+        self.client = client
+        self.enabled = client is not None
+
+    async def _ask_npcs(self, text: str) -> List[str]:
+        raw = await self.client.generate(self.NPC_PROMPT + text, json_output=True)
+        try:
+            reply = parse_json_object(raw)
+        except ValueError as exc:
+            # Chatty models sometimes answer in prose despite JSON mode
+            raise OllamaUnavailable(f"unusable model reply: {exc}")
+        names = reply.get("npcs")
+        if not isinstance(names, list):
+            raise OllamaUnavailable("model reply has no npcs list")
+        # Only keep names that actually occur in the text; models invent the rest
+        lowered = text.lower()
+        found: Dict[str, str] = {}
+        for name in names:
+            if isinstance(name, str):
+                name = " ".join(name.split())
+                if name and name.lower() in lowered:
+                    found.setdefault(name.lower(), name)
+        return list(found.values())
+
     async def extract_npcs_from_text(self, text: str) -> List[str]:
         """
-        Placeholder for NPC extraction using LLM.
-        Currently uses simple pattern matching.
+        Extract NPC names from text with the model, falling back to pattern matching.
+        """
+        if self.enabled and text.strip():
+            try:
+                return await self.client.cached("npcs", text, lambda: self._ask_npcs(text))
+            except OllamaUnavailable as exc:
+                logger.warning("Ollama NPC extraction unavailable, using rules: %s", exc)
+
+        return name_extractor.extract(text)
+
+    async def extract_npcs_from_texts(self, texts: List[str]) -> List[List[str]]:
+        """
+        Batch variant of extract_npcs_from_text.
         """
         if self.enabled:
-            # TODO: Implement actual Ollama API call
-            pass
-        
-        # Simple rule-based extraction for now
-        patterns = [
-            r'\b([A-Z][a-z]+ (?:the )?[A-Z][a-z]+)\b',  # "Thorin the Blacksmith"
-            r'\b([A-Z][a-z]+ [A-Z][a-z]+)\b',           # "John Smith"
-            r'NPC:\s*([A-Za-z\s]+)',                     # "NPC: Character Name"
-        ]
-        
-        extracted_names = []
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            extracted_names.extend(matches)
-        
-        # Remove duplicates and common words
-        common_words = {'The Game', 'The Party', 'The Group', 'Game Master', 'Dungeon Master'}
-        return [name.strip() for name in set(extracted_names) if name.strip() not in common_words]
-    
+            # The client's concurrency limit paces these; failed texts fall back individually
+            return list(await asyncio.gather(*(self.extract_npcs_from_text(text) for text in texts)))
+
+        return name_extractor.extract_many(texts)
+
+    async def _ask_summary(self, interaction_text: str) -> str:
+        summary = " ".join((await self.client.generate(self.SUMMARY_PROMPT + interaction_text)).split())
+        if not summary:
+            raise OllamaUnavailable("model returned an empty summary")
+        return summary
+
     async def summarize_interaction(self, interaction_text: str) -> str:
         """
-        Placeholder for interaction summarization using LLM.
+        Summarize an interaction with the model, falling back to truncation.
         """
-        if self.enabled:
-            # TODO: Implement actual Ollama summarization
-            pass
-        
-        # Simple summarization for now
+        if self.enabled and len(interaction_text) > 100:
+            try:
+                summary = await self.client.cached("summary", interaction_text, lambda: self._ask_summary(interaction_text))
+                if len(summary) <= 100:
+                    return summary
+            except OllamaUnavailable as exc:
+                logger.warning("Ollama summarization unavailable, truncating: %s", exc)
+
+        # Extractive fallback: the most central sentence, truncated if it is still too long
+        if len(interaction_text) > 100:
+            interaction_text = " ".join(summarize_text([interaction_text], 1)) or interaction_text
         if len(interaction_text) > 100:
             return interaction_text[:97] + "..."
         return interaction_text
 
 # Initialize LLM service
-llm_service = OllamaLLMService()
+OLLAMA_URL = os.environ.get('OLLAMA_URL', '')
+llm_service = OllamaLLMService(OllamaClient(
+    OLLAMA_URL,
+    os.environ.get('OLLAMA_MODEL', 'llama3'),
+    timeout=float(os.environ.get('OLLAMA_TIMEOUT', 20)),
+    max_concurrency=int(os.environ.get('OLLAMA_CONCURRENCY', 2)),
+    cache_size=int(os.environ.get('OLLAMA_CACHE_SIZE', 1024)),
+) if OLLAMA_URL else None)
+
+# In-process indexes, kept current by the write handlers below
+search_index = SearchIndex()
+npc_matcher = NPCNameMatcher()
+npc_identity = NPCIdentityIndex()
+
+def vector_index(name: str) -> VectorIndex:
+    path = os.path.join(VECTOR_INDEX_DIR, name) if VECTOR_INDEX_DIR else None
+    return VectorIndex(VECTOR_DIM, path, VECTOR_IVF_MIN_ROWS, VECTOR_IVF_PROBES)
+
+# Embeddings for related sessions and similar NPCs, persisted under VECTOR_INDEX_DIR if set
+session_vectors = vector_index("sessions")
+npc_vectors = vector_index("npcs")
+
+# Per-collection write counters backing the list ETags
+change_counters = ChangeCounters(db.change_counters)
+
+# Per-document change sequence for delta sync (GET /changes)
+change_feed = ChangeFeed(db.changes, db.materializations, change_counters)
+
+# Live change events for connected clients (WebSocket /live, SSE /live/events)
+live_hub = LiveHub(InMemoryFanout())
+metrics_registry.register(Gauge("live_subscribers", "Connected live-event clients", callback=lambda: live_hub.stats()["subscribers"]))
+LIVE_HEARTBEAT = float(os.environ.get('LIVE_HEARTBEAT', 15))
+# Browsers cannot send an Authorization header from WebSocket or EventSource, so live clients
+# connect with a short-lived token from POST /live/token instead. Several workers need a shared secret.
+LIVE_TOKEN_TTL = int(os.environ.get('LIVE_TOKEN_TTL', 60))
+LIVE_TOKEN_SECRET = os.environ.get('LIVE_TOKEN_SECRET', '').encode() or secrets.token_bytes(32)
+
+def live_token_signature(expires: str) -> str:
+    return hmac.new(LIVE_TOKEN_SECRET, expires.encode(), hashlib.sha256).hexdigest()
+
+def issue_live_token() -> str:
+    expires = str(int(time.time()) + LIVE_TOKEN_TTL)
+    return f"{expires}.{live_token_signature(expires)}"
+
+def live_client_authorized(authorization: str, token: Optional[str]) -> bool:
+    """A live connection needs either the Basic credentials or an unexpired token"""
+    if token:
+        expires, _, signature = token.partition(".")
+        return expires.isdigit() and int(expires) >= time.time() and hmac.compare_digest(signature, live_token_signature(expires))
+    return authorization_valid(authorization)
+
+async def record_document_changes(kind: str, ids: List[str], deleted: bool = False):
+    """Stamp written documents in the change feed and broadcast them to live clients"""
+    last = await change_feed.record(kind, ids, deleted)
+    first = last - len(ids) + 1
+    for offset, doc_id in enumerate(ids):
+        await live_hub.publish({"type": "change", "kind": kind, "id": doc_id, "seq": first + offset, "deleted": deleted})
+
+# Serialized list/template responses, invalidated per collection by record_change
+response_cache = ResponseCache(InMemoryCacheBackend(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL))
+
+# Rendered session fragments; keys include updated_at, so edits never need to invalidate them
+render_cache = ResponseCache(InMemoryCacheBackend(RENDER_CACHE_SIZE, RENDER_CACHE_TTL))
+
+# Latest per-request profiles (see profiling.py); only filled when PROFILING_ENABLED
+profile_store = ProfileStore(PROFILE_BUFFER_SIZE)
+
+# Extractive summaries of NPC interaction history, extended as interactions are appended
+npc_summaries = HistorySummaries(SUMMARY_CACHE_SIZE)
+
+async def record_change(collection_name: str):
+    """Advance a collection's ETag counter and drop its cached responses"""
+    await change_counters.bump(collection_name)
+    await response_cache.invalidate(collection_name)
+
+def mentioned_npc_ids(session: Dict[str, Any]) -> List[str]:
+    """Ids of the known NPCs named anywhere in a session"""
+    return npc_matcher.find_ids(session_text(session))
+
+async def sync_npc_mentions(session: Dict[str, Any]):
+    """Recompute a stored session's npcs_mentioned, writing only if it changed"""
+    mentions = mentioned_npc_ids(session)
+    if mentions != session.get("npcs_mentioned"):
+        await db.sessions.update_one({"id": session["id"]}, {"$set": {"npcs_mentioned": mentions}})
+        session["npcs_mentioned"] = mentions
+
+async def vector_matches(collection, hits: List[Tuple[str, float]], projection: Dict[str, int]) -> List[Dict[str, Any]]:
+    """Look up the documents of similarity hits, keeping their order and adding each score"""
+    docs = {}
+    async for doc in collection.find({"id": {"$in": [key for key, _ in hits]}}, {"_id": 0, "id": 1, **projection}):
+        docs[doc["id"]] = doc
+    return [{**docs[key], "score": score} for key, score in hits if key in docs]
+
+def index_session(session: Dict[str, Any]):
+    search_index.add("session", session["id"], session_text(session), {"title": session.get("title", "")})
+    session_vectors.add(session["id"], session_text(session))
+
+def index_npc(npc: Dict[str, Any]) -> bool:
+    """Index an NPC; returns True if its name is new to the mention matcher"""
+    search_index.add("npc", npc["id"], npc_text(npc), {"name": npc.get("name", "")})
+    npc_identity.add(npc["id"], npc["name"], npc.get("aliases", []))
+    npc_vectors.add(npc["id"], npc_description(npc))
+    return npc_matcher.add(npc["id"], npc["name"])
+
+async def on_session_saved(session: Dict[str, Any]):
+    index_session(session)
+    await record_document_changes("session", [session["id"]])
+    if await sync_session_missions(db.missions, session):
+        await record_change("missions")
+    await record_change("sessions")
+
+async def on_session_deleted(session_id: str):
+    search_index.remove("session", session_id)
+    session_vectors.remove(session_id)
+    await record_document_changes("session", [session_id], deleted=True)
+    await db.session_stats.delete_one({"id": session_id})
+    if await remove_session_missions(db.missions, session_id):
+        await record_change("missions")
+    await record_change("sessions")
+
+async def update_sessions(query: Dict[str, Any], update: Dict[str, Any]) -> List[str]:
+    """Apply an update to every matching session; returns the ids it changed"""
+    session_ids = [doc["id"] async for doc in db.sessions.find(query, {"_id": 0, "id": 1})]
+    if session_ids:
+        update = {**update, "$set": {**update.get("$set", {}), "updated_at": datetime.utcnow()}}
+        await db.sessions.update_many({**query, "id": {"$in": session_ids}}, update)
+    return session_ids
+
+async def retag_mentions(npc: Dict[str, Any]) -> List[str]:
+    """Re-tag sessions for a new or renamed NPC; returns the ids of the sessions that changed"""
+    # The search index narrows down which sessions now mention it
+    session_ids = search_index.phrase_matches("session", npc["name"])
+    tagged = await update_sessions(
+        {"id": {"$in": session_ids}, "npcs_mentioned": {"$ne": npc["id"]}},
+        {"$push": {"npcs_mentioned": npc["id"]}},
+    )
+    untagged = await update_sessions(
+        {"npcs_mentioned": npc["id"], "id": {"$nin": session_ids}},
+        {"$pull": {"npcs_mentioned": npc["id"]}},
+    )
+    return tagged + untagged
+
+async def on_npc_saved(npc: Dict[str, Any]):
+    await record_document_changes("npc", [npc["id"]])
+    if index_npc(npc):
+        retagged = await retag_mentions(npc)
+        if retagged:
+            await record_document_changes("session", retagged)
+            await record_change("sessions")
+    await record_change("npcs")
+
+async def on_npc_deleted(npc_id: str):
+    search_index.remove("npc", npc_id)
+    npc_summaries.discard(npc_id)
+    npc_matcher.remove(npc_id)
+    npc_identity.remove(npc_id)
+    npc_vectors.remove(npc_id)
+    await record_document_changes("npc", [npc_id], deleted=True)
+    untagged = await update_sessions({"npcs_mentioned": npc_id}, {"$pull": {"npcs_mentioned": npc_id}})
+    if untagged:
+        await record_document_changes("session", untagged)
+        await record_change("sessions")
+    await record_change("npcs")
 
 # API Routes
 @api_router.get("/")
@@ -220,58 +565,265 @@ async def check_auth(username: str = Depends(authenticate)):
 async def create_session(session_data: SessionCreate, username: str = Depends(authenticate)):
     session_dict = session_data.dict()
     session_obj = Session(**session_dict)
-    await db.sessions.insert_one(session_obj.dict())
+    session_doc = session_obj.dict()
+    session_obj.npcs_mentioned = session_doc["npcs_mentioned"] = mentioned_npc_ids(session_doc)
+    await db.sessions.insert_one(session_doc)
+    await on_session_saved(session_doc)
     return session_obj
 
+def page_response(docs: List[Dict[str, Any]], next_cursor: Optional[str]) -> FastJSONResponse:
+    """Serialize one page, advertising the next page's cursor in the response headers"""
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return FastJSONResponse(docs, headers=headers)
+
+async def paginate(
+    request: Request, collection, sort, limit: int, cursor: Optional[str], projection: Dict[str, int],
+    query: Optional[Dict[str, Any]] = None,
+):
+    """
+    Fetch one keyset page of stored documents and serialize it without re-validation.
+    The serialized page is cached until the collection is next written. The page's
+    ETag is derived from the collection's change counter, so an unchanged listing
+    is answered with 304 before any document is read.
+    """
+    etag = None
+
+    async def build() -> Optional[CachedResponse]:
+        nonlocal etag
+        # Read the counter before the data so a concurrent write can only make the ETag stale, never wrong
+        seq = await change_counters.current(collection.name)
+        etag = weak_etag(collection.name, seq, request.url.path, limit, cursor, query)
+        if matches(request, etag):
+            return None
+        try:
+            docs, next_cursor = await fetch_page(collection, sort, limit, cursor, query, projection)
+        except InvalidCursorError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        headers = cache_headers(etag)
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return CachedResponse(dumps(docs), headers)
+
+    cached = await response_cache.get_or_build(request_key(request), (collection.name,), build)
+    if cached is None:
+        return not_modified(etag)
+    if matches(request, cached.headers["ETag"]):
+        return not_modified(cached.headers["ETag"])
+    return cached.response()
+
+def document_etag(doc: Dict[str, Any], *extra: Any) -> str:
+    return weak_etag(doc["id"], doc["updated_at"].isoformat(), *extra)
+
+async def find_unless_modified(request: Request, collection, doc_id: str, projection: Dict[str, int], *extra: Any):
+    """
+    Return (document, etag), or (None, etag) when the client's copy is current.
+    With If-None-Match, only updated_at is read first; the full document is read on a mismatch.
+    """
+    if request.headers.get("if-none-match"):
+        stamp = await collection.find_one({"id": doc_id}, {"_id": 0, "id": 1, "updated_at": 1})
+        if stamp and matches(request, document_etag(stamp, *extra)):
+            return None, document_etag(stamp, *extra)
+    doc = await collection.find_one({"id": doc_id}, projection)
+    return doc, (document_etag(doc, *extra) if doc else None)
+
+def stream_ndjson(collection, sort, projection: Dict[str, int]) -> StreamingResponse:
+    """Stream an entire listing as newline-delimited JSON, one page in memory at a time"""
+    async def lines():
+        async for docs in iter_pages(collection, sort, MAX_PAGE_SIZE, projection=projection):
+            yield b"".join(dumps(doc) + b"\n" for doc in docs)
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @api_router.get("/sessions", response_model=List[Session])
-async def get_sessions(username: str = Depends(authenticate)):
-    sessions = await db.sessions.find().sort("created_at", -1).to_list(1000)
-    return [Session(**session) for session in sessions]
+async def get_sessions(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    username: str = Depends(authenticate),
+):
+    return await paginate(request, db.sessions, SESSION_SORT, limit, cursor, SESSION_PROJECTION)
+
+@api_router.get("/sessions/stream")
+async def stream_sessions(username: str = Depends(authenticate)):
+    """Stream every session, newest first, as NDJSON"""
+    return stream_ndjson(db.sessions, SESSION_SORT, SESSION_PROJECTION)
 
 @api_router.get("/sessions/{session_id}", response_model=Session)
-async def get_session(session_id: str, username: str = Depends(authenticate)):
-    session = await db.sessions.find_one({"id": session_id})
+async def get_session(session_id: str, request: Request, username: str = Depends(authenticate)):
+    if autosave_buffer.has_pending(session_id):
+        await autosave_buffer.flush(session_id)
+    session, etag = await find_unless_modified(request, db.sessions, session_id, SESSION_PROJECTION)
+    if etag and not session:
+        return not_modified(etag)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    return Session(**session)
+    return FastJSONResponse(session, headers=cache_headers(etag))
+
+async def apply_session_update(session_id: str, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    update_data = {**update_data, "updated_at": datetime.utcnow()}
+    updated_session = await db.sessions.find_one_and_update(
+        {"id": session_id},
+        {"$set": update_data},
+        return_document=ReturnDocument.AFTER,
+    )
+    if updated_session:
+        await sync_npc_mentions(updated_session)
+        await on_session_saved(updated_session)
+    return updated_session
+
+# Opt-in autosave coalescing for PUT /sessions/{id}?autosave=true
+autosave_buffer = WriteBehindBuffer(apply_session_update, AUTOSAVE_WINDOW)
 
 @api_router.put("/sessions/{session_id}", response_model=Session)
-async def update_session(session_id: str, session_data: SessionUpdate, username: str = Depends(authenticate)):
+async def update_session(
+    session_id: str,
+    session_data: SessionUpdate,
+    autosave: bool = False,
+    flush: bool = False,
+    username: str = Depends(authenticate),
+):
+    """
+    Update a session. With autosave=true the update is buffered and merged with
+    other autosaves of this session arriving within AUTOSAVE_WINDOW seconds, then
+    written once; the response is 202 with the version acknowledging it. Without
+    autosave, or with flush=true, the update (and anything buffered before it) is
+    written before the response.
+    """
     update_data = {k: v for k, v in session_data.dict().items() if v is not None}
-    update_data["updated_at"] = datetime.utcnow()
     
-    result = await db.sessions.update_one(
-        {"id": session_id}, 
-        {"$set": update_data}
-    )
+    if autosave and not flush:
+        # Only the first update of a burst checks that the session exists
+        if not autosave_buffer.has_pending(session_id) and not await db.sessions.find_one({"id": session_id}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Session not found")
+        version = autosave_buffer.put(session_id, update_data)
+        return FastJSONResponse({"id": session_id, "version": version, "pending": True}, status_code=202)
+    
+    updated_session = await autosave_buffer.write_through(session_id, update_data)
+    if not updated_session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return Session(**updated_session)
+
+@api_router.patch("/sessions/{session_id}/structured", response_model=Session)
+async def patch_structured_session(session_id: str, patch: StructuredSessionPatch, username: str = Depends(authenticate)):
+    """Apply typed append/update/remove/set operations to structured_data without rewriting it"""
+    # Buffered autosaves came first and must not land on top of this patch later
+    await autosave_buffer.flush(session_id)
+    try:
+        rounds = structured_patch_compiler.compile([operation.dict() for operation in patch.operations])
+    except InvalidPatchError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
     
-    if result.matched_count == 0:
+    existing = await db.sessions.find_one({"id": session_id}, {"_id": 0, "structured_data": 1})
+    if not existing:
         raise HTTPException(status_code=404, detail="Session not found")
+    structured = existing.get("structured_data")
+    if structured is None:
+        # Free-form sessions get an empty structure to patch into
+        structured = SessionStructuredData().dict()
+        await db.sessions.update_one({"id": session_id, "structured_data": None}, {"$set": {"structured_data": structured}})
+    # Check every round up front so a missing item rejects the patch before anything is written
+    if not isinstance(structured, dict) or first_missing_item(rounds, structured):
+        raise HTTPException(status_code=404, detail="Structured item not found")
     
-    updated_session = await db.sessions.find_one({"id": session_id})
+    def apply_round(patch_round: PatchRound):
+        update = patch_round.update
+        update.setdefault("$set", {})["updated_at"] = datetime.utcnow()
+        query = {"id": session_id, "structured_data": {"$type": "object"}, **patch_round.filter}
+        return db.sessions.find_one_and_update(
+            query, update, array_filters=patch_round.array_filters or None, return_document=ReturnDocument.AFTER
+        )
+    
+    updated_session = None
+    try:
+        for patch_round in rounds:
+            applied = await apply_round(patch_round)
+            if applied is None:
+                # The checks above passed, so a concurrent write removed the session or an item since
+                raise HTTPException(status_code=409, detail="Session changed while the patch was applied")
+            updated_session = applied
+    finally:
+        # Rounds that did land must reach search, the change feed and the caches
+        if updated_session is not None:
+            await sync_npc_mentions(updated_session)
+            await on_session_saved(updated_session)
     return Session(**updated_session)
 
 @api_router.delete("/sessions/{session_id}")
 async def delete_session(session_id: str, username: str = Depends(authenticate)):
+    autosave_buffer.discard(session_id)
     result = await db.sessions.delete_one({"id": session_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Session not found")
+    await on_session_deleted(session_id)
     return {"message": "Session deleted successfully"}
 
 # Session template route
 @api_router.get("/sessions/template/structured")
-async def get_structured_template(username: str = Depends(authenticate)):
+async def get_structured_template(request: Request, username: str = Depends(authenticate)):
     """Return an empty structured session template"""
-    template = SessionStructuredData()
-    return template
+    async def build() -> CachedResponse:
+        return CachedResponse(dumps(SessionStructuredData().dict()))
+
+    cached = await response_cache.get_or_build(request_key(request), ("template",), build)
+    return cached.response()
+
+async def rendered_session(session: Dict[str, Any], fmt: str) -> bytes:
+    """A session's Markdown/HTML fragment, rendered once per (id, updated_at, format)"""
+    key = f"{session['id']}:{session['updated_at'].isoformat()}:{fmt}"
+
+    async def build() -> CachedResponse:
+        return CachedResponse(render_fragment(session, fmt), media_type=FORMATS[fmt])
+
+    return (await render_cache.get_or_build(key, (), build)).body
+
+@api_router.get("/sessions/{session_id}/related")
+async def get_related_sessions(session_id: str, limit: int = Query(5, ge=1, le=100), username: str = Depends(authenticate)):
+    """Sessions whose notes are most like this one's"""
+    if session_id not in session_vectors:
+        raise HTTPException(status_code=404, detail="Session not found")
+    hits = session_vectors.similar_to(session_id, limit)
+    return {"session_id": session_id, "related": await vector_matches(db.sessions, hits, {"title": 1, "created_at": 1})}
+
+@api_router.get("/sessions/{session_id}/summary")
+async def get_session_summary(
+    session_id: str,
+    sentences: int = Query(DEFAULT_SENTENCES, ge=1, le=10),
+    username: str = Depends(authenticate),
+):
+    """The key sentences of a session's notes, extracted once per (id, updated_at, length)"""
+    if autosave_buffer.has_pending(session_id):
+        await autosave_buffer.flush(session_id)
+    session = await db.sessions.find_one({"id": session_id}, SESSION_PROJECTION)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    async def build():
+        texts = [session.get("content") or "", *iter_text(session.get("structured_data") or {})]
+        summary = summarize_text(texts, sentences)
+        return CachedResponse(dumps({"session_id": session_id, "summary": summary}))
+
+    key = f"{session_id}:{session['updated_at'].isoformat()}:summary:{sentences}"
+    return (await render_cache.get_or_build(key, (), build)).response()
 
 # Export session route
 @api_router.get("/sessions/{session_id}/export")
-async def export_session(session_id: str, username: str = Depends(authenticate)):
-    """Export session data in a formatted structure"""
-    session = await db.sessions.find_one({"id": session_id})
+async def export_session(
+    session_id: str,
+    request: Request,
+    fmt: str = Query("json", alias="format", pattern="^(json|markdown|html)$"),
+    username: str = Depends(authenticate),
+):
+    """Export session data in a formatted structure, or as a readable Markdown/HTML document"""
+    if autosave_buffer.has_pending(session_id):
+        await autosave_buffer.flush(session_id)
+    session, etag = await find_unless_modified(request, db.sessions, session_id, SESSION_PROJECTION, "export", fmt)
+    if etag and not session:
+        return not_modified(etag)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
+
+    if fmt != "json":
+        body = document_prefix(fmt, session["title"]) + await rendered_session(session, fmt) + document_suffix(fmt)
+        return Response(body, media_type=FORMATS[fmt], headers=cache_headers(etag))
     
     session_obj = Session(**session)
     
@@ -286,42 +838,138 @@ async def export_session(session_id: str, username: str = Depends(authenticate))
         "structured_data": session_obj.structured_data.dict() if session_obj.structured_data else None
     }
     
-    return export_data
+    return FastJSONResponse(export_data, headers=cache_headers(etag))
 
 # NPC routes (keeping existing)
 @api_router.post("/npcs", response_model=NPC)
 async def create_npc(npc_data: NPCCreate, username: str = Depends(authenticate)):
     npc_dict = npc_data.dict()
     npc_obj = NPC(**npc_dict)
-    await db.npcs.insert_one(npc_obj.dict())
+    npc_doc = npc_obj.dict()
+    try:
+        await db.npcs.insert_one(npc_doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="An NPC with this name already exists")
+    await on_npc_saved(npc_doc)
     return npc_obj
 
 @api_router.get("/npcs", response_model=List[NPC])
-async def get_npcs(username: str = Depends(authenticate)):
-    npcs = await db.npcs.find().sort("name", 1).to_list(1000)
-    return [NPC(**npc) for npc in npcs]
+async def get_npcs(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    username: str = Depends(authenticate),
+):
+    return await paginate(request, db.npcs, NPC_SORT, limit, cursor, NPC_PROJECTION)
+
+@api_router.get("/npcs/stream")
+async def stream_npcs(username: str = Depends(authenticate)):
+    """Stream every NPC, alphabetically, as NDJSON"""
+    return stream_ndjson(db.npcs, NPC_SORT, NPC_PROJECTION)
+
+@api_router.get("/npcs/resolve")
+async def resolve_npc(
+    name: str = Query(..., min_length=1),
+    limit: int = Query(5, ge=1, le=50),
+    threshold: float = Query(IDENTITY_MATCH_THRESHOLD, gt=0, le=1),
+    username: str = Depends(authenticate),
+):
+    """Tracked NPCs a name probably refers to, ranked by trigram similarity to their names and aliases"""
+    return {"name": name, "matches": npc_identity.match(name, limit, threshold)}
+
+@api_router.get("/npcs/similar")
+async def find_similar_npcs(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=100),
+    username: str = Depends(authenticate),
+):
+    """NPCs whose appearance, background and notes are most like a free-text description"""
+    return {"matches": await vector_matches(db.npcs, npc_vectors.search([q], limit), {"name": 1})}
 
 @api_router.get("/npcs/{npc_id}", response_model=NPC)
-async def get_npc(npc_id: str, username: str = Depends(authenticate)):
-    npc = await db.npcs.find_one({"id": npc_id})
+async def get_npc(npc_id: str, request: Request, username: str = Depends(authenticate)):
+    npc, etag = await find_unless_modified(request, db.npcs, npc_id, NPC_PROJECTION)
+    if etag and not npc:
+        return not_modified(etag)
+    if not npc:
+        raise HTTPException(status_code=404, detail="NPC not found")
+    return FastJSONResponse(npc, headers=cache_headers(etag))
+
+@api_router.get("/npcs/{npc_id}/sessions", response_model=List[Session])
+async def get_npc_sessions(
+    npc_id: str,
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    username: str = Depends(authenticate),
+):
+    """Sessions that mention this NPC, newest first"""
+    return await paginate(
+        request, db.sessions, SESSION_SORT, limit, cursor, SESSION_PROJECTION, {"npcs_mentioned": npc_id}
+    )
+
+@api_router.get("/npcs/{npc_id}/history")
+async def get_npc_history(
+    npc_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    username: str = Depends(authenticate),
+):
+    """Page through an NPC's full interaction history, newest first"""
+    try:
+        entries, next_cursor = await fetch_history_page(db.npc_history, npc_id, limit, cursor)
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if not entries and not await db.npcs.find_one({"id": npc_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="NPC not found")
+    return page_response(entries, next_cursor)
+
+@api_router.get("/npcs/{npc_id}/similar")
+async def get_similar_npcs(npc_id: str, limit: int = Query(10, ge=1, le=100), username: str = Depends(authenticate)):
+    if npc_id not in npc_vectors:
+        raise HTTPException(status_code=404, detail="NPC not found")
+    return {"npc_id": npc_id, "matches": await vector_matches(db.npcs, npc_vectors.similar_to(npc_id, limit), {"name": 1})}
+
+@api_router.get("/npcs/{npc_id}/summary")
+async def get_npc_summary(
+    npc_id: str,
+    sentences: int = Query(DEFAULT_SENTENCES, ge=1, le=10),
+    username: str = Depends(authenticate),
+):
+    """The key sentences of an NPC's whole interaction history"""
+    npc = await db.npcs.find_one({"id": npc_id}, {"_id": 0, "history_count": 1})
     if not npc:
         raise HTTPException(status_code=404, detail="NPC not found")
-    return NPC(**npc)
+    count = npc.get("history_count", 0)
+    known = npc_summaries.count(npc_id)
+    if known != count:
+        # Only read the interactions appended since the cached ones, unless the cache is behind a reset
+        start = known if known is not None and known < count else 0
+        entries = await fetch_history_since(db.npc_history, npc_id, start)
+        if not npc_summaries.extend(npc_id, start, [entry["interaction"] for entry in entries]):
+            # An extraction landed while we were reading; start over from the full history
+            entries = await fetch_history_since(db.npc_history, npc_id, 0)
+            npc_summaries.extend(npc_id, 0, [entry["interaction"] for entry in entries])
+    return {"npc_id": npc_id, "history_count": count, "summary": npc_summaries.summary(npc_id, sentences)}
 
 @api_router.put("/npcs/{npc_id}", response_model=NPC)
 async def update_npc(npc_id: str, npc_data: NPCUpdate, username: str = Depends(authenticate)):
     update_data = {k: v for k, v in npc_data.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
     
-    result = await db.npcs.update_one(
-        {"id": npc_id}, 
-        {"$set": update_data}
-    )
+    try:
+        updated_npc = await db.npcs.find_one_and_update(
+            {"id": npc_id},
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="An NPC with this name already exists")
     
-    if result.matched_count == 0:
+    if not updated_npc:
         raise HTTPException(status_code=404, detail="NPC not found")
     
-    updated_npc = await db.npcs.find_one({"id": npc_id})
+    await on_npc_saved(updated_npc)
     return NPC(**updated_npc)
 
 @api_router.delete("/npcs/{npc_id}")
@@ -329,50 +977,546 @@ async def delete_npc(npc_id: str, username: str = Depends(authenticate)):
     result = await db.npcs.delete_one({"id": npc_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="NPC not found")
+    await db.npc_history.delete_many({"npc_id": npc_id})
+    await on_npc_deleted(npc_id)
     return {"message": "NPC deleted successfully"}
 
-# NPC extraction route
+# NPC extraction routes
+def interaction_entry(extraction_data: NPCExtraction) -> Dict[str, Any]:
+    return {
+        "session_id": extraction_data.session_id,
+        "interaction": extraction_data.extracted_text,
+        "timestamp": datetime.utcnow()
+    }
+
+def npc_defaults(npc_name: str, first_interaction: str) -> Dict[str, Any]:
+    """Field values for an NPC created by extraction"""
+    return NPC(name=npc_name, notes=f"First mentioned: {first_interaction}").dict()
+
+def resolve_npc_name(name: str, exact: bool) -> str:
+    """The name of the tracked NPC an extracted name unambiguously refers to, else the name itself"""
+    if exact:
+        return name
+    match = npc_identity.resolve(name, IDENTITY_MERGE_THRESHOLD)
+    return match["name"] if match else name
+
+def resolution(requested: str, resolved: str) -> Dict[str, Any]:
+    return {"resolved_from": requested} if resolved != requested else {}
+
 @api_router.post("/extract-npc")
-async def extract_npc(extraction_data: NPCExtraction, username: str = Depends(authenticate)):
-    # Check if NPC already exists
-    existing_npc = await db.npcs.find_one({"name": extraction_data.npc_name})
+async def extract_npc(extraction_data: NPCExtraction, exact: bool = False, username: str = Depends(authenticate)):
+    npc_name = resolve_npc_name(extraction_data.npc_name, exact)
+    entry = interaction_entry(extraction_data)
+    defaults = npc_defaults(npc_name, extraction_data.extracted_text)
+    upsert = interaction_upsert(defaults, [entry])
     
-    if existing_npc:
-        # Add interaction to existing NPC
-        interaction_entry = {
-            "session_id": extraction_data.session_id,
-            "interaction": extraction_data.extracted_text,
-            "timestamp": datetime.utcnow()
-        }
-        
-        await db.npcs.update_one(
-            {"name": extraction_data.npc_name},
-            {"$push": {"history": interaction_entry}, "$set": {"updated_at": datetime.utcnow()}}
+    # Create-or-append in one atomic write; the unique name index turns a lost creation race into a retry
+    try:
+        npc = await db.npcs.find_one_and_update(
+            {"name": npc_name}, upsert, upsert=True, return_document=ReturnDocument.AFTER
         )
-        
-        updated_npc = await db.npcs.find_one({"name": extraction_data.npc_name})
-        return {"action": "updated", "npc": NPC(**updated_npc)}
-    else:
-        # Create new NPC
-        new_npc = NPC(
-            name=extraction_data.npc_name,
-            notes=f"First mentioned: {extraction_data.extracted_text}",
-            history=[{
-                "session_id": extraction_data.session_id,
-                "interaction": extraction_data.extracted_text,
-                "timestamp": datetime.utcnow()
-            }]
+    except DuplicateKeyError:
+        npc = await db.npcs.find_one_and_update(
+            {"name": npc_name}, upsert, return_document=ReturnDocument.AFTER
         )
-        
-        await db.npcs.insert_one(new_npc.dict())
-        return {"action": "created", "npc": new_npc}
+    
+    await db.npc_history.bulk_write(history_bucket_updates(npc["id"], npc["history_count"] - 1, [entry]))
+    npc_summaries.extend(npc["id"], npc["history_count"] - 1, [entry["interaction"]])
+    await on_npc_saved(npc)
+    return {
+        "action": "created" if npc["id"] == defaults["id"] else "updated",
+        **resolution(extraction_data.npc_name, npc_name),
+        "npc": NPC(**npc),
+    }
+
+@api_router.post("/extract-npc/bulk")
+async def extract_npcs_bulk(bulk_data: NPCExtractionBulk, exact: bool = False, username: str = Depends(authenticate)):
+    """Apply many extractions with one bulk write, grouping repeated NPC names"""
+    entries_by_name: Dict[str, List[Dict[str, Any]]] = {}
+    requested_names: Dict[str, List[str]] = {}
+    for extraction in bulk_data.extractions:
+        npc_name = resolve_npc_name(extraction.npc_name, exact)
+        entries_by_name.setdefault(npc_name, []).append(interaction_entry(extraction))
+        requested = requested_names.setdefault(npc_name, [])
+        if extraction.npc_name != npc_name and extraction.npc_name not in requested:
+            requested.append(extraction.npc_name)
+    if not entries_by_name:
+        return {"results": []}
+    
+    batch_id = str(uuid.uuid4())
+    defaults_by_name = {
+        name: npc_defaults(name, entries[0]["interaction"]) for name, entries in entries_by_name.items()
+    }
+    operations = [
+        UpdateOne({"name": name}, interaction_upsert(defaults_by_name[name], entries, batch_id), upsert=True)
+        for name, entries in entries_by_name.items()
+    ]
+    try:
+        await db.npcs.bulk_write(operations, ordered=False)
+    except BulkWriteError as exc:
+        # Upserts that lost a creation race to a concurrent extraction now match the winner's document
+        lost_races = [error["index"] for error in exc.details["writeErrors"] if error["code"] == 11000]
+        if len(lost_races) != len(exc.details["writeErrors"]):
+            raise
+        await db.npcs.bulk_write([operations[i] for i in lost_races], ordered=False)
+    
+    results = []
+    history_updates = []
+    async for npc in db.npcs.find({"name": {"$in": list(entries_by_name)}}):
+        entries = entries_by_name[npc["name"]]
+        base = next((marker["base"] for marker in npc.get("batch_bases", []) if marker["id"] == batch_id), None)
+        if base is None:
+            # More than RECENT_BATCHES bulk extractions raced on this NPC and pushed ours out;
+            # number from the count read back, which is exact unless another batch landed since
+            logger.warning("Bulk extraction marker for NPC %s was evicted", npc["id"])
+            base = npc["history_count"] - len(entries)
+        history_updates.extend(history_bucket_updates(npc["id"], base, entries))
+        npc_summaries.extend(npc["id"], base, [entry["interaction"] for entry in entries])
+        await on_npc_saved(npc)
+        results.append({
+            "action": "created" if npc["id"] == defaults_by_name[npc["name"]]["id"] else "updated",
+            "interactions_added": len(entries),
+            **({"resolved_from": requested_names[npc["name"]]} if requested_names[npc["name"]] else {}),
+            "npc": NPC(**npc),
+        })
+    await db.npc_history.bulk_write(history_updates, ordered=False)
+    await db.npcs.update_many(
+        {"name": {"$in": list(entries_by_name)}}, {"$pull": {"batch_bases": {"id": batch_id}}}
+    )
+    return {"results": results}
+
+def split_known_npcs(names: List[str]) -> Dict[str, Any]:
+    """Separate suggested names that probably refer to tracked NPCs from new ones"""
+    suggested, existing = [], []
+    for name in names:
+        matches = npc_identity.match(name, 1, IDENTITY_MATCH_THRESHOLD)
+        if matches:
+            existing.append({"suggested": name, **matches[0]})
+        else:
+            suggested.append(name)
+    return {"suggested_npcs": suggested, "existing_npcs": existing}
+
+# Background jobs for extraction and summarization
+def job_payload(model, payload: Dict[str, Any]):
+    try:
+        return model(**payload)
+    except ValidationError as exc:
+        raise PermanentJobError(exc.errors()[0]['msg'])
+
+async def run_suggest_npcs_job(payload: Dict[str, Any]):
+    text = job_payload(TextPayload, payload).text
+    return split_known_npcs(await llm_service.extract_npcs_from_text(text))
+
+async def run_suggest_npcs_batch_job(payload: Dict[str, Any]):
+    suggestions = await llm_service.extract_npcs_from_texts(job_payload(NPCSuggestionBatch, payload).texts)
+    return {"results": [split_known_npcs(names) for names in suggestions]}
+
+async def run_summarize_interaction_job(payload: Dict[str, Any]):
+    text = job_payload(TextPayload, payload).text
+    return {"summary": await llm_service.summarize_interaction(text)}
+
+job_queue = JobQueue(
+    db.jobs,
+    {
+        "suggest-npcs": run_suggest_npcs_job,
+        "suggest-npcs-batch": run_suggest_npcs_batch_job,
+        "summarize-interaction": run_summarize_interaction_job,
+    },
+    workers=JOB_WORKERS,
+    max_queued=JOB_QUEUE_LIMIT,
+)
+metrics_registry.register(Gauge("background_jobs_queued", "Background jobs waiting for a worker", callback=lambda: job_queue.stats()["queued"]))
+
+async def submit_job(kind: str, payload: Dict[str, Any], priority: int = 0):
+    try:
+        job = await job_queue.submit(kind, payload, priority)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except JobQueueFull as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    return FastJSONResponse(job, status_code=202)
+
+@api_router.post("/jobs", status_code=202)
+async def create_job(submission: JobSubmission, username: str = Depends(authenticate)):
+    return await submit_job(submission.kind, submission.payload, submission.priority)
+
+@api_router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=JOB_MAX_WAIT),
+    username: str = Depends(authenticate),
+):
+    """A job's status and result; with ``wait``, hold the request up to that many seconds for it to finish"""
+    job = await job_queue.wait(job_id, wait)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return FastJSONResponse(job)
 
 # Auto-suggest NPCs from text
 @api_router.post("/suggest-npcs")
-async def suggest_npcs(text_data: dict, username: str = Depends(authenticate)):
+async def suggest_npcs(text_data: dict, background: bool = False, username: str = Depends(authenticate)):
     text = text_data.get("text", "")
-    suggested_names = await llm_service.extract_npcs_from_text(text)
-    return {"suggested_npcs": suggested_names}
+    if background:
+        return await submit_job("suggest-npcs", {"text": text})
+    return split_known_npcs(await llm_service.extract_npcs_from_text(text))
+
+@api_router.post("/suggest-npcs/batch")
+async def suggest_npcs_batch(batch: NPCSuggestionBatch, background: bool = False, username: str = Depends(authenticate)):
+    if background:
+        return await submit_job("suggest-npcs-batch", batch.dict())
+    suggestions = await llm_service.extract_npcs_from_texts(batch.texts)
+    return {"results": [split_known_npcs(names) for names in suggestions]}
+
+# Full-text search
+@api_router.get("/search")
+async def search(
+    q: str = Query(..., min_length=1),
+    type: Optional[str] = Query(None, pattern="^(session|npc)$"),
+    limit: int = Query(20, ge=1, le=100),
+    username: str = Depends(authenticate),
+):
+    """Rank sessions and NPCs for a query; supports "quoted phrases" and prefix* terms"""
+    kinds = [type] if type else None
+    return {"results": search_index.search(q, limit=limit, kinds=kinds)}
+
+# Campaign recap
+@api_router.get("/campaign/recap")
+async def campaign_recap(
+    fmt: str = Query("markdown", alias="format", pattern="^(markdown|html)$"),
+    username: str = Depends(authenticate),
+):
+    """Every session in play order as one Markdown/HTML document, streamed session by session"""
+    async def chunks():
+        yield document_prefix(fmt, "Campaign Recap")
+        sessions = db.sessions.find({}, SESSION_PROJECTION).sort(RECAP_SORT).batch_size(DEFAULT_PAGE_SIZE)
+        first = True
+        async for session in sessions:
+            if not first:
+                yield separator(fmt)
+            first = False
+            yield await rendered_session(session, fmt)
+        yield document_suffix(fmt)
+
+    return StreamingResponse(chunks(), media_type=FORMATS[fmt])
+
+@api_router.get("/changes")
+async def get_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    username: str = Depends(authenticate),
+):
+    """
+    Sessions and NPCs written since the client's last token, oldest change first.
+    Each change carries the current document, or "deleted": true for a tombstone.
+    Pass the returned "next" as since= on the following call; "reset" means the
+    token is too old and the client must reload everything.
+    """
+    entries, next_seq, has_more, reset = await change_feed.since(since, limit)
+    docs: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for kind, collection, projection in (("session", db.sessions, SESSION_PROJECTION), ("npc", db.npcs, NPC_PROJECTION)):
+        ids = [entry["id"] for entry in entries if entry["kind"] == kind and not entry["deleted"]]
+        if ids:
+            async for doc in collection.find({"id": {"$in": ids}}, projection):
+                docs[kind, doc["id"]] = doc
+
+    changes = []
+    for entry in entries:
+        doc = docs.get((entry["kind"], entry["id"]))
+        change = {"seq": entry["seq"], "kind": entry["kind"], "id": entry["id"], "deleted": doc is None}
+        if doc is not None:
+            change["doc"] = doc
+        changes.append(change)
+    return FastJSONResponse({"changes": changes, "next": next_seq, "has_more": has_more, "reset": reset})
+
+async def live_events(since: Optional[int]):
+    """
+    Change events for one live client, starting with a replay of the change
+    feed after ``since`` when given. Yields None when a heartbeat is due.
+    """
+    async with live_hub.subscribe() as subscription:
+        # Subscribe before replaying so nothing written meanwhile is lost; live events the replay already covered are skipped
+        replayed = 0
+        has_more = since is not None
+        while has_more:
+            entries, since, has_more, reset = await change_feed.since(since, MAX_PAGE_SIZE)
+            if reset:
+                yield RESYNC
+                break
+            for entry in entries:
+                yield {"type": "change", "kind": entry["kind"], "id": entry["id"], "seq": entry["seq"], "deleted": entry["deleted"]}
+            replayed = since
+        while True:
+            try:
+                event = await subscription.next(LIVE_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if event is None:
+                return
+            if event.get("seq", replayed + 1) > replayed:
+                yield event
+
+@api_router.post("/live/token")
+async def create_live_token(username: str = Depends(authenticate)):
+    """A token for opening /live or /live/events from a browser, plus the feed position to resume from"""
+    return {"token": issue_live_token(), "expires_in": LIVE_TOKEN_TTL, "seq": await change_feed.current()}
+
+@api_router.websocket("/live")
+async def live_socket(websocket: WebSocket, since: Optional[int] = None, token: Optional[str] = None):
+    """Push change events as JSON text frames; authenticates with Basic credentials or a /live/token token"""
+    if not live_client_authorized(websocket.headers.get("authorization", ""), token):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+
+    async def drain_client():
+        # Nothing is expected from the client; reading is how a disconnect is noticed
+        while True:
+            await websocket.receive_text()
+
+    reader = asyncio.create_task(drain_client())
+    try:
+        async for event in live_events(since):
+            if reader.done():
+                break
+            await websocket.send_text(dumps(event if event is not None else {"type": "ping"}).decode())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        reader.cancel()
+
+@api_router.get("/live/events")
+async def live_event_stream(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0),
+    token: Optional[str] = None,
+):
+    """Server-sent events carrying the same change events; reconnects resume from Last-Event-ID"""
+    if not live_client_authorized(request.headers.get("authorization", ""), token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Basic"},
+        )
+    last_event_id = request.headers.get("last-event-id", "")
+    if since is None and last_event_id.isdigit():
+        since = int(last_event_id)
+
+    async def frames():
+        async for event in live_events(since):
+            if event is None:
+                yield b": keepalive\n\n"
+                continue
+            event_id = f"id: {event['seq']}\n" if "seq" in event else ""
+            yield f"{event_id}event: {event['type']}\n".encode() + b"data: " + dumps(event) + b"\n\n"
+
+    return StreamingResponse(
+        frames(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/missions")
+async def get_missions(
+    request: Request,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    username: str = Depends(authenticate),
+):
+    """Overarching missions across all sessions, each with its latest status and the sessions that list it"""
+    query = {"status": status_filter} if status_filter else None
+    return await paginate(request, db.missions, MISSION_SORT, limit, cursor, MISSION_LIST_PROJECTION, query)
+
+@api_router.get("/missions/{key}")
+async def get_mission(key: str, username: str = Depends(authenticate)):
+    """One mission with every session's copy of its name, status, description and notes"""
+    mission = await db.missions.find_one({"key": mission_key(key)}, {"_id": 0})
+    if not mission:
+        raise HTTPException(status_code=404, detail="Mission not found")
+    return FastJSONResponse(mission)
+
+@api_router.get("/analytics")
+async def get_analytics(request: Request, username: str = Depends(authenticate)):
+    """Campaign-wide statistics, refreshed from the sessions changed since the last call"""
+    async def build() -> CachedResponse:
+        return CachedResponse(dumps(await campaign_analytics(db)))
+
+    cached = await response_cache.get_or_build(request_key(request), ("sessions", "npcs"), build)
+    return cached.response()
+
+# Campaign backup/restore
+@api_router.get("/campaign/export")
+async def export_campaign(username: str = Depends(authenticate)):
+    """Stream every NPC, history bucket and session as gzip-compressed NDJSON"""
+    # NPCs come first so an import knows every name before it re-tags the sessions
+    sections = [
+        ("npc", db.npcs, NPC_PROJECTION),
+        ("npc_history", db.npc_history, {"_id": 0}),
+        ("session", db.sessions, SESSION_PROJECTION),
+    ]
+    filename = f"campaign-{datetime.utcnow():%Y%m%d-%H%M%S}.ndjson.gz"
+    return StreamingResponse(
+        gzip_chunks(export_records(sections)),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@api_router.post("/campaign/import")
+async def import_campaign(request: Request, username: str = Depends(authenticate)):
+    """
+    Restore an archive from /campaign/export, sent as the raw request body (gzip or plain NDJSON).
+    Documents are upserted by id, so importing into a non-empty campaign merges into it.
+    """
+    summary = ImportSummary()
+    sessions_retagged = False
+    missions_changed = False
+
+    async def npcs_written(npcs: List[Dict[str, Any]]):
+        nonlocal sessions_retagged
+        await record_document_changes("npc", [npc["id"] for npc in npcs])
+        for npc in npcs:
+            retagged = await retag_mentions(npc) if index_npc(npc) else []
+            if retagged:
+                await record_document_changes("session", retagged)
+                sessions_retagged = True
+
+    async def sessions_written(sessions: List[Dict[str, Any]]):
+        nonlocal missions_changed
+        await record_document_changes("session", [session["id"] for session in sessions])
+        for session in sessions:
+            index_session(session)
+            missions_changed = await sync_session_missions(db.missions, session) or missions_changed
+
+    writers = {
+        "npc": BatchWriter("npc", db.npcs, ["id"], summary, npcs_written),
+        "npc_history": BatchWriter("npc_history", db.npc_history, ["npc_id", "bucket"], summary),
+        "session": BatchWriter("session", db.sessions, ["id"], summary, sessions_written),
+    }
+    try:
+        async for line_number, record in read_records(request.stream()):
+            kind = record.get("type") if isinstance(record, dict) else None
+            if kind not in writers or not isinstance(record.get("doc"), dict):
+                summary.error(line_number, "not a campaign record")
+                continue
+            if kind in ("session", "npc"):
+                # A session's mentions come from the NPCs indexed so far and an NPC re-tags the sessions
+                # indexed so far, so the other kind's pending batch has to land before this record is read
+                await writers["npc" if kind == "session" else "session"].flush()
+            try:
+                doc = restore_document(kind, record["doc"])
+            except ValidationError as exc:
+                summary.error(line_number, f"invalid {kind}: {exc.errors()[0]['msg']}")
+                continue
+            except (ValueError, TypeError) as exc:
+                summary.error(line_number, f"invalid {kind}: {exc}")
+                continue
+            await writers[kind].add(line_number, doc)
+    except ArchiveFormatError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    finally:
+        for writer in writers.values():
+            await writer.flush()
+        if summary.imported["session"]:
+            # Restored sessions keep their original updated_at, which may predate the analytics watermark
+            await reset_session_stats(db)
+        if summary.imported["npc"] or summary.imported["npc_history"]:
+            npc_summaries.clear()
+            await record_change("npcs")
+        if summary.imported["session"] or sessions_retagged:
+            await record_change("sessions")
+        if missions_changed:
+            await record_change("missions")
+    return summary.as_dict()
+
+def restore_document(kind: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate an archived document and bring back the types JSON flattened"""
+    if kind == "session":
+        session = Session(**doc).dict()
+        session["npcs_mentioned"] = mentioned_npc_ids(session)
+        return session
+    if kind == "npc":
+        npc = NPC(**doc).dict()
+        npc["history"] = [revive_timestamps(dict(entry), ["timestamp"]) for entry in npc["history"]]
+        return npc
+    bucket = revive_timestamps(dict(doc), ["first_timestamp", "last_timestamp"])
+    if not isinstance(bucket.get("npc_id"), str) or not isinstance(bucket.get("bucket"), int):
+        raise ValueError("history bucket needs npc_id and bucket")
+    bucket["entries"] = [revive_timestamps(dict(entry), ["timestamp"]) for entry in bucket.get("entries", [])]
+    return bucket
+
+# Diagnostics
+@api_router.get("/admin/indexes")
+async def get_index_drift(username: str = Depends(authenticate)):
+    """Report registry indexes that are missing, mismatched or unexpected"""
+    return await index_drift(db)
+
+@api_router.get("/admin/query-plans")
+async def get_query_plans(username: str = Depends(authenticate)):
+    """Explain every route's query shape and flag collection scans"""
+    plans = await audit_query_plans(db)
+    return {"plans": plans, "collscans": [plan["route"] for plan in plans if plan["collscan"]]}
+
+@api_router.get("/admin/cache")
+async def get_cache_stats(username: str = Depends(authenticate)):
+    """Hit/miss counters of the in-process response, render and summary caches"""
+    return {"responses": response_cache.stats(), "renders": render_cache.stats(), "summaries": npc_summaries.stats()}
+
+@api_router.get("/admin/autosave")
+async def get_autosave_stats(username: str = Depends(authenticate)):
+    """How many autosaves were accepted, written and merged away"""
+    return autosave_buffer.stats()
+
+@api_router.get("/admin/llm")
+async def get_llm_stats(username: str = Depends(authenticate)):
+    """Model calls, cache hits and failures of the Ollama integration"""
+    return {"enabled": True, **llm_service.client.stats()} if llm_service.enabled else {"enabled": False}
+
+@api_router.get("/admin/jobs")
+async def get_job_stats(username: str = Depends(authenticate)):
+    """Background job workers, queue depth and outcomes"""
+    return job_queue.stats()
+
+@api_router.get("/admin/vectors")
+async def get_vector_stats(username: str = Depends(authenticate)):
+    """Size and partitioning of the session and NPC embedding indexes"""
+    return {"sessions": session_vectors.stats(), "npcs": npc_vectors.stats()}
+
+@api_router.get("/admin/profiles")
+async def list_profiles(username: str = Depends(authenticate)):
+    """Recent request profiles, newest first; request one with an X-Profile header or ?profile=cprofile|sample"""
+    return FastJSONResponse({"enabled": PROFILING_ENABLED, "profiles": profile_store.list()})
+
+@api_router.get("/admin/profiles/{profile_id}")
+async def download_profile(
+    profile_id: str,
+    fmt: Optional[str] = Query(None, alias="format", pattern="^(pstats|text|collapsed)$"),
+    username: str = Depends(authenticate),
+):
+    """A profile as marshalled pstats or a text report (cprofile mode), or as collapsed stacks (sample mode)"""
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    fmt = fmt or profile.summary()["formats"][0]
+    if fmt not in profile.summary()["formats"]:
+        raise HTTPException(status_code=400, detail=f"A {profile.mode} profile cannot be downloaded as {fmt}")
+    if fmt == "pstats":
+        return Response(
+            profile.pstats_bytes(),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'},
+        )
+    body = profile.text_report() if fmt == "text" else profile.collapsed()
+    return Response(body, media_type="text/plain; charset=utf-8")
+
+@api_router.get("/admin/live")
+async def get_live_stats(username: str = Depends(authenticate)):
+    """Connected live clients and how often slow ones were told to resync"""
+    return live_hub.stats()
+
+# Prometheus scrape endpoint, outside the /api prefix
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(username: str = Depends(authenticate)):
+    """Prometheus text exposition of request, MongoDB and event-loop metrics"""
+    return Response(metrics_registry.render(), media_type=CONTENT_TYPE)
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -383,8 +1527,18 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Installed only when enabled, so unprofiled deployments pay nothing per request
+if PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware, store=profile_store, authorize=authorization_valid, sample_every=PROFILE_SAMPLE_EVERY,
+    )
+
+# Outermost, so the timing covers every other middleware
+app.add_middleware(MetricsMiddleware, duration=http_request_duration, in_flight=http_requests_in_flight)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -392,6 +1546,119 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_db_indexes():
+    drift = await ensure_indexes(db)
+    for collection, report in drift.items():
+        if report["missing"] or report["mismatched"] or report["unexpected"]:
+            logger.warning("Index drift on %s: %s", collection, report)
+
+@app.on_event("startup")
+async def migrate_inline_npc_history():
+    """Move history recorded inline on NPC documents into npc_history buckets"""
+    async for npc in db.npcs.find({"history_count": {"$exists": False}}, {"id": 1, "history": 1}):
+        entries = [{**entry, "seq": seq} for seq, entry in enumerate(npc.get("history", []))]
+        if entries:
+            await db.npc_history.delete_many({"npc_id": npc["id"]})
+            await db.npc_history.insert_many(bucket_documents(npc["id"], entries))
+        await db.npcs.update_one(
+            {"id": npc["id"]},
+            {"$set": {"history": entries[-RECENT_HISTORY:], "history_count": len(entries)}},
+        )
+
+@app.on_event("startup")
+async def build_in_memory_indexes():
+    # Saved vectors are reused for documents whose text has not changed since
+    session_vectors.load()
+    npc_vectors.load()
+    npc_ids, session_ids = set(), set()
+    async for npcs in iter_pages(db.npcs, NPC_SORT, MAX_PAGE_SIZE):
+        for npc in npcs:
+            index_npc(npc)
+            npc_ids.add(npc["id"])
+    async for sessions in iter_pages(db.sessions, SESSION_SORT, MAX_PAGE_SIZE):
+        stale_mentions = {}
+        for session in sessions:
+            session_ids.add(session["id"])
+            mentions = mentioned_npc_ids(session)
+            if mentions != session.get("npcs_mentioned"):
+                stale_mentions[session["id"]] = UpdateOne(
+                    {"id": session["id"]},
+                    {"$set": {"npcs_mentioned": mentions, "updated_at": datetime.utcnow()}},
+                )
+            index_session(session)
+        if stale_mentions:
+            await db.sessions.bulk_write(list(stale_mentions.values()), ordered=False)
+            await record_document_changes("session", list(stale_mentions))
+            await record_change("sessions")
+    npc_vectors.retain(npc_ids)
+    session_vectors.retain(session_ids)
+    npc_vectors.save()
+    session_vectors.save()
+    logger.info("Indexed %d documents and %d NPC names", len(search_index), len(npc_matcher))
+
+@app.on_event("startup")
+async def backfill_change_feed():
+    """Give documents written before the change feed existed an entry, then prune old tombstones"""
+    if not await db.materializations.find_one({"_id": "changes", "built_at": {"$exists": True}}):
+        async for npcs in iter_pages(db.npcs, NPC_SORT, MAX_PAGE_SIZE, projection={"_id": 0, "id": 1, "name": 1}):
+            await record_document_changes("npc", [npc["id"] for npc in npcs])
+        async for sessions in iter_pages(db.sessions, SESSION_SORT, MAX_PAGE_SIZE, projection={"_id": 0, "id": 1, "created_at": 1}):
+            await record_document_changes("session", [session["id"] for session in sessions])
+        await db.materializations.update_one({"_id": "changes"}, {"$set": {"built_at": datetime.utcnow()}}, upsert=True)
+    await change_feed.prune_tombstones()
+
+@app.on_event("startup")
+async def backfill_missions():
+    """Build the missions collection once from the sessions written before it existed"""
+    if await db.materializations.find_one({"_id": "missions"}):
+        return
+    async for sessions in iter_pages(db.sessions, SESSION_SORT, MAX_PAGE_SIZE):
+        for session in sessions:
+            await sync_session_missions(db.missions, session)
+    await db.materializations.update_one({"_id": "missions"}, {"$set": {"built_at": datetime.utcnow()}}, upsert=True)
+    await record_change("missions")
+
+@app.on_event("shutdown")
+async def flush_autosaves():
+    """Write buffered autosaves before the database connection closes"""
+    await autosave_buffer.flush_all()
+
+@app.on_event("startup")
+async def start_live_hub():
+    await live_hub.start()
+
+@app.on_event("shutdown")
+async def stop_live_hub():
+    await live_hub.stop()
+
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    loop_lag_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_loop_lag_monitor():
+    await loop_lag_monitor.stop()
+
+@app.on_event("startup")
+async def start_job_queue():
+    await job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    """Stop the workers; jobs cut short are queued again on the next start"""
+    await job_queue.stop()
+
+@app.on_event("shutdown")
+async def save_vector_indexes():
+    npc_vectors.save()
+    session_vectors.save()
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    if llm_service.client is not None:
+        await llm_service.client.aclose()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
@@ -0,0 +1,182 @@
+"""
+Compile typed structured-session operations into positional MongoDB updates.
+
+Each operation touches one field of ``structured_data``:
+
+* ``append`` pushes an item onto a list,
+* ``update`` edits fields of the list item with a given id (``$[filter]``),
+* ``remove`` pulls the item with a given id (or a plain string) from a list,
+* ``set`` replaces a field that is not a list of items.
+
+Operations are merged into as few update documents as MongoDB allows: a new
+round starts only when an operation changes a field that the current round
+already changes in a different way (e.g. a ``$push`` and a ``$pull`` on the
+same list). Updates of the same item within a round share one array filter,
+so their fields land in one ``$set`` without overlapping paths.
+
+``first_missing_item`` checks every round's preconditions against one read
+of the session before anything is written.
+"""
+
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple, Type
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+PREFIX = "structured_data"
+
+_KINDS = {"append": "push", "remove": "pull", "update": "edit", "set": "set"}
+
+
+class InvalidPatchError(ValueError):
+    """Raised when an operation names an unknown field or carries invalid data."""
+
+
+class PatchRound:
+    """One MongoDB update document plus the array filters and preconditions it needs."""
+
+    def __init__(self):
+        self.push: Dict[str, List[Any]] = {}
+        self.pull: Dict[str, Dict[str, Any]] = {}
+        self.set: Dict[str, Any] = {}
+        self.array_filters: List[Dict[str, Any]] = []
+        self.required_ids: Dict[str, List[str]] = {}
+        # (field, item id) -> name of the array filter matching that item
+        self.filter_names: Dict[Tuple[str, str], str] = {}
+        self._kinds: Dict[str, str] = {}
+
+    def claim(self, field: str, kind: str) -> bool:
+        """Reserve ``field`` for one kind of change; False if it is already changed another way."""
+        if self._kinds.setdefault(field, kind) != kind:
+            return False
+        return True
+
+    @property
+    def update(self) -> Dict[str, Any]:
+        update: Dict[str, Any] = {}
+        if self.push:
+            update["$push"] = {f"{PREFIX}.{field}": {"$each": items} for field, items in self.push.items()}
+        if self.pull:
+            update["$pull"] = {f"{PREFIX}.{field}": condition for field, condition in self.pull.items()}
+        if self.set:
+            update["$set"] = dict(self.set)
+        return update
+
+    @property
+    def filter(self) -> Dict[str, Any]:
+        """Query clauses ensuring every item this round edits still exists."""
+        return {f"{PREFIX}.{field}.id": {"$all": ids} for field, ids in self.required_ids.items()}
+
+
+def _validate(annotation: Any, value: Any, label: str) -> Any:
+    try:
+        return TypeAdapter(annotation).validate_python(value)
+    except ValidationError as exc:
+        raise InvalidPatchError(f"Invalid value for '{label}': {exc.errors()[0]['msg']}")
+
+
+class StructuredPatchCompiler:
+    def __init__(self, structured_model: Type[BaseModel], item_models: Mapping[str, Type[BaseModel]]):
+        self._fields = structured_model.model_fields
+        self._item_models = dict(item_models)
+
+    def _string_list(self, field: str) -> bool:
+        return field in self._fields and self._fields[field].annotation == List[str]
+
+    def _check_field(self, op: str, field: str):
+        if field not in self._fields:
+            raise InvalidPatchError(f"Unknown structured field '{field}'")
+        if op == "set" and field in self._item_models:
+            raise InvalidPatchError(f"Use append, update or remove to change '{field}'")
+        if op == "update" and field not in self._item_models:
+            raise InvalidPatchError(f"Items of '{field}' have no id and cannot be updated in place")
+        if op in ("append", "remove") and not (field in self._item_models or self._string_list(field)):
+            raise InvalidPatchError(f"'{field}' is not a list")
+
+    def _append(self, round_: PatchRound, field: str, operation: Dict[str, Any]):
+        model = self._item_models.get(field)
+        if model is None:
+            item = _validate(str, operation.get("item"), field)
+        elif isinstance(operation.get("item"), dict):
+            try:
+                item = model(**operation["item"]).dict()
+            except ValidationError as exc:
+                raise InvalidPatchError(f"Invalid {field} item: {exc.errors()[0]['msg']}")
+        else:
+            raise InvalidPatchError(f"Appending to '{field}' needs an item object")
+        round_.push.setdefault(field, []).append(item)
+
+    def _remove(self, round_: PatchRound, field: str, operation: Dict[str, Any]):
+        if field in self._item_models:
+            if not operation.get("item_id"):
+                raise InvalidPatchError(f"Removing from '{field}' needs an item_id")
+            condition = round_.pull.setdefault(field, {"id": {"$in": []}})
+            condition["id"]["$in"].append(operation["item_id"])
+        else:
+            condition = round_.pull.setdefault(field, {"$in": []})
+            condition["$in"].append(_validate(str, operation.get("value"), field))
+
+    def _edit(self, round_: PatchRound, field: str, operation: Dict[str, Any], index: int):
+        model = self._item_models[field]
+        if not operation.get("item_id") or not operation.get("fields"):
+            raise InvalidPatchError(f"Updating '{field}' needs an item_id and fields")
+        item_id = operation["item_id"]
+        name = round_.filter_names.get((field, item_id))
+        if name is None:
+            name = round_.filter_names[(field, item_id)] = f"item{index}"
+            round_.array_filters.append({f"{name}.id": item_id})
+            round_.required_ids.setdefault(field, []).append(item_id)
+        for key, value in operation["fields"].items():
+            if key == "id" or key not in model.model_fields:
+                raise InvalidPatchError(f"Cannot update '{key}' on {field} items")
+            # A later update of the same item and key overwrites the earlier value
+            round_.set[f"{PREFIX}.{field}.$[{name}].{key}"] = _validate(model.model_fields[key].annotation, value, key)
+
+    def compile(self, operations: List[Dict[str, Any]]) -> List[PatchRound]:
+        """Validate ``operations`` and group them into ordered update rounds."""
+        rounds = [PatchRound()]
+        for index, operation in enumerate(operations):
+            op = operation["op"]
+            field = operation.get("field") or ""
+            self._check_field(op, field)
+
+            round_ = rounds[-1]
+            if not round_.claim(field, _KINDS[op]):
+                round_ = PatchRound()
+                round_.claim(field, _KINDS[op])
+                rounds.append(round_)
+
+            if op == "append":
+                self._append(round_, field, operation)
+            elif op == "remove":
+                self._remove(round_, field, operation)
+            elif op == "update":
+                self._edit(round_, field, operation, index)
+            else:
+                round_.set[f"{PREFIX}.{field}"] = _validate(self._fields[field].annotation, operation.get("value"), field)
+        return rounds
+
+
+def first_missing_item(rounds: List[PatchRound], structured: Mapping[str, Any]) -> Optional[Tuple[str, str]]:
+    """
+    The first ``(field, item_id)`` some round edits but would not find, given
+    the current ``structured`` data and the items earlier rounds remove or
+    append; None if every round's preconditions hold.
+    """
+    present: Dict[str, Set[str]] = {}
+
+    def ids(field: str) -> Set[str]:
+        if field not in present:
+            present[field] = {item.get("id") for item in structured.get(field) or [] if isinstance(item, dict)}
+        return present[field]
+
+    for round_ in rounds:
+        for field, required in round_.required_ids.items():
+            for item_id in required:
+                if item_id not in ids(field):
+                    return field, item_id
+        for field, condition in round_.pull.items():
+            if "id" in condition:
+                ids(field).difference_update(condition["id"]["$in"])
+        for field, items in round_.push.items():
+            ids(field).update(item["id"] for item in items if isinstance(item, dict))
+    return None
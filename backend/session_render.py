@@ -0,0 +1,194 @@
+"""
+Readable Markdown and HTML renderings of stored sessions.
+
+Renderers work on the raw session documents the read path already
+projects, not on re-validated models. A session is first reduced to a
+list of format-neutral blocks, which each format then writes out, so the
+Markdown and HTML exports always cover the same sections.
+
+``render_fragment`` returns the body of one session; ``document_prefix`` /
+``document_suffix`` wrap one or many fragments into a complete document,
+which lets a campaign recap stream cached fragments back to back.
+"""
+
+import html
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+FORMATS = {
+    "markdown": "text/markdown; charset=utf-8",
+    "html": "text/html; charset=utf-8",
+}
+
+# (kind, payload): ("heading", (level, text)), ("paragraph", text),
+# ("fields", [(label, value)]), ("list", [text])
+Block = Tuple[str, Any]
+
+_STYLE = (
+    "body{font-family:Georgia,serif;max-width:48rem;margin:2rem auto;padding:0 1rem;line-height:1.5}"
+    "h1,h2,h3{font-family:system-ui,sans-serif}dt{font-weight:bold}hr{margin:2rem 0}"
+)
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.date().isoformat() if isinstance(value, datetime) else value.isoformat()
+    return str(value).strip() if value is not None else ""
+
+
+def _joined(*parts: str, sep: str = " — ") -> str:
+    return sep.join(part for part in parts if part)
+
+
+def _fields(*pairs: Tuple[str, Any]) -> Optional[Block]:
+    present = [(label, _text(value)) for label, value in pairs if _text(value)]
+    return ("fields", present) if present else None
+
+
+def _item_blocks(title: str, items: List[Dict[str, Any]], heading_key: str, field_labels: Sequence[Tuple[str, str]]):
+    if not items:
+        return []
+    blocks: List[Block] = [("heading", (2, title))]
+    for item in items:
+        blocks.append(("heading", (3, _text(item.get(heading_key)) or "Untitled")))
+        detail = _fields(*[
+            (label, ", ".join(item.get(key) or []) if isinstance(item.get(key), list) else item.get(key))
+            for key, label in field_labels
+        ])
+        if detail:
+            blocks.append(detail)
+    return blocks
+
+
+def _structured_blocks(data: Dict[str, Any]) -> List[Block]:
+    blocks: List[Block] = []
+    info = _fields(
+        ("Session", data.get("session_number")),
+        ("Date", data.get("session_date")),
+        ("Players", ", ".join(data.get("players_present") or [])),
+    )
+    if info:
+        blocks.append(info)
+    if _text(data.get("session_goal")):
+        blocks += [("heading", (2, "Session Goal")), ("paragraph", _text(data["session_goal"]))]
+
+    blocks += _item_blocks("Combat Encounters", data.get("combat_encounters") or [], "description", [
+        ("enemies", "Enemies"), ("outcome", "Outcome"), ("notable_events", "Notable events"),
+    ])
+    blocks += _item_blocks("Roleplay Encounters", data.get("roleplay_encounters") or [], "description", [
+        ("npcs_involved", "NPCs involved"), ("outcome", "Outcome"), ("importance", "Importance"),
+    ])
+
+    npcs = data.get("npcs_encountered") or []
+    if npcs:
+        blocks += [("heading", (2, "NPCs Encountered")), ("list", [
+            _joined(
+                _text(npc.get("npc_name")) + (" (first encounter)" if npc.get("first_encounter") else ""),
+                _text(npc.get("role")),
+                _text(npc.get("notes")),
+            )
+            for npc in npcs
+        ])]
+
+    loot = data.get("loot") or []
+    if loot:
+        blocks += [("heading", (2, "Loot")), ("list", [
+            _joined(
+                _text(item.get("item_name")),
+                _text(item.get("description")),
+                f"value {_text(item['value'])}" if _text(item.get("value")) else "",
+                f"to {_text(item['recipient'])}" if _text(item.get("recipient")) else "",
+            )
+            for item in loot
+        ])]
+
+    if _text(data.get("notes")):
+        blocks += [("heading", (2, "Notes")), ("paragraph", _text(data["notes"]))]
+    moments = [_text(moment) for moment in data.get("notable_roleplay_moments") or [] if _text(moment)]
+    if moments:
+        blocks += [("heading", (2, "Notable Roleplay Moments")), ("list", moments)]
+    if _text(data.get("next_session_goals")):
+        blocks += [("heading", (2, "Next Session Goals")), ("paragraph", _text(data["next_session_goals"]))]
+
+    missions = data.get("overarching_missions") or []
+    if missions:
+        blocks += [("heading", (2, "Overarching Missions")), ("list", [
+            _joined(
+                f"{_text(mission.get('mission_name'))} [{_text(mission.get('status'))}]",
+                _text(mission.get("description")),
+                _text(mission.get("notes")),
+            )
+            for mission in missions
+        ])]
+    return blocks
+
+
+def session_blocks(session: Dict[str, Any]) -> List[Block]:
+    blocks: List[Block] = [("heading", (1, _text(session.get("title")) or "Untitled Session"))]
+    if session.get("created_at"):
+        blocks.append(("fields", [("Recorded", _text(session["created_at"]))]))
+    if session.get("structured_data"):
+        blocks += _structured_blocks(session["structured_data"])
+    if _text(session.get("content")):
+        if session.get("structured_data"):
+            blocks.append(("heading", (2, "Session Notes")))
+        blocks.append(("paragraph", _text(session["content"])))
+    return blocks
+
+
+def _markdown(blocks: List[Block]) -> str:
+    out: List[str] = []
+    for kind, payload in blocks:
+        if kind == "heading":
+            level, text = payload
+            out.append(f"{'#' * level} {text}\n")
+        elif kind == "paragraph":
+            out.append(payload + "\n")
+        elif kind == "fields":
+            out.append("".join(f"- **{label}:** {value}\n" for label, value in payload))
+        else:
+            out.append("".join(f"- {item}\n" for item in payload))
+    return "\n".join(out)
+
+
+def _html(blocks: List[Block]) -> str:
+    esc = html.escape
+    out: List[str] = ["<article>"]
+    for kind, payload in blocks:
+        if kind == "heading":
+            level, text = payload
+            out.append(f"<h{level}>{esc(text)}</h{level}>")
+        elif kind == "paragraph":
+            out.extend(
+                "<p>" + esc(paragraph.strip()).replace("\n", "<br>") + "</p>"
+                for paragraph in payload.split("\n\n") if paragraph.strip()
+            )
+        elif kind == "fields":
+            out.append("<dl>" + "".join(f"<dt>{esc(label)}</dt><dd>{esc(value)}</dd>" for label, value in payload) + "</dl>")
+        else:
+            out.append("<ul>" + "".join(f"<li>{esc(item)}</li>" for item in payload) + "</ul>")
+    out.append("</article>")
+    return "\n".join(out) + "\n"
+
+
+def render_fragment(session: Dict[str, Any], fmt: str) -> bytes:
+    blocks = session_blocks(session)
+    return (_markdown(blocks) if fmt == "markdown" else _html(blocks)).encode("utf-8")
+
+
+def separator(fmt: str) -> bytes:
+    """Placed between consecutive sessions of a multi-session document."""
+    return b"\n---\n\n" if fmt == "markdown" else b"<hr>\n"
+
+
+def document_prefix(fmt: str, title: str) -> bytes:
+    if fmt == "markdown":
+        return b""
+    return (
+        f'<!DOCTYPE html>\n<html lang="en"><head><meta charset="utf-8">'
+        f"<title>{html.escape(title)}</title><style>{_STYLE}</style></head><body>\n"
+    ).encode("utf-8")
+
+
+def document_suffix(fmt: str) -> bytes:
+    return b"" if fmt == "markdown" else b"</body></html>\n"
@@ -0,0 +1,170 @@
+"""
+Extractive summaries of NPC interaction history and session notes.
+
+Sentences are turned into a TF-IDF matrix (sublinear term frequency,
+smoothed IDF, rows L2-normalized) in one pass with NumPy. Each sentence is
+then scored twice:
+
+* TextRank: PageRank over the cosine-similarity graph ``X @ X.T``, computed
+  by power iteration on the row-normalized matrix;
+* salience: cosine similarity to the centroid of all sentences.
+
+The highest combined scores are returned in their original order. A few
+hundred sentences take a few milliseconds, so no model server is needed.
+
+HistorySummaries keeps each NPC's sentences, so an appended interaction adds
+its sentences to the cached list instead of re-reading the NPC's whole
+history. Summaries are cached per ``(npc_id, history length)``.
+"""
+
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from search_index import tokenize
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+STOPWORDS = frozenset(
+    "a an and are as at be been but by for from had has have he her his i in is it its of on or our she "
+    "that the their them they this to was we were what when which who will with you your".split()
+)
+
+DAMPING = 0.85
+MAX_ITERATIONS = 100
+TOLERANCE = 1e-6
+SALIENCE_WEIGHT = 0.5
+# Sentences with fewer content words than this are only picked when nothing else is left
+MIN_TERMS = 3
+# Only the most recent sentences of a long history are ranked
+MAX_SENTENCES = 500
+DEFAULT_SENTENCES = 3
+
+
+def split_sentences(texts: Iterable[str]) -> List[str]:
+    sentences = []
+    for text in texts:
+        sentences.extend(" ".join(part.split()) for part in SENTENCE_RE.split(text))
+    return [sentence for sentence in sentences if sentence]
+
+
+def tfidf_matrix(sentences: List[List[str]]) -> np.ndarray:
+    """Row-normalized float32 TF-IDF matrix, one row per tokenized sentence."""
+    vocabulary: Dict[str, int] = {}
+    rows = np.repeat(np.arange(len(sentences)), [len(terms) for terms in sentences])
+    cols = np.fromiter(
+        (vocabulary.setdefault(term, len(vocabulary)) for terms in sentences for term in terms),
+        dtype=np.int64,
+        count=len(rows),
+    )
+    width = max(len(vocabulary), 1)
+    # Work on the (sentence, term) pairs that occur, then scatter them into the dense matrix
+    cells, counts = np.unique(rows * width + cols, return_counts=True)
+    cell_rows, cell_cols = np.divmod(cells, width)
+    df = np.bincount(cell_cols, minlength=width)
+    idf = np.log((1.0 + len(sentences)) / (1.0 + df)) + 1.0
+    weights = (1.0 + np.log(counts)) * idf[cell_cols]
+    norms = np.sqrt(np.bincount(cell_rows, weights=weights * weights, minlength=len(sentences)))
+    matrix = np.zeros(len(sentences) * width, dtype=np.float32)
+    matrix[cells] = weights / norms[cell_rows]
+    return matrix.reshape(len(sentences), width)
+
+
+def textrank(similarity: np.ndarray) -> np.ndarray:
+    count = len(similarity)
+    np.fill_diagonal(similarity, 0.0)
+    outgoing = similarity.sum(axis=1, keepdims=True)
+    # Sentences sharing no words with any other link to every sentence equally
+    transition = np.where(outgoing > 0, similarity / np.where(outgoing == 0, 1.0, outgoing), 1.0 / count)
+    rank = np.full(count, 1.0 / count, dtype=np.float32)
+    for _ in range(MAX_ITERATIONS):
+        updated = (1.0 - DAMPING) / count + DAMPING * (transition.T @ rank)
+        if np.abs(updated - rank).sum() < TOLERANCE:
+            return updated
+        rank = updated
+    return rank
+
+
+def summarize(sentences: List[str], max_sentences: int = DEFAULT_SENTENCES) -> List[str]:
+    """The ``max_sentences`` most central of ``sentences``, in their original order."""
+    unique = list(dict.fromkeys(sentences))
+    if len(unique) <= max_sentences:
+        return unique
+    terms = [[term for term in tokenize(sentence) if term not in STOPWORDS] for sentence in unique]
+    matrix = tfidf_matrix(terms)
+    rank = textrank(matrix @ matrix.T)
+    salience = matrix @ matrix.mean(axis=0)
+    scores = rank / rank.max() + SALIENCE_WEIGHT * salience / max(float(salience.max()), 1e-9)
+    scores[np.array([len(t) for t in terms]) < MIN_TERMS] -= scores.max() + 1.0
+    chosen = np.sort(np.argsort(-scores, kind="stable")[:max_sentences])
+    return [unique[i] for i in chosen]
+
+
+def summarize_text(texts: Iterable[str], max_sentences: int = DEFAULT_SENTENCES) -> List[str]:
+    return summarize(split_sentences(texts)[-MAX_SENTENCES:], max_sentences)
+
+
+@dataclass
+class _History:
+    count: int = 0
+    sentences: List[str] = field(default_factory=list)
+    summaries: Dict[int, List[str]] = field(default_factory=dict)
+
+
+class HistorySummaries:
+    """Per-NPC sentence lists and summaries, bounded to the ``max_npcs`` most recently used."""
+
+    def __init__(self, max_npcs: int = 1024):
+        self.max_npcs = max_npcs
+        self._histories: "OrderedDict[str, _History]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, npc_id: str) -> Optional[int]:
+        """How many of the NPC's interactions are held, or None if it is not cached."""
+        history = self._histories.get(npc_id)
+        return history.count if history else None
+
+    def extend(self, npc_id: str, base: int, interactions: List[str]) -> bool:
+        """
+        Add interactions numbered from ``base``. An NPC that is not cached is
+        left alone (it is loaded when first summarized); one whose cached
+        count is not ``base`` missed an append and is dropped.
+        """
+        history = self._histories.get(npc_id)
+        if base == 0:
+            history = self._histories[npc_id] = _History()
+        elif history is None:
+            return False
+        elif history.count != base:
+            del self._histories[npc_id]
+            return False
+        history.sentences.extend(split_sentences(interactions))
+        del history.sentences[:-MAX_SENTENCES]
+        history.count = base + len(interactions)
+        history.summaries.clear()
+        self._histories.move_to_end(npc_id)
+        while len(self._histories) > self.max_npcs:
+            self._histories.popitem(last=False)
+        return True
+
+    def summary(self, npc_id: str, max_sentences: int = DEFAULT_SENTENCES) -> List[str]:
+        history = self._histories[npc_id]
+        self._histories.move_to_end(npc_id)
+        if max_sentences in history.summaries:
+            self.hits += 1
+        else:
+            self.misses += 1
+            history.summaries[max_sentences] = summarize(history.sentences, max_sentences)
+        return history.summaries[max_sentences]
+
+    def discard(self, npc_id: str):
+        self._histories.pop(npc_id, None)
+
+    def clear(self):
+        self._histories.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"npcs": len(self._histories), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,326 @@
+"""
+Offline embedding index for "related sessions" and "similar NPCs".
+
+Documents are embedded with a signed hashing vectorizer: unigrams and
+bigrams of the tokenized text (stopwords dropped) are hashed with CRC-32
+into ``dim`` buckets, damped with ``log1p`` and L2-normalized. The hash is
+stable across processes, so stored vectors stay valid after a restart,
+and no vocabulary has to be fitted or kept.
+
+Vectors live in one contiguous float32 matrix, one row per document. A
+query is a single matrix-vector product over every live row (cosine
+similarity, since rows are unit length) followed by ``argpartition``. When
+the index holds ``ivf_min_rows`` documents or more, an inverted-file
+partition is trained with spherical k-means on a sample. A query then
+scores only the rows filed under its ``probes`` nearest centroids. The
+partition is retrained once the index has doubled.
+
+With a ``path``, ``save`` writes the matrix to a ``.f32`` file next to
+``<path>.json``, which lists the keys with a digest of each document's text.
+``load`` maps the matrix back with a copy-on-write ``np.memmap``: restored
+vectors are paged in from the file as queries touch them, and editing a
+document only copies the pages it writes. The matrix moves into memory the
+first time a new document needs a row, or when the index is compacted.
+``add`` skips documents whose digest is unchanged, so a restart only embeds
+documents edited since the last save.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import zlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from search_index import tokenize
+from summarizer import STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+# Bump when embed() changes so stale persisted vectors are discarded
+EMBEDDING_VERSION = 1
+DEFAULT_DIM = 384
+INITIAL_CAPACITY = 256
+KMEANS_ITERATIONS = 8
+KMEANS_SAMPLE_PER_LIST = 16
+
+
+def embed(texts: Iterable[str], dim: int = DEFAULT_DIM) -> np.ndarray:
+    tokens = [token for token in tokenize(" ".join(texts)) if token not in STOPWORDS]
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    vector = np.zeros(dim, dtype=np.float32)
+    if not features:
+        return vector
+    hashes = np.fromiter((zlib.crc32(feature.encode()) for feature in features), dtype=np.uint32, count=len(features))
+    # The top bit picks the sign so colliding features tend to cancel instead of pile up
+    signs = np.where(hashes >> 31, -1.0, 1.0)
+    counts = np.bincount(hashes % dim, weights=signs, minlength=dim)
+    vector[:] = np.sign(counts) * np.log1p(np.abs(counts))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def text_digest(texts: Iterable[str]) -> str:
+    return hashlib.blake2b("\x00".join(texts).encode(), digest_size=8).hexdigest()
+
+
+class VectorIndex:
+    def __init__(self, dim: int = DEFAULT_DIM, path: Optional[str] = None, ivf_min_rows: int = 0, probes: int = 8):
+        self.dim = dim
+        self.path = path
+        self.ivf_min_rows = ivf_min_rows
+        self.probes = probes
+        self._reset()
+
+    def _reset(self):
+        self._matrix = np.zeros((INITIAL_CAPACITY, self.dim), dtype=np.float32)
+        self._alive = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        self._keys: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._digests: Dict[str, str] = {}
+        self._dead = 0
+        self._dirty = False
+        self._drop_partition()
+
+    def _drop_partition(self):
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = []
+        self._list_arrays: Dict[int, np.ndarray] = {}
+        self._row_list: Dict[int, int] = {}
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    # Writes
+
+    def add(self, key: str, texts: List[str]) -> bool:
+        """Embed and store a document; returns False if its text is unchanged."""
+        digest = text_digest(texts)
+        if self._digests.get(key) == digest:
+            return False
+        self._store(key, embed(texts, self.dim), digest)
+        return True
+
+    def _store(self, key: str, vector: np.ndarray, digest: str):
+        row = self._rows.get(key)
+        if row is None:
+            row = len(self._keys)
+            if row == len(self._matrix):
+                self._grow()
+            self._keys.append(key)
+            self._rows[key] = row
+            self._alive[row] = True
+        self._matrix[row] = vector
+        self._digests[key] = digest
+        self._dirty = True
+        if self._centroids is not None:
+            self._file(row)
+
+    def _grow(self):
+        """Double the row capacity; this is also where a mapped matrix is copied into memory."""
+        capacity = max(INITIAL_CAPACITY, 2 * len(self._matrix))
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[:len(self._matrix)] = self._matrix
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self._alive)] = self._alive
+        self._matrix, self._alive = matrix, alive
+
+    def remove(self, key: str):
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+        del self._digests[key]
+        self._keys[row] = None
+        self._alive[row] = False
+        self._dead += 1
+        self._dirty = True
+        if self._dead > INITIAL_CAPACITY and self._dead * 2 > len(self._keys):
+            self._compact()
+
+    def retain(self, keys: Set[str]):
+        """Drop every document not in ``keys``."""
+        for key in [key for key in self._rows if key not in keys]:
+            self.remove(key)
+
+    def _compact(self):
+        live = [(key, self._matrix[row].copy(), self._digests[key]) for key, row in self._rows.items()]
+        self._reset()
+        for key, vector, digest in live:
+            self._store(key, vector, digest)
+
+    # Inverted-file partition
+
+    def _file(self, row: int):
+        """(Re)assign a row to its nearest centroid's list."""
+        target = int(np.argmax(self._centroids @ self._matrix[row]))
+        previous = self._row_list.get(row)
+        if previous == target:
+            return
+        if previous is not None:
+            self._lists[previous].remove(row)
+            self._list_arrays.pop(previous, None)
+        self._lists[target].append(row)
+        self._list_arrays.pop(target, None)
+        self._row_list[row] = target
+
+    def _train(self):
+        live = np.flatnonzero(self._alive[:len(self._keys)])
+        count = int(math.sqrt(len(live)))
+        rng = np.random.default_rng(0)
+        sample = self._matrix[rng.choice(live, min(len(live), count * KMEANS_SAMPLE_PER_LIST), replace=False)]
+        centroids = sample[rng.choice(len(sample), count, replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # A centroid that attracted no sample keeps its position
+            centroids = np.where(norms > 0, sums / np.where(norms == 0, 1.0, norms), centroids)
+
+        self._drop_partition()
+        self._centroids = centroids.astype(np.float32)
+        self._lists = [[] for _ in range(count)]
+        assignment = np.argmax(self._matrix[live] @ self._centroids.T, axis=1)
+        for row, target in zip(live.tolist(), assignment.tolist()):
+            self._lists[target].append(row)
+            self._row_list[row] = target
+        self._trained_size = len(live)
+        logger.info("Trained %d-list vector partition over %d documents", count, len(live))
+
+    def _candidates(self, vector: np.ndarray) -> Optional[np.ndarray]:
+        """Rows worth scoring for ``vector``; None means all of them."""
+        if not self.ivf_min_rows or len(self._rows) < self.ivf_min_rows:
+            if self._centroids is not None:
+                self._drop_partition()
+            return None
+        if self._centroids is None or len(self._rows) > 2 * self._trained_size:
+            self._train()
+        nearest = np.argsort(-(self._centroids @ vector))[:self.probes]
+        arrays = []
+        for target in nearest.tolist():
+            array = self._list_arrays.get(target)
+            if array is None:
+                array = self._list_arrays[target] = np.array(self._lists[target], dtype=np.int64)
+            arrays.append(array)
+        return np.concatenate(arrays)
+
+    # Queries
+
+    def vector(self, key: str) -> Optional[np.ndarray]:
+        row = self._rows.get(key)
+        return None if row is None else self._matrix[row]
+
+    def query(self, vector: np.ndarray, limit: int, exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """The ``limit`` most similar documents as ``(key, cosine)``, best first."""
+        if not self._rows or not vector.any():
+            return []
+        rows = self._candidates(vector)
+        if rows is None:
+            rows = np.flatnonzero(self._alive[:len(self._keys)])
+        else:
+            rows = rows[self._alive[rows]]
+        excluded = {self._rows[key] for key in exclude if key in self._rows}
+        if excluded:
+            rows = rows[~np.isin(rows, list(excluded))]
+        if not len(rows):
+            return []
+        scores = self._matrix[rows] @ vector
+        top = min(limit, len(rows))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(self._keys[rows[i]], round(float(scores[i]), 4)) for i in best if scores[i] > 0]
+
+    def similar_to(self, key: str, limit: int) -> List[Tuple[str, float]]:
+        vector = self.vector(key)
+        return [] if vector is None else self.query(vector, limit, exclude=[key])
+
+    def search(self, texts: List[str], limit: int) -> List[Tuple[str, float]]:
+        return self.query(embed(texts, self.dim), limit)
+
+    # Persistence
+
+    def load(self) -> bool:
+        """Restore vectors saved by ``save``; False if there was nothing usable."""
+        if not self.path or not os.path.exists(self.path + ".json"):
+            return False
+        try:
+            with open(self.path + ".json") as handle:
+                meta = json.load(handle)
+            if meta.get("version") != EMBEDDING_VERSION or meta.get("dim") != self.dim:
+                return False
+            keys, digests = meta["keys"], meta["digests"]
+            # Copy-on-write: writes land in private memory and the file stays as saved
+            stored = np.memmap(
+                os.path.join(os.path.dirname(self.path), meta["matrix"]), dtype=np.float32, mode="c", shape=(len(keys), self.dim)
+            ) if keys else None
+        except (OSError, ValueError, KeyError) as exc:
+            logger.warning("Ignoring unreadable vector index %s: %s", self.path, exc)
+            return False
+        self._reset()
+        if stored is not None:
+            self._matrix = stored
+            self._alive = np.ones(len(keys), dtype=bool)
+        self._keys = list(keys)
+        self._rows = {key: row for row, key in enumerate(keys)}
+        self._digests = dict(zip(keys, digests))
+        return True
+
+    def save(self):
+        """
+        Write the live vectors to a new ``<path>.<n>.f32`` file, then point
+        ``<path>.json`` at it with one atomic rename, so a crash mid-save
+        leaves the previous snapshot intact.
+        """
+        if not self.path or not self._dirty:
+            return
+        if self._dead:
+            self._compact()
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        previous = None
+        if os.path.exists(self.path + ".json"):
+            try:
+                with open(self.path + ".json") as handle:
+                    previous = json.load(handle).get("matrix")
+            except (OSError, ValueError):
+                pass
+        generation = int(previous.rsplit(".", 2)[-2]) + 1 if previous else 1
+        matrix_name = f"{os.path.basename(self.path)}.{generation}.f32"
+        count = len(self._keys)
+        if count:
+            stored = np.memmap(os.path.join(directory, matrix_name), dtype=np.float32, mode="w+", shape=(count, self.dim))
+            stored[:] = self._matrix[:count]
+            stored.flush()
+            del stored
+        meta = {
+            "version": EMBEDDING_VERSION,
+            "dim": self.dim,
+            "matrix": matrix_name,
+            "keys": self._keys,
+            "digests": [self._digests[key] for key in self._keys],
+        }
+        with open(self.path + ".json.tmp", "w") as handle:
+            json.dump(meta, handle)
+        os.replace(self.path + ".json.tmp", self.path + ".json")
+        if previous and previous != matrix_name:
+            try:
+                os.remove(os.path.join(directory, previous))
+            except OSError:
+                pass
+        self._dirty = False
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "documents": len(self._rows),
+            "dim": self.dim,
+            "partitioned": self._centroids is not None,
+            "mapped": isinstance(self._matrix, np.memmap),
+            "lists": len(self._lists),
+        }
@@ -0,0 +1,129 @@
+"""
+Write-behind buffer that coalesces bursts of partial updates.
+
+Updates to the same key arriving within ``window`` seconds of the first one
+are merged field by field (later values win) and written once, when the
+window closes. Every accepted update gets a version number, increasing per
+buffer, that the caller can hand back to the client as an acknowledgement.
+
+Writes for one key are serialized, so a timed flush, an explicit flush and
+a write-through never reach the database out of order. Until its window
+closes, a buffered update lives only in this process. Callers that need
+durability use ``write_through`` or ``flush``, and the application flushes
+everything on shutdown.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+ApplyFn = Callable[[str, Dict[str, Any]], Awaitable[Any]]
+
+
+class WriteBehindBuffer:
+    def __init__(self, apply: ApplyFn, window: float):
+        self._apply = apply
+        self.window = window
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        # Per-key locks exist only while some caller holds or waits for them
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._lock_users: Dict[str, int] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        # Millisecond clock seed keeps versions increasing across restarts
+        self._version = int(time.time() * 1000)
+        self.accepted = 0
+        self.writes = 0
+
+    @asynccontextmanager
+    async def _locked(self, key: str) -> AsyncIterator[None]:
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._lock_users[key] = self._lock_users.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._lock_users[key] -= 1
+            if not self._lock_users[key]:
+                del self._lock_users[key]
+                del self._locks[key]
+
+    def has_pending(self, key: str) -> bool:
+        return key in self._pending
+
+    def put(self, key: str, fields: Dict[str, Any]) -> int:
+        """Buffer ``fields`` for ``key``; returns the version acknowledging them."""
+        self._pending.setdefault(key, {}).update(fields)
+        self.accepted += 1
+        self._version += 1
+        if key not in self._timers:
+            loop = asyncio.get_running_loop()
+            self._timers[key] = loop.call_later(self.window, self._start_timed_flush, key)
+        return self._version
+
+    def _start_timed_flush(self, key: str):
+        # The loop only keeps weak references to tasks, so hold on to it until it finishes
+        task = asyncio.ensure_future(self._flush_timed(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush_timed(self, key: str):
+        try:
+            await self.flush(key)
+        except Exception:
+            logger.exception("Buffered write for %s failed", key)
+
+    async def _write(self, key: str, extra: Optional[Dict[str, Any]]) -> Any:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        fields = self._pending.pop(key, {})
+        if extra:
+            fields.update(extra)
+        if not fields and extra is None:
+            return None
+        self.writes += 1
+        return await self._apply(key, fields)
+
+    async def flush(self, key: str) -> Any:
+        """Write whatever is buffered for ``key`` now; returns the apply result (None if nothing was pending)."""
+        async with self._locked(key):
+            return await self._write(key, None)
+
+    async def write_through(self, key: str, fields: Dict[str, Any]) -> Any:
+        """Write ``fields`` together with anything still buffered for ``key``, before returning."""
+        async with self._locked(key):
+            self.accepted += 1
+            self._version += 1
+            return await self._write(key, fields)
+
+    async def flush_all(self):
+        # Timed flushes already under way have taken their fields out of _pending
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for key in list(self._pending):
+            try:
+                await self.flush(key)
+            except Exception:
+                logger.exception("Buffered write for %s failed", key)
+
+    def discard(self, key: str):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        self._pending.pop(key, None)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "accepted": self.accepted,
+            "writes": self.writes,
+            "coalesced": self.accepted - self.writes - len(self._pending),
+        }
@@ -42,6 +42,8 @@ class DDNoteAPITester:
                 response = requests.post(url, auth=self.auth, json=data, headers=headers, timeout=10)
             elif method == 'PUT':
                 response = requests.put(url, auth=self.auth, json=data, headers=headers, timeout=10)
+            elif method == 'PATCH':
+                response = requests.patch(url, auth=self.auth, json=data, headers=headers, timeout=10)
             elif method == 'DELETE':
                 response = requests.delete(url, auth=self.auth, headers=headers, timeout=10)
             else:
@@ -102,6 +104,33 @@ class DDNoteAPITester:
             return self.log_test("Get Sessions", True, f"- Count: {len(data)}")
         return self.log_test("Get Sessions", False, f"- Response: {data}")
 
+    def test_paginate_sessions(self):
+        """Test walking the session listing one page at a time with cursors"""
+        url = f"{self.api_url}/sessions"
+        seen_ids = []
+        params = {"limit": 1}
+        try:
+            for _ in range(5):
+                response = requests.get(url, auth=self.auth, params=params, timeout=10)
+                if response.status_code != 200 or len(response.json()) > 1:
+                    return self.log_test("Paginate Sessions", False, f"- Status: {response.status_code}")
+                seen_ids.extend(session['id'] for session in response.json())
+                next_cursor = response.headers.get('X-Next-Cursor')
+                if not next_cursor:
+                    break
+                params = {"limit": 1, "cursor": next_cursor}
+        except Exception as e:
+            return self.log_test("Paginate Sessions", False, f"- Error: {str(e)}")
+
+        if len(seen_ids) == len(set(seen_ids)):
+            return self.log_test("Paginate Sessions", True, f"- Pages walked: {len(seen_ids)}")
+        return self.log_test("Paginate Sessions", False, f"- Duplicate IDs across pages: {seen_ids}")
+
+    def test_invalid_cursor(self):
+        """Test that a forged cursor is rejected"""
+        success, data = self.make_request('GET', 'npcs?cursor=not-a-cursor', expected_status=400)
+        return self.log_test("Invalid Cursor Rejected", success, f"- Response: {data}")
+
     def test_get_session_by_id(self):
         """Test retrieving a specific session"""
         if not self.session_id:
@@ -112,6 +141,25 @@ class DDNoteAPITester:
             return self.log_test("Get Session by ID", True, f"- Title: {data.get('title', 'No title')}")
         return self.log_test("Get Session by ID", False, f"- Response: {data}")
 
+    def test_conditional_get_session(self):
+        """Test that a repeated read with If-None-Match is answered with 304"""
+        if not self.session_id:
+            return self.log_test("Conditional GET Session", False, "- No session ID available")
+
+        url = f"{self.api_url}/sessions/{self.session_id}"
+        try:
+            first = requests.get(url, auth=self.auth, timeout=10)
+            etag = first.headers.get('ETag')
+            if not etag:
+                return self.log_test("Conditional GET Session", False, "- No ETag header")
+            second = requests.get(url, auth=self.auth, headers={'If-None-Match': etag}, timeout=10)
+        except Exception as e:
+            return self.log_test("Conditional GET Session", False, f"- Error: {str(e)}")
+
+        if second.status_code == 304 and not second.content:
+            return self.log_test("Conditional GET Session", True, f"- ETag: {etag}")
+        return self.log_test("Conditional GET Session", False, f"- Status: {second.status_code}")
+
     def test_update_session(self):
         """Test updating a session"""
         if not self.session_id:
@@ -125,6 +173,99 @@ class DDNoteAPITester:
             return self.log_test("Update Session", True, f"- Updated at: {data.get('updated_at')}")
         return self.log_test("Update Session", False, f"- Response: {data}")
 
+    def test_change_feed(self):
+        """Test that a session edit shows up in the change feed after the client's token"""
+        if not self.session_id:
+            return self.log_test("Change Feed", False, "- No session ID available")
+
+        success, data = self.make_request('GET', 'changes?since=0&limit=1')
+        if not success:
+            return self.log_test("Change Feed", False, f"- Response: {data}")
+        since = data.get('next', 0)
+        while data.get('has_more'):
+            success, data = self.make_request('GET', f'changes?since={since}&limit=500')
+            since = data.get('next', since)
+
+        self.make_request('PUT', f'sessions/{self.session_id}', {"title": "Change Feed Check"})
+        success, data = self.make_request('GET', f'changes?since={since}')
+        changed_ids = [change['id'] for change in data.get('changes', [])]
+        if success and self.session_id in changed_ids and data.get('next', 0) > since:
+            return self.log_test("Change Feed", True, f"- {len(changed_ids)} change(s) since {since}")
+        return self.log_test("Change Feed", False, f"- Response: {data}")
+
+    def test_live_events(self):
+        """Test that the live event stream replays recent changes as server-sent events"""
+        url = f"{self.api_url}/live/events"
+        try:
+            with requests.get(url, auth=self.auth, params={"since": 0}, stream=True, timeout=10) as response:
+                if response.status_code != 200:
+                    return self.log_test("Live Events", False, f"- Status: {response.status_code}")
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith("data: "):
+                        event = json.loads(line[len("data: "):])
+                        return self.log_test("Live Events", event.get('type') == 'change', f"- First event: {event}")
+        except Exception as e:
+            return self.log_test("Live Events", False, f"- Error: {str(e)}")
+        return self.log_test("Live Events", False, "- Stream ended without events")
+
+    def test_live_events_token(self):
+        """Test that a browser-style client without credentials can connect with a live token"""
+        success, data = self.make_request('POST', 'live/token')
+        if not success or not data.get('token'):
+            return self.log_test("Live Events Token", False, f"- Response: {data}")
+        url = f"{self.api_url}/live/events"
+        try:
+            rejected = requests.get(url, params={"token": "0.bad"}, timeout=10)
+            with requests.get(url, params={"since": 0, "token": data['token']}, stream=True, timeout=10) as response:
+                if rejected.status_code == 401 and response.status_code == 200:
+                    return self.log_test("Live Events Token", True, f"- Token valid for {data.get('expires_in')}s")
+                return self.log_test("Live Events Token", False, f"- Status: {rejected.status_code}/{response.status_code}")
+        except Exception as e:
+            return self.log_test("Live Events Token", False, f"- Error: {str(e)}")
+
+    def test_autosave_coalescing(self):
+        """Test that buffered autosaves are acknowledged and written once flushed"""
+        if not self.session_id:
+            return self.log_test("Autosave Coalescing", False, "- No session ID available")
+
+        versions = []
+        for i in range(3):
+            success, data = self.make_request('PUT', f'sessions/{self.session_id}?autosave=true',
+                                              {"content": f"Autosave draft {i}"}, expected_status=202)
+            if not success:
+                return self.log_test("Autosave Coalescing", False, f"- Response: {data}")
+            versions.append(data.get('version'))
+
+        success, data = self.make_request('PUT', f'sessions/{self.session_id}?autosave=true&flush=true', {})
+        if success and data.get('content') == "Autosave draft 2" and versions == sorted(set(versions)):
+            return self.log_test("Autosave Coalescing", True, f"- Versions: {versions}")
+        return self.log_test("Autosave Coalescing", False, f"- Response: {data}")
+
+    def test_related_sessions(self):
+        """Test that related sessions are ranked by similarity and exclude the session itself"""
+        if not self.session_id:
+            return self.log_test("Related Sessions", False, "- No session ID available")
+
+        success, data = self.make_request('GET', f'sessions/{self.session_id}/related?limit=3')
+        related = data.get('related', [])
+        scores = [item.get('score', 0) for item in related]
+        if success and len(related) <= 3 and self.session_id not in [item['id'] for item in related] and scores == sorted(scores, reverse=True):
+            return self.log_test("Related Sessions", True, f"- Related: {[(item['title'], item['score']) for item in related]}")
+        return self.log_test("Related Sessions", False, f"- Response: {data}")
+
+    def test_search_sessions(self):
+        """Test full-text search for a phrase and a prefix from the updated session"""
+        if not self.session_id:
+            return self.log_test("Search Sessions", False, "- No session ID available")
+
+        phrase_ok, phrase_data = self.make_request('GET', 'search?q="Elara the Barmaid"&type=session')
+        prefix_ok, prefix_data = self.make_request('GET', 'search?q=barm*&type=session')
+        phrase_ids = [result['id'] for result in phrase_data.get('results', [])]
+        prefix_ids = [result['id'] for result in prefix_data.get('results', [])]
+        if phrase_ok and prefix_ok and self.session_id in phrase_ids and self.session_id in prefix_ids:
+            return self.log_test("Search Sessions", True, f"- Phrase hits: {len(phrase_ids)}, prefix hits: {len(prefix_ids)}")
+        return self.log_test("Search Sessions", False, f"- Phrase: {phrase_data}, prefix: {prefix_data}")
+
     def test_create_npc(self):
         """Test creating a new NPC"""
         npc_data = {
@@ -160,6 +301,16 @@ class DDNoteAPITester:
             return self.log_test("Get NPC by ID", True, f"- Name: {data.get('name', 'No name')}")
         return self.log_test("Get NPC by ID", False, f"- Response: {data}")
 
+    def test_npc_mentioned_in_sessions(self):
+        """Test that sessions naming an NPC are linked to it through npcs_mentioned"""
+        if not self.npc_id or not self.session_id:
+            return self.log_test("NPC Mentioned In Sessions", False, "- No NPC or session ID available")
+
+        success, data = self.make_request('GET', f'npcs/{self.npc_id}/sessions')
+        if success and isinstance(data, list) and self.session_id in [session['id'] for session in data]:
+            return self.log_test("NPC Mentioned In Sessions", True, f"- Sessions: {len(data)}")
+        return self.log_test("NPC Mentioned In Sessions", False, f"- Response: {data}")
+
     def test_update_npc(self):
         """Test updating an NPC"""
         if not self.npc_id:
@@ -190,6 +341,91 @@ class DDNoteAPITester:
             return self.log_test("Extract NPC", True, f"- Action: {action}, NPC: {npc_name}")
         return self.log_test("Extract NPC", False, f"- Response: {data}")
 
+    def test_extract_npc_bulk(self):
+        """Test applying several extractions, including a repeated name, in one request"""
+        if not self.session_id:
+            return self.log_test("Extract NPC Bulk", False, "- No session ID available")
+
+        bulk_data = {
+            "extractions": [
+                {"session_id": self.session_id, "extracted_text": "Elara poured another round", "npc_name": "Elara the Barmaid"},
+                {"session_id": self.session_id, "extracted_text": "Elara warned of bandits", "npc_name": "Elara the Barmaid"},
+                {"session_id": self.session_id, "extracted_text": "Thorin the Blacksmith sharpened swords", "npc_name": "Thorin the Blacksmith"}
+            ]
+        }
+        success, data = self.make_request('POST', 'extract-npc/bulk', bulk_data)
+        added = {result['npc']['name']: result['interactions_added'] for result in data.get('results', [])}
+        if success and added == {"Elara the Barmaid": 2, "Thorin the Blacksmith": 1}:
+            return self.log_test("Extract NPC Bulk", True, f"- Interactions added: {added}")
+        return self.log_test("Extract NPC Bulk", False, f"- Response: {data}")
+
+    def test_resolve_npc(self):
+        """Test that a variant of a tracked NPC's name resolves to that NPC"""
+        if not self.npc_id:
+            return self.log_test("Resolve NPC", False, "- No NPC ID available")
+
+        success, data = self.make_request('GET', 'npcs/resolve?name=thorin')
+        matches = data.get('matches', [])
+        if success and matches and matches[0].get('npc_id') == self.npc_id:
+            return self.log_test("Resolve NPC", True, f"- Best match: {matches[0]}")
+        return self.log_test("Resolve NPC", False, f"- Response: {data}")
+
+    def test_resolve_npc_titled_name(self):
+        """Test that an extracted titled name resolves to a tracked NPC known by the short name"""
+        success, npc = self.make_request('POST', 'npcs', {"name": "Brannoc"})
+        if not success or 'id' not in npc:
+            return self.log_test("Resolve Titled Name", False, f"- Create failed: {npc}")
+        success, data = self.make_request('GET', 'npcs/resolve?name=Brannoc the Ferryman&threshold=0.9')
+        self.make_request('DELETE', f"npcs/{npc['id']}")
+        matches = data.get('matches', [])
+        if success and matches and matches[0].get('npc_id') == npc['id']:
+            return self.log_test("Resolve Titled Name", True, f"- Best match: {matches[0]}")
+        return self.log_test("Resolve Titled Name", False, f"- Response: {data}")
+
+    def test_resolve_npc_shared_short_form(self):
+        """Test that titled names sharing only their short form do not resolve to each other"""
+        if not self.npc_id:
+            return self.log_test("Shared Short Form", False, "- No NPC ID available")
+
+        success, npc = self.make_request('POST', 'npcs', {"name": "Lord of Waterdeep"})
+        if not success or 'id' not in npc:
+            return self.log_test("Shared Short Form", False, f"- Create failed: {npc}")
+        tracked = {"Thorin the Younger": self.npc_id, "Lord of Neverwinter": npc['id']}
+        merged = []
+        for name, npc_id in tracked.items():
+            success, data = self.make_request('GET', f'npcs/resolve?name={name}&threshold=0.9')
+            if not success or any(match.get('npc_id') == npc_id for match in data.get('matches', [])):
+                merged.append(name)
+        self.make_request('DELETE', f"npcs/{npc['id']}")
+        if not merged:
+            return self.log_test("Shared Short Form", True, f"- Kept apart: {', '.join(tracked)}")
+        return self.log_test("Shared Short Form", False, f"- Merged: {merged}")
+
+    def test_npc_history(self):
+        """Test paging through an extracted NPC's interaction history"""
+        success, data = self.make_request('GET', 'npcs?limit=500')
+        npc = next((n for n in data if n.get('name') == "Elara the Barmaid"), None) if success else None
+        if not npc:
+            return self.log_test("NPC History", False, "- Extracted NPC not found")
+
+        success, history = self.make_request('GET', f"npcs/{npc['id']}/history?limit=1")
+        if success and isinstance(history, list) and len(history) == 1 and npc.get('history_count', 0) >= 1:
+            return self.log_test("NPC History", True, f"- Entries: {npc['history_count']}, latest: {history[0].get('interaction')}")
+        return self.log_test("NPC History", False, f"- Response: {history}")
+
+    def test_npc_summary(self):
+        """Test that an NPC's history summary is drawn from its recorded interactions"""
+        success, data = self.make_request('GET', 'npcs?limit=500')
+        npc = next((n for n in data if n.get('name') == "Elara the Barmaid"), None) if success else None
+        if not npc:
+            return self.log_test("NPC Summary", False, "- Extracted NPC not found")
+
+        success, summary = self.make_request('GET', f"npcs/{npc['id']}/summary?sentences=2")
+        sentences = summary.get('summary', [])
+        if success and 1 <= len(sentences) <= 2 and summary.get('history_count') == npc.get('history_count'):
+            return self.log_test("NPC Summary", True, f"- Summary: {sentences}")
+        return self.log_test("NPC Summary", False, f"- Response: {summary}")
+
     def test_suggest_npcs(self):
         """Test NPC suggestion functionality"""
         text_data = {
@@ -201,6 +437,124 @@ class DDNoteAPITester:
             return self.log_test("Suggest NPCs", True, f"- Suggestions: {len(suggestions)} found: {suggestions}")
         return self.log_test("Suggest NPCs", False, f"- Response: {data}")
 
+    def test_suggest_npcs_batch(self):
+        """Test batched NPC suggestion returns one result per text, in order"""
+        batch_data = {
+            "texts": [
+                "The party met Gandalf the Wizard at the inn.",
+                "NPC: Frodo Baggins",
+                "Nothing notable happened."
+            ]
+        }
+        success, data = self.make_request('POST', 'suggest-npcs/batch', batch_data)
+        results = data.get('results', [])
+        if success and len(results) == 3 and "Frodo Baggins" in results[1].get('suggested_npcs', []):
+            return self.log_test("Suggest NPCs Batch", True, f"- Results: {[r['suggested_npcs'] for r in results]}")
+        return self.log_test("Suggest NPCs Batch", False, f"- Response: {data}")
+
+    def test_suggest_npcs_overlapping(self):
+        """Test that names overlapping a longer match are still suggested"""
+        batch_data = {"texts": ["Bob the Big Red waved", "NPC:Gandalf the Grey arrived"]}
+        success, data = self.make_request('POST', 'suggest-npcs/batch', batch_data)
+        found = [
+            set(r.get('suggested_npcs', [])) | {npc.get('suggested') for npc in r.get('existing_npcs', [])}
+            for r in data.get('results', [])
+        ]
+        if success and len(found) == 2 and "Big Red" in found[0] and "Gandalf the Grey" in found[1]:
+            return self.log_test("Suggest Overlapping Names", True, f"- Results: {[sorted(names) for names in found]}")
+        return self.log_test("Suggest Overlapping Names", False, f"- Response: {data}")
+
+    def test_request_profiles(self):
+        """Test that a request asking to be profiled shows up in the profile list when profiling is enabled"""
+        self.make_request('GET', 'sessions?limit=1&profile=cprofile')
+        success, data = self.make_request('GET', 'admin/profiles')
+        profiles = data.get('profiles', [])
+        if success and (not data.get('enabled') or any(p.get('route') == '/api/sessions' for p in profiles)):
+            return self.log_test("Request Profiles", True, f"- Enabled: {data.get('enabled')}, profiles: {len(profiles)}")
+        return self.log_test("Request Profiles", False, f"- Response: {data}")
+
+    def test_background_job(self):
+        """Test that a background suggestion job is queued and its result can be awaited"""
+        success, job = self.make_request('POST', 'suggest-npcs?background=true',
+                                         {"text": "NPC: Frodo Baggins"}, expected_status=202)
+        if not success or not job.get('id'):
+            return self.log_test("Background Job", False, f"- Response: {job}")
+
+        success, data = self.make_request('GET', f"jobs/{job['id']}?wait=10")
+        names = (data.get('result') or {}).get('suggested_npcs', [])
+        if success and data.get('status') == 'completed' and "Frodo Baggins" in names:
+            return self.log_test("Background Job", True, f"- Attempts: {data.get('attempts')}")
+        return self.log_test("Background Job", False, f"- Response: {data}")
+
+    def test_llm_stats(self):
+        """Test that the LLM admin endpoint reports whether the model is in use"""
+        success, data = self.make_request('GET', 'admin/llm')
+        if success and 'enabled' in data and (not data['enabled'] or 'cache_hits' in data):
+            return self.log_test("LLM Stats", True, f"- Stats: {data}")
+        return self.log_test("LLM Stats", False, f"- Response: {data}")
+
+    def test_metrics(self):
+        """Test that /metrics serves Prometheus text including request latencies"""
+        url = f"{self.base_url}/metrics"
+        try:
+            response = requests.get(url, auth=self.auth, timeout=10)
+            if response.status_code == 200 and 'http_request_duration_seconds_bucket' in response.text:
+                families = [line.split()[2] for line in response.text.splitlines() if line.startswith('# TYPE')]
+                return self.log_test("Prometheus Metrics", True, f"- {len(families)} metric families")
+            return self.log_test("Prometheus Metrics", False, f"- Status: {response.status_code}")
+        except Exception as e:
+            return self.log_test("Prometheus Metrics", False, f"- Error: {str(e)}")
+
+    def test_query_plans(self):
+        """Test that no route's query shape falls back to a collection scan"""
+        success, data = self.make_request('GET', 'admin/query-plans')
+        if success and data.get('collscans') == []:
+            return self.log_test("Query Plan Audit", True, f"- {len(data.get('plans', []))} query shapes use indexes")
+        return self.log_test("Query Plan Audit", False, f"- Response: {data}")
+
+    def test_analytics(self):
+        """Test campaign analytics aggregated from structured sessions"""
+        success, data = self.make_request('GET', 'analytics')
+        sections = ['npc_appearances', 'combat', 'loot_by_recipient', 'attendance', 'mission_status']
+        if success and all(section in data for section in sections):
+            return self.log_test("Campaign Analytics", True,
+                               f"- Sessions: {data.get('sessions')}, combat encounters: {data['combat'].get('encounters')}")
+        return self.log_test("Campaign Analytics", False, f"- Response: {data}")
+
+    def test_response_cache(self):
+        """Test that repeated listings are served from the response cache"""
+        self.make_request('GET', 'npcs')
+        self.make_request('GET', 'npcs')
+        success, data = self.make_request('GET', 'admin/cache')
+        responses = data.get('responses', {})
+        if success and responses.get('hits', 0) > 0:
+            return self.log_test("Response Cache", True, f"- Hits: {responses['hits']}, misses: {responses['misses']}")
+        return self.log_test("Response Cache", False, f"- Response: {data}")
+
+    def test_campaign_backup_restore(self):
+        """Test exporting the campaign archive and importing it back with NPC mentions intact"""
+        def mentions():
+            _, sessions = self.make_request('GET', 'sessions?limit=100')
+            return {session['id']: sorted(session.get('npcs_mentioned', [])) for session in sessions}
+
+        before = mentions()
+        try:
+            export = requests.get(f"{self.api_url}/campaign/export", auth=self.auth, timeout=30)
+            if export.status_code != 200:
+                return self.log_test("Campaign Backup/Restore", False, f"- Export status: {export.status_code}")
+            restore = requests.post(f"{self.api_url}/campaign/import", auth=self.auth, data=export.content, timeout=30)
+        except Exception as e:
+            return self.log_test("Campaign Backup/Restore", False, f"- Error: {str(e)}")
+
+        data = restore.json() if restore.status_code == 200 else {}
+        if not data or data.get('errors'):
+            return self.log_test("Campaign Backup/Restore", False, f"- Status: {restore.status_code}, {restore.text[:200]}")
+        after = mentions()
+        changed = [session_id for session_id, npc_ids in before.items() if after.get(session_id) != npc_ids]
+        if not changed:
+            return self.log_test("Campaign Backup/Restore", True, f"- Imported: {data['imported']}")
+        return self.log_test("Campaign Backup/Restore", False, f"- Mentions changed for sessions: {changed}")
+
     def test_delete_npc(self):
         """Test deleting an NPC"""
         if not self.npc_id:
@@ -339,6 +693,70 @@ class DDNoteAPITester:
                                f"- ID: {self.structured_session_id}, Type: {data.get('session_type')}")
         return self.log_test("Create Structured Session", False, f"- Response: {data}")
 
+    def test_patch_structured_session(self):
+        """Test appending, editing and removing structured items without re-sending the session"""
+        if not hasattr(self, 'structured_session_id') or not self.structured_session_id:
+            return self.log_test("Patch Structured Session", False, "- No structured session ID available")
+
+        append_ops = {
+            "operations": [
+                {"op": "append", "field": "loot", "item": {"item_name": "Bag of Holding", "recipient": "Aria"}},
+                {"op": "set", "field": "session_goal", "value": "Recover the stolen relic"}
+            ]
+        }
+        success, data = self.make_request('PATCH', f'sessions/{self.structured_session_id}/structured', append_ops)
+        loot = (data.get('structured_data') or {}).get('loot', [])
+        added = next((item for item in loot if item.get('item_name') == "Bag of Holding"), None)
+        if not success or not added:
+            return self.log_test("Patch Structured Session", False, f"- Append failed: {data}")
+
+        edit_ops = {
+            "operations": [
+                {"op": "update", "field": "loot", "item_id": added['id'], "fields": {"value": "4000 gp"}},
+                {"op": "remove", "field": "loot", "item_id": added['id']}
+            ]
+        }
+        success, data = self.make_request('PATCH', f'sessions/{self.structured_session_id}/structured', edit_ops)
+        remaining = [item['id'] for item in data.get('structured_data', {}).get('loot', [])]
+        if success and added['id'] not in remaining and data['structured_data']['session_goal'] == "Recover the stolen relic":
+            return self.log_test("Patch Structured Session", True, f"- Loot items left: {len(remaining)}")
+        return self.log_test("Patch Structured Session", False, f"- Response: {data}")
+
+    def test_patch_structured_same_item(self):
+        """Test two updates of one item in a request, and that a patch with a missing item writes nothing"""
+        if not hasattr(self, 'structured_session_id') or not self.structured_session_id:
+            return self.log_test("Patch Same Item Twice", False, "- No structured session ID available")
+
+        append_ops = {"operations": [{"op": "append", "field": "loot", "item": {"item_name": "Silver Chalice"}}]}
+        success, data = self.make_request('PATCH', f'sessions/{self.structured_session_id}/structured', append_ops)
+        added = next((item for item in (data.get('structured_data') or {}).get('loot', []) if item.get('item_name') == "Silver Chalice"), None)
+        if not success or not added:
+            return self.log_test("Patch Same Item Twice", False, f"- Append failed: {data}")
+
+        edit_ops = {
+            "operations": [
+                {"op": "update", "field": "loot", "item_id": added['id'], "fields": {"value": "50 gp"}},
+                {"op": "update", "field": "loot", "item_id": added['id'], "fields": {"recipient": "Aria", "value": "80 gp"}}
+            ]
+        }
+        success, data = self.make_request('PATCH', f'sessions/{self.structured_session_id}/structured', edit_ops)
+        edited = next((item for item in (data.get('structured_data') or {}).get('loot', []) if item.get('id') == added['id']), {})
+        if not success or edited.get('value') != "80 gp" or edited.get('recipient') != "Aria":
+            return self.log_test("Patch Same Item Twice", False, f"- Response: {data}")
+
+        failing_ops = {
+            "operations": [
+                {"op": "append", "field": "loot", "item": {"item_name": "Cursed Gem"}},
+                {"op": "update", "field": "loot", "item_id": "no-such-item", "fields": {"value": "1 gp"}}
+            ]
+        }
+        success, _ = self.make_request('PATCH', f'sessions/{self.structured_session_id}/structured', failing_ops, expected_status=404)
+        _, session = self.make_request('GET', f'sessions/{self.structured_session_id}')
+        names = [item.get('item_name') for item in (session.get('structured_data') or {}).get('loot', [])]
+        if success and "Cursed Gem" not in names:
+            return self.log_test("Patch Same Item Twice", True, f"- Edited item: {edited}")
+        return self.log_test("Patch Same Item Twice", False, f"- Failed patch left loot: {names}")
+
     def test_export_structured_session(self):
         """Test exporting structured session data"""
         if not hasattr(self, 'structured_session_id') or not self.structured_session_id:
@@ -358,6 +776,44 @@ class DDNoteAPITester:
                                f"- Export format valid, Type: {session_info.get('session_type')}")
         return self.log_test("Export Structured Session", False, f"- Response: {data}")
 
+    def test_export_markdown_session(self):
+        """Test exporting a structured session as a Markdown recap"""
+        if not getattr(self, 'structured_session_id', None):
+            return self.log_test("Export Markdown Session", False, "- No structured session ID available")
+
+        url = f"{self.api_url}/sessions/{self.structured_session_id}/export"
+        try:
+            response = requests.get(url, auth=self.auth, params={"format": "markdown"}, timeout=10)
+        except Exception as e:
+            return self.log_test("Export Markdown Session", False, f"- Error: {str(e)}")
+
+        if response.status_code == 200 and response.text.startswith("# ") and "## Combat Encounters" in response.text:
+            return self.log_test("Export Markdown Session", True, f"- {len(response.text)} characters")
+        return self.log_test("Export Markdown Session", False, f"- Status: {response.status_code}")
+
+    def test_missions(self):
+        """Test that overarching missions are tracked across sessions"""
+        success, data = self.make_request('GET', 'missions')
+        if not success or not isinstance(data, list):
+            return self.log_test("Mission Tracker", False, f"- Response: {data}")
+
+        mission = next((m for m in data if m.get('key') == 'rescue the villagers'), None)
+        if mission and mission.get('status') and mission.get('session_count', 0) >= 1:
+            return self.log_test("Mission Tracker", True, f"- {len(data)} missions, '{mission['name']}' is {mission['status']}")
+        return self.log_test("Mission Tracker", False, f"- Missions: {[m.get('key') for m in data]}")
+
+    def test_mission_detail(self):
+        """Test that mission listings trim session copies and the mission itself has them in full"""
+        success, data = self.make_request('GET', 'missions')
+        listed = next((m for m in data if m.get('key') == 'rescue the villagers'), None) if success else None
+        if not listed:
+            return self.log_test("Mission Detail", False, f"- Response: {data}")
+        success, mission = self.make_request('GET', 'missions/Rescue the Villagers')
+        trimmed = all(set(entry) <= {'session_id', 'title', 'created_at', 'status'} for entry in listed.get('sessions', []))
+        if success and trimmed and mission.get('sessions') and all('notes' in entry for entry in mission['sessions']):
+            return self.log_test("Mission Detail", True, f"- {len(mission['sessions'])} session copies")
+        return self.log_test("Mission Detail", False, f"- Listed: {listed}, detail: {mission}")
+
     def test_mixed_session_types(self):
         """Test that both structured and free-form sessions can coexist"""
         # Create a free-form session
@@ -428,14 +884,28 @@ class DDNoteAPITester:
         # Session CRUD tests (free-form)
         self.test_create_session()
         self.test_get_sessions()
+        self.test_paginate_sessions()
+        self.test_invalid_cursor()
         self.test_get_session_by_id()
+        self.test_conditional_get_session()
         self.test_update_session()
+        self.test_search_sessions()
+        self.test_related_sessions()
+        self.test_change_feed()
+        self.test_live_events()
+        self.test_live_events_token()
+        self.test_autosave_coalescing()
 
         # NEW: Structured Session Template Tests
         print("\n🆕 Testing New Structured Session Features:")
         self.test_structured_session_template()
         self.test_create_structured_session()
+        self.test_patch_structured_session()
+        self.test_patch_structured_same_item()
         self.test_export_structured_session()
+        self.test_export_markdown_session()
+        self.test_missions()
+        self.test_mission_detail()
         self.test_mixed_session_types()
         self.test_structured_session_validation()
 
@@ -443,11 +913,28 @@ class DDNoteAPITester:
         self.test_create_npc()
         self.test_get_npcs()
         self.test_get_npc_by_id()
+        self.test_resolve_npc()
+        self.test_resolve_npc_titled_name()
+        self.test_resolve_npc_shared_short_form()
+        self.test_npc_mentioned_in_sessions()
         self.test_update_npc()
 
         # Advanced functionality tests
         self.test_extract_npc()
+        self.test_extract_npc_bulk()
+        self.test_npc_history()
+        self.test_npc_summary()
         self.test_suggest_npcs()
+        self.test_suggest_npcs_batch()
+        self.test_suggest_npcs_overlapping()
+        self.test_llm_stats()
+        self.test_background_job()
+        self.test_request_profiles()
+        self.test_query_plans()
+        self.test_metrics()
+        self.test_analytics()
+        self.test_response_cache()
+        self.test_campaign_backup_restore()
 
         # Cleanup tests
         self.test_delete_npc()
@@ -16,6 +16,61 @@ const configureAuth = (username, password) => {
   authConfigured = true;
 };
 
+// Live change events. EventSource cannot send the Basic credentials, so each
+// connection asks for a short-lived token first and resumes from the last seq seen.
+const subscribeToChanges = (onChange) => {
+  let source = null;
+  let lastSeq = null;
+  let closed = false;
+  let retryTimer = null;
+  let flushTimer = null;
+  const pending = new Set();
+
+  // Coalesce bursts of events into one refresh per kind
+  const queue = (...kinds) => {
+    kinds.forEach((kind) => pending.add(kind));
+    if (!flushTimer) {
+      flushTimer = setTimeout(() => {
+        flushTimer = null;
+        const changed = new Set(pending);
+        pending.clear();
+        onChange(changed);
+      }, 300);
+    }
+  };
+
+  const connect = async () => {
+    try {
+      const response = await axios.post(`${API}/live/token`);
+      if (closed) return;
+      if (lastSeq === null) lastSeq = response.data.seq;
+      const params = new URLSearchParams({ token: response.data.token, since: lastSeq });
+      source = new EventSource(`${API}/live/events?${params}`);
+      source.addEventListener("change", (event) => {
+        const change = JSON.parse(event.data);
+        lastSeq = change.seq;
+        queue(change.kind);
+      });
+      source.addEventListener("resync", () => queue("session", "npc"));
+      source.onerror = () => {
+        // The token is only good for connecting, so reconnect with a fresh one
+        source.close();
+        if (!closed) retryTimer = setTimeout(connect, 2000);
+      };
+    } catch (err) {
+      if (!closed) retryTimer = setTimeout(connect, 5000);
+    }
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    clearTimeout(flushTimer);
+    if (source) source.close();
+  };
+};
+
 const Login = ({ onLogin }) => {
   const [username, setUsername] = useState("admin");
   const [password, setPassword] = useState("admin");
@@ -1199,10 +1254,27 @@ const MainApp = ({ username, onLogout }) => {
     fetchNpcs();
   }, []);
 
+  // Refresh the listings when the campaign is changed elsewhere
+  useEffect(() => subscribeToChanges((changed) => {
+    if (changed.has("session")) fetchSessions();
+    if (changed.has("npc")) fetchNpcs();
+  }), []);
+
+  // Follow the X-Next-Cursor header until every page of a listing is loaded
+  const fetchAllPages = async (url) => {
+    const items = [];
+    let cursor = null;
+    do {
+      const response = await axios.get(url, { params: cursor ? { cursor } : {} });
+      items.push(...response.data);
+      cursor = response.headers["x-next-cursor"];
+    } while (cursor);
+    return items;
+  };
+
   const fetchSessions = async () => {
     try {
-      const response = await axios.get(`${API}/sessions`);
-      setSessions(response.data);
+      setSessions(await fetchAllPages(`${API}/sessions`));
     } catch (err) {
       console.error("Error fetching sessions:", err);
     }
@@ -1210,8 +1282,7 @@ const MainApp = ({ username, onLogout }) => {
 
   const fetchNpcs = async () => {
     try {
-      const response = await axios.get(`${API}/npcs`);
-      setNpcs(response.data);
+      setNpcs(await fetchAllPages(`${API}/npcs`));
     } catch (err) {
       console.error("Error fetching NPCs:", err);
     }